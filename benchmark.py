@@ -0,0 +1,254 @@
+"""Бенчмарк задержки принятия решения обработчиком событий
+
+Генерирует синтетический поток obtained_skin_added/obtained_skin_deleted,
+прогоняет его через CSGOEventHandler и настоящий SkinPurchaser, который
+отправляет запросы на локальный HTTP сервер, и измеряет задержку от
+поступления публикации до получения запроса покупки сервером.
+
+Примеры:
+    python benchmark.py --events 20000
+    python benchmark.py --events 50000 --rate 2000 --match-rate 0.02 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+from handlers.websocket_handler import CSGOEventHandler
+from tools.local_market import LocalMarketServer
+from models.skin_purchaser import SkinPurchaser
+from replay import create_paper_tracker
+from utils.logger import setup_logger
+
+logger = setup_logger("Benchmark")
+
+WEAPONS = [
+    "AK-47 | Redline", "AWP | Asiimov", "M4A4 | Howl", "USP-S | Kill Confirmed",
+    "Glock-18 | Fade", "Desert Eagle | Blaze", "M4A1-S | Printstream", "MP9 | Starlight Protector",
+]
+WEAR_TIERS = [
+    ("Factory New", 0.00, 0.07),
+    ("Minimal Wear", 0.07, 0.15),
+    ("Field-Tested", 0.15, 0.38),
+    ("Well-Worn", 0.38, 0.45),
+    ("Battle-Scarred", 0.45, 1.00),
+]
+PLAIN_STICKERS = ["Sticker | Natus Vincere | Stockholm 2021", "Sticker | Crown (Foil)", "Sticker | Clown"]
+KEYWORD_STICKERS = ["Sticker | iBUYPOWER | Katowice 2014", "Charm | Hot Howl", "Charm | Diamond Dog"]
+
+
+class SyntheticEventGenerator:
+    """Генератор реалистичной смеси публикаций маркета"""
+
+    def __init__(self, seed: int = 0, match_rate: float = 0.05, delete_ratio: float = 0.4,
+                 max_stickers: int = 4, keyword_sticker_rate: float = 0.02,
+                 float_distribution: str = 'wear', non_cs_ratio: float = 0.1):
+        self.random = random.Random(seed)
+        self.match_rate = match_rate
+        self.delete_ratio = delete_ratio
+        self.max_stickers = max_stickers
+        self.keyword_sticker_rate = keyword_sticker_rate
+        self.float_distribution = float_distribution
+        self.non_cs_ratio = non_cs_ratio
+        self._next_id = 1
+
+    def _float(self) -> float:
+        rnd = self.random
+        if self.float_distribution == 'uniform':
+            return rnd.random()
+        if self.float_distribution == 'beta':
+            return rnd.betavariate(2, 5)
+        _, low, high = rnd.choice(WEAR_TIERS)
+        return rnd.uniform(low, high)
+
+    def _stickers(self) -> List[Dict[str, Any]]:
+        rnd = self.random
+        stickers = []
+        for slot in range(rnd.randint(0, self.max_stickers)):
+            pool = KEYWORD_STICKERS if rnd.random() < self.keyword_sticker_rate else PLAIN_STICKERS
+            stickers.append({'name': rnd.choice(pool), 'slot': slot, 'wear': rnd.choice([0, 0, 10, 50])})
+        return stickers
+
+    def _added(self) -> Dict[str, Any]:
+        rnd = self.random
+        item_id = self._next_id
+        self._next_id += 1
+
+        if rnd.random() < self.match_rate:
+            # Кандидат на автобай по стратегии low_float
+            item_float = rnd.uniform(0.0, 0.00099)
+            price = round(rnd.uniform(0.5, 14.0), 2)
+        else:
+            item_float = self._float()
+            if item_float < 0.001:
+                item_float += 0.001
+            price = round(rnd.lognormvariate(3, 1.2), 2)
+
+        wear = next(name for name, low, high in WEAR_TIERS if low <= item_float <= high)
+        return {
+            'id': item_id,
+            'event': 'obtained_skin_added',
+            'game_id': 2 if rnd.random() < self.non_cs_ratio else 1,
+            'name': f"{rnd.choice(WEAPONS)} ({wear})",
+            'price': price,
+            'item_float': f"{item_float:.10f}",
+            'item_paint_index': rnd.randint(1, 1000),
+            'item_paint_seed': rnd.randint(0, 1000),
+            'stickers': self._stickers(),
+        }
+
+    def events(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Поток из count публикаций"""
+        active: List[Dict[str, Any]] = []
+        for _ in range(count):
+            if active and self.random.random() < self.delete_ratio:
+                index = self.random.randrange(len(active))
+                active[index], active[-1] = active[-1], active[index]
+                data = active.pop()
+                yield {**data, 'event': 'obtained_skin_deleted'}
+            else:
+                data = self._added()
+                active.append(data)
+                yield data
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run_benchmark(events: List[Dict[str, Any]], rate: float = 0.0,
+                        buy_latency: float = 0.0, telegram_latency: float = 0.0,
+                        buy_tail_latency: float = 0.0, buy_tail_ratio: float = 0.0,
+                        hedge_percentile: float = 0.0) -> Dict[str, Any]:
+    """Прогон событий; rate - событий в секунду, 0 - максимальная скорость"""
+    server = LocalMarketServer(latency=buy_latency, tail_latency=buy_tail_latency, tail_ratio=buy_tail_ratio)
+    await server.start()
+
+    purchaser = SkinPurchaser(buy_url=server.buy_url, keepalive_url=server.balance_url,
+                              hedge_percentile=hedge_percentile)
+    await purchaser.start()
+
+    tracker = create_paper_tracker(telegram_latency=telegram_latency, purchaser=purchaser)
+    bot = tracker.bot
+    handler = CSGOEventHandler(tracker, tracker.runtime)
+    tracker.pipeline.start()
+    tracker.outbox.start()
+
+    arrived_at: Dict[int, float] = {}
+    started = time.perf_counter()
+    try:
+        for index, data in enumerate(events):
+            if rate > 0:
+                delay = index / rate - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Как и в живом клиенте, каждая публикация приходит в отдельной итерации цикла
+                await asyncio.sleep(0)
+                while tracker.pipeline.depth() >= tracker.pipeline.queue_size:
+                    await asyncio.sleep(0)
+
+            if data['event'] == 'obtained_skin_added':
+                arrived_at[data['id']] = time.perf_counter()
+            await handler.on_publication(SimpleNamespace(pub=SimpleNamespace(data=data)))
+
+        await tracker.pipeline.join()
+        await tracker.outbox.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        await tracker.pipeline.stop()
+        await tracker.outbox.stop()
+        await purchaser.close()
+        await server.stop()
+
+    latencies = sorted(
+        (received - arrived_at[item_id]) * 1000
+        for item_id, received in server.received_at.items()
+        if item_id in arrived_at
+    )
+    return {
+        'events': len(events),
+        'seconds': round(elapsed, 3),
+        'events_per_second': round(len(events) / elapsed, 1) if elapsed else None,
+        'buy_requests': len(server.buy_requests),
+        'alerts': len(bot.messages),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'p999': round(percentile(latencies, 0.999), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'samples': len(latencies),
+        },
+        'pipeline': tracker.pipeline.stats(),
+        'hedging': purchaser.hedge_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк задержки обработчика событий")
+    parser.add_argument("--events", type=int, default=20000, help="Количество публикаций")
+    parser.add_argument("--rate", type=float, default=0.0, help="Событий в секунду, 0 - максимум")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--match-rate", type=float, default=0.05, help="Доля кандидатов на автобай")
+    parser.add_argument("--delete-ratio", type=float, default=0.4, help="Доля событий удаления")
+    parser.add_argument("--max-stickers", type=int, default=4)
+    parser.add_argument("--keyword-sticker-rate", type=float, default=0.02)
+    parser.add_argument("--float-distribution", choices=['wear', 'uniform', 'beta'], default='wear')
+    parser.add_argument("--buy-latency", type=float, default=0.0, help="Задержка ответа маркета, сек")
+    parser.add_argument("--buy-tail-latency", type=float, default=0.0,
+                        help="Задержка медленных ответов маркета, сек")
+    parser.add_argument("--buy-tail-ratio", type=float, default=0.0, help="Доля медленных ответов маркета")
+    parser.add_argument("--hedge-percentile", type=float, default=0.0,
+                        help="Перцентиль задержки для хеджирующего запроса, 0 - без хеджирования")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Задержка Telegram, сек")
+    parser.add_argument("--output", default="bench_output.json", help="Файл результатов (JSON)")
+    args = parser.parse_args()
+
+    generator = SyntheticEventGenerator(
+        seed=args.seed,
+        match_rate=args.match_rate,
+        delete_ratio=args.delete_ratio,
+        max_stickers=args.max_stickers,
+        keyword_sticker_rate=args.keyword_sticker_rate,
+        float_distribution=args.float_distribution,
+    )
+    events = list(generator.events(args.events))
+
+    result = asyncio.run(run_benchmark(
+        events, args.rate, args.buy_latency, args.telegram_latency,
+        args.buy_tail_latency, args.buy_tail_ratio, args.hedge_percentile
+    ))
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'params': vars(args),
+        'result': result,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report['result'], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,36 @@ API_KEY = os.getenv("API_KEY")
 STEAM_PARTNER = os.getenv("STEAM_PARTNER")
 STEAM_TOKEN = os.getenv("STEAM_TOKEN")
 
-rateRUB = 79
-rateCNY = 7.20
+# Курсы валют (USD -> валюта): значения до первого обновления,
+# дальше обновляются в фоне (см. utils/fx_rates.py)
+FX_DEFAULT_RATES = {
+    'RUB': 79.0,
+    'CNY': 7.20,
+}
+FX_REFRESH_INTERVAL = 3600  # секунд
+# Дневные курсы ЦБ РФ: единственный из источников с RUB
+FX_CBR_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
+FX_MAX_AGE = 24 * 3600  # Старше - курсы считаются устаревшими
+FX_SNAPSHOT_PATH = os.getenv(
+    "FX_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fx_rates.json")
+)
 
 # Фильтры поиска
-FLOAT_RANGES = [
-    (0.00, 0.01),
-    (0.07, 0.071),
-    (0.99, 1.00)
-]
+# Диапазоны float по предметам и степеням износа (см. models/float_rules.py)
+FLOAT_RANGES_FILE = os.getenv(
+    "FLOAT_RANGES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "float_ranges.json")
+)
+
+# Необязательный JSON поверх настроек ниже: {"keywords": {"stickers": [...], ...},
+# "strategies": [...]}. Изменения подхватываются без перезапуска (/reload,
+# SIGHUP или изменение файла), как и изменения FLOAT_RANGES_FILE
+RUNTIME_CONFIG_FILE = os.getenv(
+    "RUNTIME_CONFIG_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "runtime_config.json")
+)
+RUNTIME_CONFIG_WATCH_INTERVAL = 5  # Проверка файлов, секунд; 0 - не следить
 
 STICKER_KEYWORDS = [
     "2013",
@@ -45,42 +66,6 @@ CHARM_KEYWORDS = [
  "Die-cast AK", 
 ]
 
-LOWPRICE_CHARMS_KEYWORDS = [
- "Hot Howl",
- "Hot Wurst",
- "Diamond Dog",
- "Lil' Monster",
- "Diner Dog", 
- "Lil' Whiskers", 
- "Lil' Teacup", 
- "Lil' Sandy", 
- "Chicken Lil", 
- "That's Bananas", 
- "Lil' Squatch", 
- "Lil' SAS", 
- "Big Kev", 
- "Lil' Ava", 
- "Hot Sauce", 
- "Pinch O' Salt", 
- "Lil' Crass", 
- "Baby Karat T", 
- "Baby Karat CT", 
- "Semi-Precious", 
- "Lil' Squirt", 
- "Titeenium AWP", 
- "Die-cast AK", 
- "POP Art", 
- "Disco MAC", 
- "Hot Hands", 
- "Glamour Shot",
- "Baby's AK", 
- "Whittle Knife", 
- "Pocket AWP", 
- "Backsplash", 
- "Lil' Cap Gun",
- "Stitch-Loaded"
-]
-
 HIGHLIGHT_KEYWORDS = [
     "Hightlight"
 ]
@@ -99,22 +84,162 @@ AUTO_BUY_SETTINGS = {
     ]
 }
 
+# Стратегии автопокупки и оповещений (см. models/strategies.py)
+# Условия: min_price, max_price, float_below, min_float, max_float,
+#          paint_seeds, name_contains, name_excludes, sticker_categories
+# Действия: buy, alert
+AUTO_BUY_STRATEGIES = [
+    {
+        'name': 'low_float',
+        'action': 'buy',
+        'conditions': {
+            'float_below': AUTO_BUY_SETTINGS['FLOAT_THRESHOLD'],
+            'max_price': AUTO_BUY_SETTINGS['MAX_PRICE'],
+            'name_excludes': AUTO_BUY_SETTINGS['EXCLUDED_KEYWORDS'],
+        },
+        'max_price_multiplier': 1.0,
+        'expected_value': 2.0,
+    },
+]
+
+# Автопокупка предметов с брелками из CHARM_KEYWORDS до 10$. Раньше
+# ключевые слова сравнивались с учётом регистра, и она не срабатывала
+# ни разу; теперь это реальные покупки, поэтому только явно: CHARM_AUTOBUY=1
+CHARM_AUTOBUY = os.getenv("CHARM_AUTOBUY", "0") == "1"
+CHARM_AUTOBUY_STRATEGY = {
+    'name': 'charm',
+    'action': 'buy',
+    'conditions': {
+        'max_price': 10.0,
+        'sticker_categories': ['charms'],
+    },
+    'max_price_multiplier': 1.1,
+    'expected_value': 0.5,
+}
+if CHARM_AUTOBUY:
+    AUTO_BUY_STRATEGIES.append(CHARM_AUTOBUY_STRATEGY)
+
 # WebSocket настройки
 WS_URL = "wss://ws.lis-skins.com/connection/websocket"
 WS_TOKEN_URL = "https://api.lis-skins.com/v1/user/get-ws-token"
+# Токен WebSocket: срок, если в токене нет exp, и обновление заранее
+WS_TOKEN_TTL = 600  # секунд
+WS_TOKEN_REFRESH_AHEAD = 60  # секунд
 WS_CHANNEL = "public:obtained-skins"
+# Сколько помнить позицию в потоке канала для восстановления после разрыва
+WS_STREAM_POSITION_TTL = 3600  # секунд
+# Независимые подключения к каналу: при 2+ каждая публикация обрабатывается
+# по первой пришедшей копии, обрыв одного подключения не создаёт пропуска
+WS_CONNECTIONS = int(os.getenv("WS_CONNECTIONS", "1"))
+WS_ARRIVAL_WINDOW = 60  # Сколько ждать копии публикации, секунд
+WS_ARRIVAL_CAPACITY = 50000
 
 # API endpoints
 API_BASE_URL = "https://api.lis-skins.com/v1"
 API_BUY_URL = f"{API_BASE_URL}/market/buy"
-
-# Настройки переподключения
-MAX_RECONNECT_ATTEMPTS = 10
-RECONNECT_DELAY = 5
-HEARTBEAT_INTERVAL = 60
-NO_EVENTS_TIMEOUT = 150  # 3 минут
+API_PURCHASE_INFO_URL = f"{API_BASE_URL}/market/info"
+# Имя параметра со списком покупок в /market/info (повторяется для каждого id)
+API_PURCHASE_INFO_PARAM = os.getenv("API_PURCHASE_INFO_PARAM", "purchase_ids[]")
+
+# Клиент покупок: пул keep-alive соединений
+PURCHASE_POOL_SIZE = 4  # Соединений, открываемых заранее
+PURCHASE_DNS_TTL = 300  # Кеш DNS, секунд
+# Один пинг на сессию за период (~1.4 тыс. запросов в сутки, вдвое больше с хеджированием)
+PURCHASE_KEEPALIVE_INTERVAL = 60  # Период пингов, секунд
+PURCHASE_KEEPALIVE_URL = f"{API_BASE_URL}/user/balance"
+
+# Хеджирование покупок: если ответа нет дольше перцентиля недавних задержек,
+# тот же запрос уходит повторно по отдельному соединению. 0 - отключено
+PURCHASE_HEDGE_PERCENTILE = 0.0  # например 0.9
+PURCHASE_HEDGE_WINDOW = 100  # Сколько последних задержек учитывать
+PURCHASE_HEDGE_MIN_SAMPLES = 10  # До этого числа замеров - фиксированная задержка
+PURCHASE_HEDGE_INITIAL_DELAY = 0.5  # секунд
+
+# Отслеживание статуса покупок: опрос с нарастающим интервалом
+PURCHASE_STATUS_INITIAL_DELAY = 2.0  # секунд
+PURCHASE_STATUS_MAX_DELAY = 60.0  # секунд
+PURCHASE_STATUS_BACKOFF = 2.0  # Множитель интервала, пока статус не меняется
+PURCHASE_STATUS_TIMEOUT = 6 * 3600  # Сколько следить за покупкой, секунд
+PURCHASE_STATUS_BATCH = 50  # Покупок в одном запросе
+
+# Сколько купленных id помнить, чтобы не покупать предмет повторно
+PURCHASE_BOUGHT_CAPACITY = 10000
+PURCHASE_BOUGHT_TTL = 7 * 24 * 3600  # секунд
+
+# Ограничитель автопокупок: частота запросов и лимиты расходов в USD
+GOVERNOR_RATE = 2.0  # Запросов покупки в секунду
+GOVERNOR_BURST = 5  # Запросов подряд без ожидания
+GOVERNOR_SPEND_LIMITS = {
+    'minute': 50.0,
+    'hour': 300.0,
+    'day': 1000.0,
+}
+# Последние 20% каждого лимита - только для стратегий с expected_value от 1$
+GOVERNOR_RESERVE = 0.2
+GOVERNOR_RESERVE_MIN_VALUE = 1.0
+
+# Настройки переподключения: первая повторная попытка сразу, дальше
+# RECONNECT_DELAY, 2*RECONNECT_DELAY... до RECONNECT_MAX_DELAY со случайным
+# разбросом. Попытки не ограничены, счёт сбрасывается, если соединение
+# продержалось RECONNECT_HEALTHY_AFTER секунд
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+RECONNECT_JITTER = 0.5  # Доля паузы, на которую она может сократиться
+RECONNECT_HEALTHY_AFTER = 60
+RECONNECT_ALERT_AFTER = 10  # Оповещение в Telegram после стольких неудачных попыток подряд
+HEARTBEAT_INTERVAL = 60  # Отчёт о состоянии в лог, секунд
+NO_EVENTS_TIMEOUT = 150  # Тишина в подключении до переподключения, секунд
+
+# Супервизор компонентов (utils/supervisor.py): упавший компонент
+# перезапускается сразу, повторно - с паузой от SUPERVISOR_RESTART_DELAY до
+# SUPERVISOR_MAX_RESTART_DELAY. Больше SUPERVISOR_MAX_RESTARTS падений за
+# SUPERVISOR_RESTART_WINDOW секунд - остановка бота с ненулевым кодом
+SUPERVISOR_MAX_RESTARTS = 5
+SUPERVISOR_RESTART_WINDOW = 300
+SUPERVISOR_RESTART_DELAY = 0.5
+SUPERVISOR_MAX_RESTART_DELAY = 30
+
+# Данные кнопок покупки
+# Ключ подписи id и цены в кнопке: callback_data присылает клиент, и без
+# подписи участник чата мог бы нажать кнопку с любой ценой
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET") or TELEGRAM_TOKEN or ""
 
 # Кеш
-CACHE_CLEANUP_INTERVAL = 3600  # 1 час
-CACHE_ITEM_TTL = 7200  # 2 часа
 DUPLICATE_CHECK_WINDOW = 1800  # 30 минут
+DUPLICATE_CACHE_CAPACITY = 100000  # Записей в каждом кеше дубликатов
+
+# Выставленные предметы, прошедшие критерии, - для оповещений о продаже
+ACTIVE_LISTINGS_TTL = 3 * 24 * 3600  # 3 дня
+ACTIVE_LISTINGS_CAPACITY = 50000
+
+# Конвейер обработки событий
+PIPELINE_WORKERS = 4
+PIPELINE_QUEUE_SIZE = 1000  # Максимум задач в каждой полосе
+
+# Журнал публикаций для воспроизведения (replay.py), пусто - не писать
+JOURNAL_PATH = os.getenv("JOURNAL_PATH")
+
+
+# Эндпоинт метрик Prometheus, порт 0 - отключить
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Очередь сообщений Telegram: не больше ~20 сообщений в минуту в группу
+TELEGRAM_RATE = 20 / 60  # Сообщений в секунду
+TELEGRAM_BURST = 3
+TELEGRAM_QUEUE_SIZE = 500
+TELEGRAM_OUTAGE_RETRY = 30  # Проверка связи во время сбоя, секунд
+TELEGRAM_RETRY_AFTER_LIMIT = 5  # Ответов 429 подряд, после которых сообщение откладывается
+# Сообщения, не отправленные из-за сбоя Telegram, ждут здесь
+TELEGRAM_SPOOL_PATH = os.getenv(
+    "TELEGRAM_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "telegram_spool.jsonl")
+)
+
+# Снимок состояния для тёплого перезапуска: выставленные предметы,
+# кеши дубликатов и купленные id. Пустой путь отключает снимки
+STATE_SNAPSHOT_PATH = os.getenv(
+    "STATE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "state.sqlite3")
+)
+STATE_SNAPSHOT_INTERVAL = 5.0  # секунд
\ No newline at end of file
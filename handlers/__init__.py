@@ -1,5 +1,5 @@
 """Обработчики событий"""
-from .telegram_handler import start_command, handle_purchase_callback
+from .telegram_handler import start_command, budget_command, reload_command, handle_purchase_callback
 from .websocket_handler import CSGOEventHandler
 
-__all__ = ['start_command', 'handle_purchase_callback', 'CSGOEventHandler']
\ No newline at end of file
+__all__ = ['start_command', 'budget_command', 'reload_command', 'handle_purchase_callback', 'CSGOEventHandler']
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Пакетная проверка исторических событий для подбора стратегий"""
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from models.float_rules import FloatIntervalIndex, FloatRuleStore
+from models.strategies import StrategyEngine, ACTION_BUY, ACTION_ALERT
+from utils.keyword_matcher import CATEGORY_STICKERS, CATEGORY_CHARMS, CATEGORY_HIGHLIGHTS
+
+# Биты категорий в маске наклеек события
+CATEGORY_BITS = {
+    CATEGORY_STICKERS: 1,
+    CATEGORY_CHARMS: 2,
+    CATEGORY_HIGHLIGHTS: 4,
+}
+CRITERIA_BITS = CATEGORY_BITS[CATEGORY_STICKERS] | CATEGORY_BITS[CATEGORY_CHARMS] | CATEGORY_BITS[CATEGORY_HIGHLIGHTS]
+
+MISSING_SEED = -1
+
+
+def category_mask(categories: Iterable[str]) -> int:
+    """Битовая маска набора категорий"""
+    mask = 0
+    for category in categories:
+        mask |= CATEGORY_BITS.get(category, 0)
+    return mask
+
+
+class EventBatch:
+    """Колонки пакета событий obtained_skin_added.
+
+    price и item_float — float64 (NaN если значения нет), game_id — int,
+    name_ids — индексы в словаре names, sticker_masks — объединение
+    битов CATEGORY_BITS по всем наклейкам, paint_seed — int (-1 если нет).
+    """
+
+    __slots__ = ('names', 'price', 'item_float', 'game_id', 'name_ids', 'sticker_masks', 'paint_seed')
+
+    def __init__(self, names: List[str], price: np.ndarray, item_float: np.ndarray,
+                 game_id: np.ndarray, name_ids: np.ndarray, sticker_masks: np.ndarray,
+                 paint_seed: Optional[np.ndarray] = None):
+        self.names = names
+        self.price = np.asarray(price, dtype=np.float64)
+        self.item_float = np.asarray(item_float, dtype=np.float64)
+        self.game_id = np.asarray(game_id)
+        self.name_ids = np.asarray(name_ids, dtype=np.int64)
+        self.sticker_masks = np.asarray(sticker_masks, dtype=np.int64)
+        if paint_seed is None:
+            paint_seed = np.full(len(self.price), MISSING_SEED, dtype=np.int64)
+        self.paint_seed = np.asarray(paint_seed, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]],
+                    classify: Callable[[str], FrozenSet[str]]) -> 'EventBatch':
+        """Сборка пакета из словарей событий в формате публикаций"""
+        vocabulary: Dict[str, int] = {}
+        price, item_float, game_id, name_ids, masks, seeds = [], [], [], [], [], []
+
+        for data in events:
+            name = data.get('name', '')
+            name_ids.append(vocabulary.setdefault(name, len(vocabulary)))
+            price.append(_to_float(data.get('price')))
+            item_float.append(_to_float(data.get('item_float')))
+            game_id.append(data.get('game_id') or 0)
+
+            mask = 0
+            for sticker in data.get('stickers') or ():
+                mask |= category_mask(classify(sticker.get('name', '')))
+            masks.append(mask)
+
+            seed = data.get('item_paint_seed')
+            seeds.append(seed if isinstance(seed, int) and seed >= 0 else MISSING_SEED)
+
+        return cls(list(vocabulary), price, item_float, game_id, name_ids, masks, seeds)
+
+
+def _to_float(value: Any) -> float:
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _interval_mask(index: FloatIntervalIndex, values: np.ndarray) -> np.ndarray:
+    """Векторный аналог FloatIntervalIndex.contains"""
+    if not len(index):
+        return np.zeros(len(values), dtype=bool)
+    starts = np.asarray(index.starts)
+    ends = np.asarray(index.ends)
+    pos = np.searchsorted(starts, values, side='right') - 1
+    inside = pos >= 0
+    return inside & (values <= ends[np.maximum(pos, 0)])
+
+
+class BatchEvaluator:
+    """Те же критерии и стратегии, что у CSGOEventHandler, но на массивах.
+
+    Результат совпадает с обработкой каждого события по отдельности без
+    учёта дедупликации: matches — было бы отправлено уведомление о новом
+    предмете, buy — была бы попытка автопокупки.
+    """
+
+    def __init__(self, float_rules: FloatRuleStore, strategy_engine: StrategyEngine):
+        self.float_rules = float_rules
+        self.strategy_engine = strategy_engine
+
+    def evaluate(self, batch: EventBatch) -> Dict[str, Any]:
+        """Маски совпадений и покупок для всего пакета"""
+        cache: Dict[Any, np.ndarray] = {}
+
+        valid = (batch.game_id == 1) & ~self._name_mask(batch, lambda name: 'Case' in name)
+        criteria = self._float_mask(batch) | ((batch.sticker_masks & CRITERIA_BITS) != 0)
+
+        strategies = {}
+        any_buy = np.zeros(len(batch), dtype=bool)
+        any_alert = np.zeros(len(batch), dtype=bool)
+        for strategy in self.strategy_engine.strategies:
+            mask = valid.copy()
+            for predicate in strategy.predicates:
+                if predicate.key not in cache:
+                    cache[predicate.key] = self._predicate_mask(predicate.key, batch)
+                mask &= cache[predicate.key]
+            strategies[strategy.name] = mask
+            if strategy.action == ACTION_BUY:
+                any_buy |= mask
+            elif strategy.action == ACTION_ALERT:
+                any_alert |= mask
+
+        return {
+            'matches': valid & (criteria | any_alert),
+            'buy': any_buy,
+            'criteria': valid & criteria,
+            'strategies': strategies,
+        }
+
+    @staticmethod
+    def _name_mask(batch: EventBatch, check: Callable[[str], bool]) -> np.ndarray:
+        """Проверка по словарю названий с раскладкой на события"""
+        vocabulary = np.fromiter((check(name) for name in batch.names), dtype=bool, count=len(batch.names))
+        if not len(vocabulary):
+            return np.zeros(len(batch), dtype=bool)
+        return vocabulary[batch.name_ids]
+
+    def _float_mask(self, batch: EventBatch) -> np.ndarray:
+        """Попадание float в окна: общие для всех, отдельные по названиям"""
+        values = batch.item_float
+        result = _interval_mask(self.float_rules.default, values)
+
+        specific = {}
+        for name_id, name in enumerate(batch.names):
+            index = self.float_rules.index_for(name)
+            if index is not None:
+                specific[name_id] = index
+        if not specific:
+            return result
+
+        order = np.argsort(batch.name_ids, kind='stable')
+        sorted_ids = batch.name_ids[order]
+        for name_id, index in specific.items():
+            lo, hi = np.searchsorted(sorted_ids, [name_id, name_id + 1])
+            if lo == hi:
+                continue
+            rows = order[lo:hi]
+            result[rows] = _interval_mask(index, values[rows])
+        return result
+
+    def _predicate_mask(self, key, batch: EventBatch) -> np.ndarray:
+        """Векторный аналог условия стратегии по его ключу"""
+        name, value = key
+        price = batch.price
+        values = batch.item_float
+
+        if name == 'min_price':
+            return price >= value
+        if name == 'max_price':
+            return price <= value
+        if name == 'float_below':
+            return values < value
+        if name == 'min_float':
+            return values >= value
+        if name == 'max_float':
+            return values <= value
+        if name == 'paint_seeds':
+            return np.isin(batch.paint_seed, np.asarray(value, dtype=np.int64))
+        if name == 'name_excludes':
+            return self._name_mask(batch, lambda n: not any(word in n.lower() for word in value))
+        if name == 'name_contains':
+            return self._name_mask(batch, lambda n: any(word in n.lower() for word in value))
+        if name == 'sticker_categories':
+            return (batch.sticker_masks & category_mask(value)) != 0
+        raise ValueError(f"Неизвестное условие стратегии: {name}")
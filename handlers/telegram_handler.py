@@ -1,10 +1,12 @@
 """Обработчики Telegram команд и callback'ов"""
-import re
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from config import API_KEY, STEAM_PARTNER, STEAM_TOKEN, rateRUB, rateCNY
+from config import API_KEY, STEAM_PARTNER, STEAM_TOKEN, TELEGRAM_CHAT_ID
 from models.skin_purchaser import SkinPurchaser
+from models.spend_governor import BudgetExceeded
+from utils.callback_store import parse_buy_callback
+from utils.fx_rates import fx_rates
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -22,6 +24,44 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /budget: остаток лимитов автопокупок"""
+    if str(update.effective_chat.id) != str(TELEGRAM_CHAT_ID):
+        logger.warning(f"Команда /budget из чужого чата {update.effective_chat.id}")
+        return
+    
+    governor = context.bot_data.get('governor')
+    if governor is None:
+        await update.message.reply_text("Ограничитель автопокупок не настроен")
+        return
+    
+    stats = governor.stats()
+    lines = ["💰 <b>Бюджет автопокупок</b>\n"]
+    for window, limit in stats['limits'].items():
+        lines.append(f"{window}: осталось ${stats['remaining'][window]} из ${limit}")
+    lines.append(f"\nТокенов на запросы: {stats['tokens']}")
+    if stats['rejections']:
+        rejected = ', '.join(f"{reason}: {count}" for reason, count in stats['rejections'].items())
+        lines.append(f"Отклонено: {rejected}")
+    await update.message.reply_text('\n'.join(lines), parse_mode="HTML")
+
+
+async def reload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /reload: перезагрузка фильтров и стратегий"""
+    if str(update.effective_chat.id) != str(TELEGRAM_CHAT_ID):
+        logger.warning(f"Команда /reload из чужого чата {update.effective_chat.id}")
+        return
+    
+    runtime = context.bot_data.get('runtime_config')
+    if runtime is None:
+        await update.message.reply_text("Трекер ещё не запущен")
+        return
+    
+    ok, description = await runtime.reload('команда /reload')
+    prefix = "🔄 Фильтры перезагружены" if ok else "❌ Перезагрузка не удалась, фильтры не изменены"
+    await update.message.reply_text(f"{prefix}: {description}")
+
+
 async def handle_purchase_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка нажатия кнопки покупки"""
     query = update.callback_query
@@ -32,19 +72,21 @@ async def handle_purchase_callback(update: Update, context: ContextTypes.DEFAULT
         callback_data = query.data
         logger.info(f"Получен callback: '{callback_data}'")
         
-        # Извлекаем ID предмета
-        item_id = extract_item_id(callback_data, context)
+        # ID и цена берутся из самой кнопки, цена - только с верной подписью
+        parsed = parse_buy_callback(callback_data)
         
-        if item_id is None:
+        if parsed is None:
+            logger.warning(f"Отклонена кнопка с неверными данными или подписью: '{callback_data}'")
             await query.edit_message_text(
-                f"❌ Ошибка: не удалось определить ID предмета\n"
+                f"❌ Ошибка: данные кнопки повреждены или подделаны\n"
                 f"Данные: {callback_data}"
             )
             return
         
-        # Получаем данные о предмете
-        purchase_data = context.bot_data.get('purchase_data', {}).get(str(item_id), {})
-        price = purchase_data.get('price', 0)
+        item_id, price = parsed
+        if price is None:
+            # Кнопка старого формата buy_<id>: цены в ней нет
+            price = 0
         
         logger.info(f"Покупка предмета ID: {item_id}, цена: ${price}")
         
@@ -70,35 +112,12 @@ async def handle_purchase_callback(update: Update, context: ContextTypes.DEFAULT
             pass
 
 
-def extract_item_id(callback_data: str, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Извлечение ID предмета из callback_data"""
-    if not callback_data:
-        return None
-    
-    # Способ 1: формат buy_ID
-    if callback_data.startswith("buy_"):
-        try:
-            return int(callback_data.replace("buy_", ""))
-        except ValueError:
-            pass
-    
-    # Способ 2: поиск в сохраненных данных
-    if 'purchase_data' in context.bot_data:
-        for saved_id in context.bot_data['purchase_data'].keys():
-            if saved_id in callback_data or callback_data in f"buy_{saved_id}":
-                return int(saved_id)
-    
-    # Способ 3: извлечение чисел
-    numbers = re.findall(r'\d+', callback_data)
-    if numbers:
-        return int(numbers[0])
-    
-    return None
-
-
 async def process_purchase(query, item_id: int, price: float, context: ContextTypes.DEFAULT_TYPE):
     """Обработка покупки"""
-    purchaser = SkinPurchaser()
+    purchaser = context.bot_data.get('purchaser')
+    own_purchaser = purchaser is None
+    if own_purchaser:
+        purchaser = SkinPurchaser()
     
     try:
         result = await purchaser.buy_skin(item_id, max_price=price * 1.1 if price else None)
@@ -114,8 +133,8 @@ async def process_purchase(query, item_id: int, price: float, context: ContextTy
                     f"Purchase ID: {purchase_id}\n"
                     f"Название: {skin.get('name')}\n"
                     f"Цена: USD: {skin.get('price')}\n"
-                    f"      RUB: {rateRUB * price} \n"
-                    f"      CNY: {rateCNY * price} \n"
+                    f"      RUB: {fx_rates.convert(price, 'RUB')} \n"
+                    f"      CNY: {fx_rates.convert(price, 'CNY')} \n"
 		            f"Статус: {skin.get('status')}\n\n"
                     f"⏳ Ожидайте трейд в Steam!"
                 )
@@ -124,13 +143,21 @@ async def process_purchase(query, item_id: int, price: float, context: ContextTy
                 
             await query.edit_message_text(status_text, parse_mode="HTML")
             
-            # Удаляем сохраненные данные
-            if 'purchase_data' in context.bot_data and str(item_id) in context.bot_data['purchase_data']:
-                del context.bot_data['purchase_data'][str(item_id)]
+            status_tracker = context.bot_data.get('status_tracker')
+            if status_tracker and query.message:
+                status_tracker.track(purchase_id, query.message.chat_id, query.message.message_id,
+                                     status_text, item_id)
                 
         else:
             await query.edit_message_text("❌ Ошибка: не получен ответ от сервера")
             
+    except BudgetExceeded as e:
+        await query.edit_message_text(
+            f"🚧 <b>Покупка отклонена ограничителем</b>\n\n"
+            f"Причина: {e}\n"
+            f"Остаток лимитов: /budget",
+            parse_mode="HTML"
+        )
     except Exception as e:
         logger.error(f"Ошибка при покупке: {e}")
         await query.edit_message_text(
@@ -138,3 +165,6 @@ async def process_purchase(query, item_id: int, price: float, context: ContextTy
             f"Детали: {str(e)[:200]}",
             parse_mode="HTML"
         )
+    finally:
+        if own_purchaser:
+            await purchaser.close()
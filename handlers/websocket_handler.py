@@ -1,32 +1,97 @@
 """Обработчики WebSocket событий"""
-import asyncio
-from typing import Dict, Any, List, Tuple
-from datetime import datetime, timedelta
+import time
+from functools import partial
+from typing import Dict, Any, List, Optional
+from datetime import datetime
 from centrifuge import SubscriptionEventHandler, PublicationContext
 
-from config import STICKER_KEYWORDS, CHARM_KEYWORDS, HIGHLIGHT_KEYWORDS, AUTO_BUY_SETTINGS, rateRUB, rateCNY, LOWPRICE_CHARMS_KEYWORDS
-from models.skin_purchaser import SkinPurchaser
+from models.strategies import Strategy, ACTION_BUY, ACTION_ALERT
+from models.spend_governor import BudgetExceeded
 from utils.logger import setup_logger
+from utils.event_pipeline import LANE_AUTOBUY, LANE_ALERT, LANE_SOLD
+from utils.fx_rates import fx_rates
+from utils.keyword_matcher import CATEGORY_STICKERS, CATEGORY_CHARMS, CATEGORY_HIGHLIGHTS
+from utils.telegram_outbox import PRIORITY_HIGH, PRIORITY_LOW
+from utils.metrics import metrics
 
 logger = setup_logger(__name__)
 
+_STAGE_HELP = 'Длительность этапов горячего пути'
+RECEIVE_SECONDS = metrics.histogram('stage_seconds', _STAGE_HELP, {'stage': 'receive'})
+STRATEGIES_SECONDS = metrics.histogram('stage_seconds', _STAGE_HELP, {'stage': 'classify_strategies'})
+CRITERIA_SECONDS = metrics.histogram('stage_seconds', _STAGE_HELP, {'stage': 'classify_criteria'})
+FEED_LAG_SECONDS = metrics.histogram('feed_lag_seconds', 'Отставание получения публикации от времени в ленте')
+EVENTS_TOTAL = metrics.counter('events_total', 'Полученные публикации')
+
+# Поля публикации, из которых берётся время события в ленте
+FEED_TIMESTAMP_FIELDS = ('created_at', 'updated_at', 'timestamp')
+
+
+class ActiveListing:
+    """Выставленный предмет, прошедший критерии: только то, что нужно для оповещения о продаже"""
+
+    __slots__ = ('item_id', 'name', 'price', 'check_result', 'appeared_at', 'appeared')
+
+    def __init__(self, data: Dict[str, Any], check_result: Dict[str, Any]):
+        self.item_id = data.get('id')
+        self.name = data.get('name', 'N/A')
+        self.price = data.get('price', 'N/A')
+        self.check_result = check_result
+        self.appeared_at = time.time()
+        self.appeared = time.monotonic()
+
+    def to_record(self) -> Dict[str, Any]:
+        """Данные для снимка состояния"""
+        return {'item_id': self.item_id, 'name': self.name, 'price': self.price,
+                'check_result': dict(self.check_result), 'appeared_at': self.appeared_at}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'ActiveListing':
+        listing = cls(record, record['check_result'])
+        listing.item_id = record['item_id']
+        listing.appeared_at = record['appeared_at']
+        listing.appeared = time.monotonic() - max(0.0, time.time() - listing.appeared_at)
+        return listing
+
 
 class CSGOEventHandler(SubscriptionEventHandler):
-    """Обработчик событий CS:GO"""
+    """Обработчик событий CS:GO.
+
+    runtime - источник текущей версии фильтров (атрибут current с
+    keyword_matcher, float_rules и strategy_engine). Версия берётся один
+    раз при приёме события и передаётся дальше, так что перезагрузка
+    фильтров не меняет их посреди обработки.
+
+    connection - подключение, к подписке которого привязан обработчик
+    (позиция в потоке и учёт тишины); без него публикации подаются
+    напрямую, как при воспроизведении журнала.
+    """
     
-    def __init__(self, tracker, float_ranges: List[Tuple[float, float]]):
+    def __init__(self, tracker, runtime, connection=None):
         self.tracker = tracker
-        self.float_ranges = float_ranges
-        self.active_items = {}
-        self.processing_lock = asyncio.Lock()
-        self.purchaser = SkinPurchaser()
+        self.runtime = runtime
+        self.connection = connection
 
     async def on_subscribing(self, ctx) -> None:
         logger.info("📡 Подписка на канал...")
 
     async def on_subscribed(self, ctx) -> None:
         logger.info("✅ Успешно подписались на канал")
-        self.active_items.clear()
+        if self.connection is None:
+            return
+        result = self.connection.stream.on_subscribed(ctx)
+        if not result.was_recovering:
+            return
+        if result.recovered:
+            logger.info(f"♻️ Поток восстановлен, пропущенных публикаций: {result.recovered_count}")
+            return
+        lost = "неизвестно" if result.lost_count is None else result.lost_count
+        logger.warning(f"⚠️ Поток не восстановлен, потеряно публикаций: {lost}")
+        if result.lost_count != 0:
+            self.tracker.send_alert(
+                f"⚠️ <b>Разрыв потока</b>\nПропущенные события не восстановлены, потеряно: {lost}",
+                priority=PRIORITY_LOW
+            )
 
     async def on_unsubscribed(self, ctx) -> None:
         logger.warning(f"❌ Отписались от канала: {ctx}")
@@ -35,70 +100,133 @@ class CSGOEventHandler(SubscriptionEventHandler):
         logger.error(f"❌ Ошибка подписки: {ctx}")
 
     async def on_publication(self, ctx: PublicationContext) -> None:
-        """Обработка публикации"""
+        """Приём публикации: только учёт и маршрутизация в конвейер"""
+        with RECEIVE_SECONDS.time():
+            self._ingest(ctx)
+
+    def _ingest(self, ctx: PublicationContext) -> None:
+        connection = self.connection
+        if connection is not None:
+            connection.last_activity = time.monotonic()
+            connection.events_count += 1
+            # Восстановленные после разрыва публикации могут прийти повторно
+            if not connection.stream.accept(getattr(ctx.pub, 'offset', 0)):
+                return
+            # Копия, уже пришедшая по другому подключению
+            arrivals = self.tracker.arrivals
+            if arrivals is not None:
+                data = ctx.pub.data
+                key = (data.get('id'), data.get('event'))
+                if key[0] is not None and not arrivals.accept(key, connection.index):
+                    return
+        
         self.tracker.last_event_time = datetime.now()
         self.tracker.events_count += 1
+        EVENTS_TOTAL.inc()
         
         if self.tracker.events_count % 100 == 0:
             logger.info(f"📈 Обработано {self.tracker.events_count} событий")
         
-        async with self.processing_lock:
-            try:
-                data = ctx.pub.data
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            data = ctx.pub.data
+            config = self.runtime.current
+            if self.tracker.journal:
+                self.tracker.journal.record(data)
+            self._observe_feed_lag(data)
+            
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            if not self.tracker.is_csgo_item(data):
+                return
                 
-                if not self.tracker.is_csgo_item(data):
+            event_type = data.get('event')
+            item_id = str(data['id'])
+
+            if event_type == 'obtained_skin_added':
+                if self._is_duplicate_new_item(item_id):
+                    return
+                
+                if 'Case' in data.get('name', ''):
                     return
-                    
-                event_type = data.get('event')
-                item_id = str(data['id'])
-
-                if event_type == 'obtained_skin_added':
-                    if self._is_duplicate_new_item(item_id):
-                        return
-                    
-                    self.active_items[item_id] = {
-                        'appear_time': current_time,
-                        'data': data
-                    }
-                    await self.process_new_item(data, current_time)
-                    
-                elif event_type == 'obtained_skin_deleted':
-                    if self._is_duplicate_sold_item(item_id):
-                        return
-                    
-                    if item_id in self.active_items:
-                        item_data = self.active_items[item_id]
-                        await self.process_sold_item(
-                            item_data['data'], 
-                            item_data['appear_time'], 
-                            current_time
-                        )
-                        del self.active_items[item_id]
-
-            except Exception as e:
-                logger.error(f"Ошибка обработки события: {e}")
+                
+                strategies = self._evaluate_strategies(data, config)
+                with CRITERIA_SECONDS.time():
+                    check_result = self._check_item_criteria(
+                        data.get('name', ''), data.get('item_float'), data.get('stickers', []), config
+                    )
+                
+                # Продажу отслеживаем только для предметов, прошедших критерии
+                if check_result['matches']:
+                    self.tracker.active_listings.set(item_id, ActiveListing(data, check_result))
+                
+                is_buy = any(s.action == ACTION_BUY for s in strategies)
+                # Без покупки, совпадения критериев и стратегии оповещения задаче делать нечего
+                if not (is_buy or check_result['matches'] or strategies):
+                    return
+                # Повторная публикация того же id отсекается, пока первая ещё в работе
+                self.tracker.sent_new_items.set(item_id)
+                lane = LANE_AUTOBUY if is_buy else LANE_ALERT
+                # Задача не принята или вытеснена: повторная публикация ещё может быть обработана
+                release = partial(self.tracker.sent_new_items.pop, item_id)
+                if not self.tracker.pipeline.submit(
+                    lane, self.process_new_item, data, current_time, strategies, config, check_result,
+                    on_evict=release
+                ):
+                    release()
+                
+            elif event_type == 'obtained_skin_deleted':
+                if self._is_duplicate_sold_item(item_id):
+                    return
+                
+                listing = self.tracker.active_listings.pop(item_id)
+                if listing:
+                    self.tracker.pipeline.submit(LANE_SOLD, self.process_sold_item, listing, current_time)
+
+        except Exception as e:
+            logger.error(f"Ошибка обработки события: {e}")
+
+    def _evaluate_strategies(self, data: Dict[str, Any], config=None) -> List[Strategy]:
+        """Стратегии, под которые подходит предмет"""
+        config = config or self.runtime.current
+        with STRATEGIES_SECONDS.time():
+            return config.strategy_engine.evaluate(data)
+
+    @staticmethod
+    def _observe_feed_lag(data: Dict[str, Any]):
+        """Учёт отставания, если в публикации есть время события"""
+        for field in FEED_TIMESTAMP_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            try:
+                if isinstance(value, (int, float)):
+                    timestamp = value / 1000 if value > 1e11 else value
+                else:
+                    timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+            except (ValueError, TypeError):
+                continue
+            FEED_LAG_SECONDS.observe(max(0.0, time.time() - timestamp))
+            return
 
     def _is_duplicate_new_item(self, item_id: str) -> bool:
         """Проверка на дубликат нового предмета"""
         if item_id in self.tracker.sent_new_items:
-            time_diff = datetime.now() - self.tracker.sent_new_items[item_id]
-            if time_diff < timedelta(minutes=30):
-                logger.debug(f"Пропускаем дубликат нового предмета {item_id}")
-                return True
+            logger.debug(f"Пропускаем дубликат нового предмета {item_id}")
+            return True
         return False
 
     def _is_duplicate_sold_item(self, item_id: str) -> bool:
         """Проверка на дубликат проданного предмета"""
         if item_id in self.tracker.sent_sold_items:
-            time_diff = datetime.now() - self.tracker.sent_sold_items[item_id]
-            if time_diff < timedelta(minutes=30):
-                logger.debug(f"Пропускаем дубликат продажи {item_id}")
-                return True
+            logger.debug(f"Пропускаем дубликат продажи {item_id}")
+            return True
         return False
 
-    async def process_new_item(self, data: Dict[str, Any], appear_time: str):
+    async def process_new_item(self, data: Dict[str, Any], appear_time: str,
+                               strategies: Optional[List[Strategy]] = None, config=None,
+                               check_result: Optional[Dict[str, Any]] = None):
         """Обработка нового предмета"""
+        config = config or self.runtime.current
         try:
             item_name = data.get('name', '')
             item_id = data.get('id')
@@ -106,51 +234,24 @@ class CSGOEventHandler(SubscriptionEventHandler):
             item_float = data.get('item_float')
             stickers = data.get('stickers', [])
             
-            if 'Case' in item_name:
-                return
+            if strategies is None:
+                strategies = self._evaluate_strategies(data, config)
             
             # --- [AUTOBUY BLOCK] ---
-            if(item_float is not None and not any(word.lower() in item_name.lower() for word in AUTO_BUY_SETTINGS['EXCLUDED_KEYWORDS'])):
-                try:
-                    skin_float = float(item_float)
-                    if skin_float < 0.001 and price <= 15:
-                        logger.info(f"Попыка автобая: {item_name} | Float: {skin_float} | Price: {price}")
-                        try:
-                            result = await self.purchaser.buy_skin(item_id, max_price=price)
-                            if result:
-                                message = (
-                                    f"✅ <b>Автопокупка успешна!</b>\n"
-                                    f"Название: {item_name}\n"
-                                    f"Float: {skin_float}\n"
-                                    f"Цена: USD: {price}\n"
-                                    f"      RUB: {rateRUB * price} \n"
-                                    f"      CNY: {rateCNY * price} \n"
-                                    f"ID: {item_id}"
-                                )
-                                await self.tracker.send_alert(message)
-                        except Exception as e:
-                            logger.error(f"Автопокупка не удалась: {e}")
-                            self.tracker.send_alert(f"Автопокупка не удалась: {e}")
-                except Exception as e:
-                    logger.error(f"Ошибка при попытке автобая: {e}")
+            buy_strategy = next((s for s in strategies if s.action == ACTION_BUY), None)
+            if buy_strategy:
+                await self._auto_buy(data, buy_strategy)
             # --- END [AUTOBUY BLOCK]
 
-            if (price <= 10 and any(any(word in sticker.get('name', '').lower() for word in CHARM_KEYWORDS) for sticker in stickers)):
-                logger.info(f"🛒 Автопокупка скина с брелком: {item_name} (Цена: {price}₽)")
-                await self.tracker.auto_buy_skin(item_id, price)
-                asyncio.create_task(
-                    self.tracker.send_alert(
-                        f"🛒 <b>Автопокупка скина с брелком!</b>\n"
-                        f"{item_name}\n"
-                        f"Цена: {price}₽\n"
-                        f"ID: {item_id}"
-                    )
-                )
-
             # Проверяем критерии
-            check_result = self._check_item_criteria(item_float, stickers)
+            if check_result is None:
+                with CRITERIA_SECONDS.time():
+                    check_result = self._check_item_criteria(item_name, item_float, stickers, config)
+            # Копия: исходный результат хранится в ActiveListing
+            check_result = {**check_result,
+                            'strategies': [s.name for s in strategies if s.action == ACTION_ALERT]}
             
-            if check_result['matches']:
+            if check_result['matches'] or check_result['strategies']:
                 message = self._format_new_item_message(
                     data, appear_time, check_result
                 )
@@ -159,40 +260,69 @@ class CSGOEventHandler(SubscriptionEventHandler):
                           f"Stickers: {len(check_result['stickers'])}, "
                           f"Charms: {len(check_result['charms'])}")
                 
-                await self.tracker.send_alert(message, item_id, price)
-                self.tracker.sent_new_items[str(item_id)] = datetime.now()
+                self.tracker.send_alert(message, item_id, price)
                 
         except Exception as e:
             logger.error(f"Ошибка обработки нового предмета: {e}")
 
-    async def process_sold_item(self, data: Dict[str, Any], appear_time: str, sold_time: str):
-        """Обработка проданного предмета"""
-        if 'Case' in data.get('name', ''):
+    async def _auto_buy(self, data: Dict[str, Any], strategy: Strategy):
+        """Автопокупка предмета по стратегии"""
+        item_name = data.get('name', '')
+        item_id = data.get('id')
+        price = data.get('price')
+        item_float = data.get('item_float')
+        
+        logger.info(f"🛒 Попытка автобая [{strategy.name}]: {item_name} | Float: {item_float} | Price: {price}")
+        try:
+            result = await self.tracker.auto_buy_skin(
+                item_id, price, strategy.max_price_multiplier, strategy.expected_value
+            )
+        except BudgetExceeded:
+            # Отказ ограничителя уже залогирован, оповещение о неудаче не шлём
             return
         
+        if result:
+            message = (
+                f"✅ <b>Автопокупка успешна!</b> ({strategy.name})\n"
+                f"Название: {item_name}\n"
+                f"Float: {item_float}\n"
+                f"Цена: USD: {price}\n"
+                f"      RUB: {fx_rates.convert(price, 'RUB')} \n"
+                f"      CNY: {fx_rates.convert(price, 'CNY')} \n"
+                f"ID: {item_id}"
+            )
+        else:
+            message = (
+                f"❌ <b>Автопокупка не удалась</b> ({strategy.name})\n"
+                f"Название: {item_name}\n"
+                f"ID: {item_id}"
+            )
+        
+        # Статус трейда дописывается в это же сообщение после его отправки
+        on_sent = None
+        status_tracker = self.tracker.status_tracker
+        if result and status_tracker:
+            purchase_id = result.get('purchase_id')
+            on_sent = lambda sent: status_tracker.track(purchase_id, sent.chat_id, sent.message_id,
+                                                          message, item_id)
+        self.tracker.send_alert(message, priority=PRIORITY_HIGH, on_sent=on_sent)
+
+    async def process_sold_item(self, listing: ActiveListing, sold_time: str):
+        """Обработка проданного предмета; критерии уже проверены при появлении"""
         try:
-            item_name = data.get('name', '')
-            item_id = data.get('id')
-            item_float = data.get('item_float')
-            stickers = data.get('stickers', [])
+            duration = self.format_duration(time.monotonic() - listing.appeared)
+            message = self._format_sold_item_message(listing, sold_time, duration)
             
-            check_result = self._check_item_criteria(item_float, stickers)
-            
-            if check_result['matches']:
-                duration = self.calculate_duration(appear_time, sold_time)
-                message = self._format_sold_item_message(
-                    data, appear_time, sold_time, duration, check_result
-                )
-                
-                logger.info(f"[SOLD] {data['name']}")
-                await self.tracker.send_alert(message)
-                self.tracker.sent_sold_items[str(item_id)] = datetime.now()
+            logger.info(f"[SOLD] {listing.name}")
+            self.tracker.send_alert(message, priority=PRIORITY_LOW)
+            self.tracker.sent_sold_items.set(str(listing.item_id))
                 
         except Exception as e:
             logger.error(f"Ошибка обработки проданного предмета: {e}")
 
-    def _check_item_criteria(self, item_float: Any, stickers: List[Dict]) -> Dict:
+    def _check_item_criteria(self, item_name: str, item_float: Any, stickers: List[Dict], config=None) -> Dict:
         """Проверка критериев предмета"""
+        config = config or self.runtime.current
         result = {
             'matches': False,
             'matches_float': False,
@@ -205,11 +335,9 @@ class CSGOEventHandler(SubscriptionEventHandler):
         if item_float is not None:
             try:
                 skin_float = float(item_float)
-                for range_min, range_max in self.float_ranges:
-                    if range_min <= skin_float <= range_max:
-                        result['matches_float'] = True
-                        result['float_value'] = skin_float
-                        break
+                if config.float_rules.matches(item_name, skin_float):
+                    result['matches_float'] = True
+                    result['float_value'] = skin_float
             except (ValueError, TypeError):
                 pass
         
@@ -217,32 +345,29 @@ class CSGOEventHandler(SubscriptionEventHandler):
         if stickers:
             for sticker in stickers:
                 sticker_name = sticker.get('name', '')
+                categories = config.keyword_matcher.classify(sticker_name)
+                if not categories:
+                    continue
                 
-                for keyword in STICKER_KEYWORDS:
-                    if keyword.lower() in sticker_name.lower():
-                        result['stickers'].append({
-                            'name': sticker_name,
-                            'wear': sticker.get('wear', 0),
-                            'slot': sticker.get('slot', 0)
-                        })
-                        break
+                if CATEGORY_STICKERS in categories:
+                    result['stickers'].append({
+                        'name': sticker_name,
+                        'wear': sticker.get('wear', 0),
+                        'slot': sticker.get('slot', 0)
+                    })
                 
-                for keyword in CHARM_KEYWORDS:
-                    if keyword.lower() in sticker_name.lower():
-                        result['charms'].append({
-                            'name': sticker_name,
-                            'wear': sticker.get('wear', 0),
-                            'slot': sticker.get('slot', 0)
-                        })
-                        break
+                if CATEGORY_CHARMS in categories:
+                    result['charms'].append({
+                        'name': sticker_name,
+                        'wear': sticker.get('wear', 0),
+                        'slot': sticker.get('slot', 0)
+                    })
                 
-                for keyword in HIGHLIGHT_KEYWORDS:
-                    if keyword.lower() in sticker_name.lower():
-                        result['highlights'].append({
-                            'name': sticker_name,
-                            'slot': sticker.get('slot', 0)
-                        })
-                        break
+                if CATEGORY_HIGHLIGHTS in categories:
+                    result['highlights'].append({
+                        'name': sticker_name,
+                        'slot': sticker.get('slot', 0)
+                    })
         
         result['matches'] = (result['matches_float'] or 
                            result['stickers'] or 
@@ -280,14 +405,17 @@ class CSGOEventHandler(SubscriptionEventHandler):
                         ])
             reasons.append(f"💎 Хайлайты:\n{highlight_text}")
         
+        if check_result.get('strategies'):
+            reasons.append(f"📋 Стратегии: {', '.join(check_result['strategies'])}")
+        
         message = (
             f"<b>🆕 НОВЫЙ СКИН </b>\n"
             f"⏱ Появился: {appear_time}\n"
             f"Название: {data.get('name')}\n"
             f"Цена: ${data.get('price')}\n"
             f"Цена: USD: {data.get('price')}\n"  
-            f"      RUB: {rateRUB * data.get('price')} \n"
-            f"      CNY: {rateCNY * data.get('price')} \n"
+            f"      RUB: {fx_rates.convert(data.get('price'), 'RUB')} \n"
+            f"      CNY: {fx_rates.convert(data.get('price'), 'CNY')} \n"
             f"Float: {data.get('item_float')}\n"
             f"ID: {data.get('id')}\n\n"
             f"Причины уведомления:\n" + "\n".join(reasons)
@@ -299,10 +427,10 @@ class CSGOEventHandler(SubscriptionEventHandler):
         
         return message
 
-    def _format_sold_item_message(self, data: Dict, appear_time: str, 
-                                 sold_time: str, duration: str, 
-                                 check_result: Dict) -> str:
+    def _format_sold_item_message(self, listing: ActiveListing, sold_time: str, duration: str) -> str:
         """Форматирование сообщения о проданном предмете"""
+        check_result = listing.check_result
+        appear_time = datetime.fromtimestamp(listing.appeared_at).strftime("%Y-%m-%d %H:%M:%S")
         details = []
         
         if check_result['matches_float']:
@@ -319,25 +447,17 @@ class CSGOEventHandler(SubscriptionEventHandler):
             f"⏱ Появился: {appear_time}\n"
             f"🛒 Продан: {sold_time}\n"
             f"⏳ Время на продажу: {duration}\n"
-            f"Название: {data.get('name', 'N/A')}\n"
-            f"Цена: ${data.get('price', 'N/A')}\n"
+            f"Название: {listing.name}\n"
+            f"Цена: ${listing.price}\n"
             f"{chr(10).join(details)}\n"
-            f"ID: {data.get('id', 'N/A')}"
+            f"ID: {listing.item_id}"
         )
         
         return message
 
-    def calculate_duration(self, start_time: str, end_time: str) -> str:
-        """Расчет продолжительности"""
-        try:
-            fmt = "%Y-%m-%d %H:%M:%S"
-            start = datetime.strptime(start_time, fmt)
-            end = datetime.strptime(end_time, fmt)
-            delta = end - start
-            
-            hours, remainder = divmod(delta.seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            return f"{hours}ч {minutes}м {seconds}с"
-        except Exception as e:
-            logger.error(f"Ошибка расчета времени: {e}")
-            return "N/A"
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        """Продолжительность в виде 'Xч Yм Zс'"""
+        hours, remainder = divmod(int(seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours}ч {minutes}м {seconds}с"
@@ -1,24 +1,45 @@
 """Главный модуль приложения"""
 import asyncio
 import logging
+import signal
+import sys
+
+# Супервизор построен на asyncio.TaskGroup и except*
+if sys.version_info < (3, 11):
+    sys.exit("❌ Нужен Python 3.11 или новее")
+
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from telegram import Update
 
-from config import TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, METRICS_HOST, METRICS_PORT,
+    PURCHASE_BOUGHT_CAPACITY, PURCHASE_BOUGHT_TTL,
+    GOVERNOR_RATE, GOVERNOR_BURST, GOVERNOR_SPEND_LIMITS, GOVERNOR_RESERVE, GOVERNOR_RESERVE_MIN_VALUE,
+    SUPERVISOR_MAX_RESTARTS, SUPERVISOR_RESTART_WINDOW, SUPERVISOR_RESTART_DELAY, SUPERVISOR_MAX_RESTART_DELAY
+)
 from tracker import CSGOSkinTracker
-from handlers import start_command, handle_purchase_callback
+from models import (
+    SkinPurchaser, SingleFlightPurchaser, PurchaseFlights,
+    SpendGovernor, GovernedPurchaser, PurchaseStatusTracker
+)
+from handlers import start_command, budget_command, reload_command, handle_purchase_callback
 from utils.logger import setup_logger
+from utils.metrics import MetricsServer
+from utils.fx_rates import fx_rates
+from utils.supervisor import Supervisor, SupervisorGaveUp, service
 
 logger = setup_logger(__name__)
 
 
-async def main():
-    """Главная функция приложения"""
+async def main() -> int:
+    """Главная функция приложения; код завершения процесса"""
     # Создаем Telegram приложение
     telegram_app = Application.builder().token(TELEGRAM_TOKEN).build()
     
     # Добавляем обработчики
     telegram_app.add_handler(CommandHandler("start", start_command))
+    telegram_app.add_handler(CommandHandler("budget", budget_command))
+    telegram_app.add_handler(CommandHandler("reload", reload_command))
     telegram_app.add_handler(CallbackQueryHandler(handle_purchase_callback))
     
     logger.info("📱 Инициализация Telegram бота...")
@@ -30,18 +51,87 @@ async def main():
     
     logger.info("✅ Telegram бот запущен и готов принимать команды")
     
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = MetricsServer(host=METRICS_HOST, port=METRICS_PORT)
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error(f"Не удалось запустить эндпоинт метрик: {e}")
+            metrics_server = None
+    
+    # Курсы валют обновляются в фоне, сообщения берут их из памяти
+    await fx_rates.load()
+    fx_rates.start()
+    
+    # Упавшие компоненты перезапускаются по отдельности внутри процесса
+    supervisor = Supervisor(
+        SUPERVISOR_MAX_RESTARTS, SUPERVISOR_RESTART_WINDOW,
+        SUPERVISOR_RESTART_DELAY, SUPERVISOR_MAX_RESTART_DELAY
+    )
+    
+    # Общий клиент покупок для автобая и кнопок Telegram
+    purchaser = SkinPurchaser()
+    supervisor.add('purchaser', service(purchaser.start, purchaser.close, purchaser.wait))
+    
+    # Ограничитель частоты и расходов для всех покупок
+    governor = SpendGovernor(
+        GOVERNOR_RATE, GOVERNOR_BURST, GOVERNOR_SPEND_LIMITS,
+        GOVERNOR_RESERVE, GOVERNOR_RESERVE_MIN_VALUE
+    )
+    telegram_app.bot_data['governor'] = governor
+    
+    # Один запрос на предмет, даже если автобай и кнопка сработали одновременно
+    flights = PurchaseFlights(PURCHASE_BOUGHT_CAPACITY, PURCHASE_BOUGHT_TTL)
+    # Покупка по кнопке - решение пользователя: резерв лимита ей доступен
+    telegram_app.bot_data['purchaser'] = SingleFlightPurchaser(
+        GovernedPurchaser(purchaser, governor, default_expected_value=float('inf')), flights
+    )
+    
+    autobuy_purchaser = GovernedPurchaser(purchaser, governor)
+    autobuy_purchaser = SingleFlightPurchaser(autobuy_purchaser, flights)
+    
     # Создаем и запускаем трекер
-    # Создаем и запускаем трекер
-    tracker = CSGOSkinTracker(telegram_app)
+    tracker = CSGOSkinTracker(telegram_app, purchaser=autobuy_purchaser)
+    tracker.state.register('bought', flights.bought)
+    telegram_app.bot_data['runtime_config'] = tracker.runtime
+    
+    # Один цикл опроса статусов для всех покупок, правки идут через очередь Telegram
+    status_tracker = PurchaseStatusTracker(purchaser, tracker.outbox)
+    supervisor.add('purchase_status', service(status_tracker.start, status_tracker.stop, status_tracker.wait))
+    telegram_app.bot_data['status_tracker'] = status_tracker
+    tracker.status_tracker = status_tracker
+    
+    # SIGTERM/SIGINT - штатная остановка с сохранением состояния
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, tracker.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
     
+    exit_code = 0
     try:
         # Запускаем трекер
-        await tracker.track_skins()
+        await tracker.track_skins(supervisor)
             
     except KeyboardInterrupt:
         logger.info("Получен сигнал остановки...")
         tracker.stop()
+    except SupervisorGaveUp as e:
+        exit_code = 1
+        logger.error(f"Компонент {e.component} исчерпал бюджет перезапусков: {e.error!r}")
+        try:
+            await telegram_app.bot.send_message(
+                chat_id=TELEGRAM_CHAT_ID,
+                text=f"❌ <b>Бот остановлен</b>\n\nКомпонент {e.component} падает слишком часто: "
+                     f"{str(e.error)[:200]}",
+                parse_mode="HTML"
+            )
+        except:
+            pass
     except Exception as e:
+        exit_code = 1
         logger.error(f"Критическая ошибка: {e}")
         import traceback
         traceback.print_exc()
@@ -50,7 +140,7 @@ async def main():
         try:
             await telegram_app.bot.send_message(
                 chat_id=TELEGRAM_CHAT_ID,
-                text=f"❌ <b>Критическая ошибка бота</b>\n\n{str(e)[:200]}...\n\nБот будет перезапущен.",
+                text=f"❌ <b>Критическая ошибка бота</b>\n\n{str(e)[:200]}...",
                 parse_mode="HTML"
             )
         except:
@@ -61,20 +151,37 @@ async def main():
         # Останавливаем трекер
         tracker.stop()
         
+        if metrics_server:
+            await metrics_server.stop()
+        
+        await status_tracker.stop()
+        await tracker.outbox.stop()
+        await fx_rates.stop()
+        await purchaser.close()
+        
         # Останавливаем Telegram
         await telegram_app.updater.stop()
         await telegram_app.stop()
         await telegram_app.shutdown()
         
         logger.info("✅ Программа завершена")
+    
+    return exit_code
 
 
-if __name__ == "__main__":
+def run() -> int:
+    """Запуск бота в текущем процессе; код завершения процесса"""
     try:
-        asyncio.run(main())
+        return asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Программа прервана пользователем")
+        return 0
     except Exception as e:
         logger.error(f"Фатальная ошибка: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -1,4 +1,10 @@
 """Модели приложения"""
 from .skin_purchaser import SkinPurchaser
+from .single_flight import SingleFlightPurchaser, PurchaseFlights
+from .float_rules import FloatRuleStore
+from .strategies import StrategyEngine, Strategy
+from .spend_governor import SpendGovernor, GovernedPurchaser, BudgetExceeded
+from .purchase_status import PurchaseStatusTracker
 
-__all__ = ['SkinPurchaser']
\ No newline at end of file
+__all__ = ['SkinPurchaser', 'SingleFlightPurchaser', 'PurchaseFlights', 'FloatRuleStore', 'StrategyEngine', 'Strategy',
+           'SpendGovernor', 'GovernedPurchaser', 'BudgetExceeded', 'PurchaseStatusTracker']
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Правила диапазонов float по предметам и степеням износа"""
+import json
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class FloatIntervalIndex:
+    """Отсортированный набор непересекающихся интервалов с поиском через bisect"""
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, ranges: Iterable[Sequence[float]]):
+        merged: List[List[float]] = []
+        for range_min, range_max in sorted((float(a), float(b)) for a, b in ranges):
+            if merged and range_min <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], range_max)
+            else:
+                merged.append([range_min, range_max])
+
+        self.starts = [r[0] for r in merged]
+        self.ends = [r[1] for r in merged]
+
+    def contains(self, value: float) -> bool:
+        """Попадает ли значение в один из интервалов (границы включительно)"""
+        pos = bisect_right(self.starts, value) - 1
+        return pos >= 0 and value <= self.ends[pos]
+
+    def ranges(self) -> List[Tuple[float, float]]:
+        return list(zip(self.starts, self.ends))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class FloatRuleStore:
+    """Хранилище диапазонов float.
+
+    Формат файла:
+        {
+            "default": [[min, max], ...],              # для всех предметов
+            "wear": {"Factory New": [[min, max]]},     # по степени износа
+            "items": {"AK-47 | Redline (Field-Tested)": [[min, max]]}
+        }
+
+    Предмет подходит, если float попадает в окно его названия,
+    его степени износа или в общее окно.
+    """
+
+    def __init__(self, default: Iterable[Sequence[float]] = (),
+                 wear: Optional[Dict[str, Iterable[Sequence[float]]]] = None,
+                 items: Optional[Dict[str, Iterable[Sequence[float]]]] = None):
+        self.default = FloatIntervalIndex(default)
+        self.wear = {name: FloatIntervalIndex(r) for name, r in (wear or {}).items()}
+        self.items = {name: FloatIntervalIndex(r) for name, r in (items or {}).items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FloatRuleStore':
+        return cls(data.get('default', []), data.get('wear', {}), data.get('items', {}))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FloatRuleStore':
+        """Загрузка правил из JSON файла; ошибки не перехватываются"""
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def load(cls, path: str) -> 'FloatRuleStore':
+        """Загрузка правил из JSON файла"""
+        try:
+            store = cls.from_file(path)
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Не удалось загрузить диапазоны float из {path}: {e}")
+            return cls()
+        logger.info(f"📐 Загружены диапазоны float: общих {len(store.default)}, "
+                    f"по износу {len(store.wear)}, по предметам {len(store.items)}")
+        return store
+
+    @staticmethod
+    def wear_of(item_name: str) -> Optional[str]:
+        """Степень износа из названия вида 'AK-47 | Redline (Field-Tested)'"""
+        if item_name.endswith(')'):
+            start = item_name.rfind('(')
+            if start != -1:
+                return item_name[start + 1:-1]
+        return None
+
+    def matches(self, item_name: str, skin_float: float) -> bool:
+        """Попадает ли float предмета в одно из его окон"""
+        index = self.items.get(item_name)
+        if index is not None and index.contains(skin_float):
+            return True
+
+        if self.wear:
+            wear = self.wear_of(item_name)
+            index = self.wear.get(wear) if wear else None
+            if index is not None and index.contains(skin_float):
+                return True
+
+        return self.default.contains(skin_float)
+
+    def index_for(self, item_name: str) -> Optional[FloatIntervalIndex]:
+        """Объединённый индекс окон предмета, None если действуют только общие"""
+        ranges = []
+        if item_name in self.items:
+            ranges.extend(self.items[item_name].ranges())
+        wear = self.wear_of(item_name) if self.wear else None
+        if wear in self.wear:
+            ranges.extend(self.wear[wear].ranges())
+        if not ranges:
+            return None
+        return FloatIntervalIndex(ranges + self.default.ranges())
+
+    def summary(self) -> str:
+        return (f"общие {self.default.ranges()}, по износу: {len(self.wear)}, "
+                f"по предметам: {len(self.items)}")
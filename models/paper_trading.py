@@ -0,0 +1,65 @@
+"""Заглушки покупателя и Telegram для бумажной торговли"""
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class PaperPurchaser:
+    """Записывает решения о покупке вместо запросов к API"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.decisions: List[Dict[str, Any]] = []
+
+    async def buy_skin(self, skin_id: int, max_price: Optional[float] = None,
+                       expected_value: Optional[float] = None) -> Dict[str, Any]:
+        """Покупка «на бумаге»"""
+        self.decisions.append({
+            'time': time.time(),
+            'id': skin_id,
+            'max_price': max_price,
+            'expected_value': expected_value,
+        })
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {
+            'purchase_id': f"paper_{len(self.decisions)}",
+            'skins': [{'id': skin_id, 'price': max_price, 'status': 'paper'}],
+        }
+
+
+class PaperBot:
+    """Записывает сообщения вместо отправки в Telegram"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.messages: List[Dict[str, Any]] = []
+        self.edits: List[Dict[str, Any]] = []
+
+    async def send_message(self, chat_id=None, text: str = '', parse_mode=None, reply_markup=None, **kwargs):
+        self.messages.append({
+            'time': time.time(),
+            'text': text,
+            'has_button': reply_markup is not None,
+        })
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return SimpleNamespace(chat_id=chat_id, message_id=len(self.messages))
+
+    async def edit_message_text(self, text: str = '', chat_id=None, message_id=None, parse_mode=None, **kwargs):
+        self.edits.append({
+            'time': time.time(),
+            'message_id': message_id,
+            'text': text,
+        })
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class PaperTelegramApp:
+    """Минимальная замена telegram.ext.Application для трекера"""
+
+    def __init__(self, bot: Optional[PaperBot] = None):
+        self.bot = bot or PaperBot()
+        self.bot_data: Dict[str, Any] = {}
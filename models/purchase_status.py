@@ -0,0 +1,209 @@
+"""Отслеживание статуса созданных покупок"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    PURCHASE_STATUS_INITIAL_DELAY, PURCHASE_STATUS_MAX_DELAY, PURCHASE_STATUS_BACKOFF,
+    PURCHASE_STATUS_TIMEOUT, PURCHASE_STATUS_BATCH
+)
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.supervisor import wait_task
+
+logger = setup_logger(__name__)
+
+STATUS_POLLS = metrics.counter('purchase_status_polls_total', 'Запросы статуса покупок')
+
+# Статусы предметов в покупке, после которых опрос прекращается
+FINAL_STATUSES = frozenset({'accepted', 'canceled', 'cancelled', 'return', 'returned', 'error', 'failed'})
+
+STATUS_LABELS = {
+    'processing': '⏳ обрабатывается',
+    'wait_accept': '📨 трейд отправлен, ожидает принятия',
+    'accepted': '✅ трейд принят',
+    'canceled': '❌ отменена',
+    'cancelled': '❌ отменена',
+    'return': '↩️ возврат средств',
+    'returned': '↩️ возврат средств',
+    'error': '❌ ошибка',
+    'failed': '❌ ошибка',
+}
+
+
+class _TrackedPurchase:
+    """Сообщение о покупке, ожидающее финального статуса.
+
+    item_id ограничивает статус одним предметом: пакетная покупка
+    (или повтор уже выполненной) даёт одну покупку на несколько сообщений.
+    """
+
+    __slots__ = ('purchase_id', 'chat_id', 'message_id', 'item_id', 'text', 'statuses',
+                 'delay', 'next_poll', 'started')
+
+    def __init__(self, purchase_id: str, chat_id, message_id: int, item_id: Optional[str],
+                 text: str, now: float, delay: float):
+        self.purchase_id = purchase_id
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.item_id = item_id
+        self.text = text
+        self.statuses: Tuple[str, ...] = ()
+        self.delay = delay
+        self.next_poll = now + delay
+        self.started = now
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.purchase_id, self.message_id
+
+    def statuses_from(self, info: Optional[Dict]) -> Tuple[str, ...]:
+        if not info:
+            return ()
+        skins = info.get('skins', [])
+        if self.item_id is not None:
+            skins = [skin for skin in skins if str(skin.get('id')) == self.item_id]
+        return tuple(skin.get('status') for skin in skins)
+
+
+class PurchaseStatusTracker:
+    """Фоновый опрос статусов покупок с обновлением сообщений в Telegram.
+
+    Все ожидающие покупки обслуживает один цикл: покупки, у которых
+    подошло время опроса, запрашиваются одним вызовом /market/info.
+    Интервал опроса начинается с initial_delay и растёт в backoff раз,
+    пока статус не меняется; при изменении статуса сбрасывается.
+    Покупки, которым опрос положен в ближайшие initial_delay секунд,
+    присоединяются к текущему запросу.
+    """
+
+    def __init__(self, purchaser, bot,
+                 initial_delay: float = PURCHASE_STATUS_INITIAL_DELAY,
+                 max_delay: float = PURCHASE_STATUS_MAX_DELAY,
+                 backoff: float = PURCHASE_STATUS_BACKOFF,
+                 timeout: float = PURCHASE_STATUS_TIMEOUT,
+                 batch_size: int = PURCHASE_STATUS_BATCH):
+        self.purchaser = purchaser
+        self.bot = bot
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.pending: Dict[Tuple[str, int], _TrackedPurchase] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.gauge('purchase_status_pending', 'Покупки в ожидании финального статуса',
+                      getter=lambda: len(self.pending))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self):
+        """Ожидание завершения цикла опроса (для супервизора)"""
+        await wait_task(self._task)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def track(self, purchase_id, chat_id, message_id: int, text: str, item_id=None):
+        """Начать отслеживание покупки в сообщении; text - исходный текст сообщения,
+        item_id - предмет, статус которого показывать (None - все предметы покупки)"""
+        if purchase_id is None or message_id is None:
+            return
+        now = asyncio.get_running_loop().time()
+        tracked = _TrackedPurchase(str(purchase_id), chat_id, message_id,
+                                   str(item_id) if item_id is not None else None,
+                                   text, now, self.initial_delay)
+        self.pending[tracked.key] = tracked
+        self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.pending:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            now = loop.time()
+            next_poll = min(tracked.next_poll for tracked in self.pending.values())
+            if next_poll > now:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), next_poll - now)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            # Покупки, чей опрос скоро, идут в тот же запрос
+            horizon = now + self.initial_delay
+            due = sorted(
+                (tracked for tracked in self.pending.values() if tracked.next_poll <= horizon),
+                key=lambda tracked: tracked.next_poll
+            )[:self.batch_size]
+            try:
+                await self._poll(due)
+            except Exception as e:
+                logger.error(f"Ошибка отслеживания покупок: {e}")
+
+    async def _poll(self, due: List[_TrackedPurchase]):
+        now = asyncio.get_running_loop().time()
+        STATUS_POLLS.inc()
+        try:
+            purchase_ids = list(dict.fromkeys(tracked.purchase_id for tracked in due))
+            infos = await self.purchaser.purchase_info(purchase_ids)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось получить статус покупок: {e}")
+            infos = []
+
+        by_id = {str(info.get('purchase_id')): info for info in infos}
+        edits = []
+        for tracked in due:
+            statuses = tracked.statuses_from(by_id.get(tracked.purchase_id))
+            changed = bool(statuses) and statuses != tracked.statuses
+            if changed:
+                tracked.statuses = statuses
+                edits.append(self._edit(tracked))
+
+            if statuses and all(status in FINAL_STATUSES for status in statuses):
+                logger.info(f"📦 Покупка {tracked.purchase_id} завершена: {', '.join(statuses)}")
+                del self.pending[tracked.key]
+            elif now - tracked.started > self.timeout:
+                logger.warning(f"⌛ Покупка {tracked.purchase_id} не завершилась, отслеживание остановлено")
+                del self.pending[tracked.key]
+            else:
+                self._reschedule(tracked, changed, now)
+
+        if edits:
+            await asyncio.gather(*edits)
+
+    def _reschedule(self, tracked: _TrackedPurchase, changed: bool, now: float):
+        if changed:
+            tracked.delay = self.initial_delay
+        else:
+            tracked.delay = min(tracked.delay * self.backoff, self.max_delay)
+        tracked.next_poll = now + tracked.delay
+
+    @staticmethod
+    def format_status(statuses: Tuple[str, ...]) -> str:
+        labels = [STATUS_LABELS.get(status, status) for status in statuses]
+        if len(set(labels)) == 1:
+            return labels[0]
+        return ', '.join(labels)
+
+    async def _edit(self, tracked: _TrackedPurchase):
+        text = f"{tracked.text}\n\nСтатус: {self.format_status(tracked.statuses)}"
+        try:
+            await self.bot.edit_message_text(
+                text, chat_id=tracked.chat_id, message_id=tracked.message_id, parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось обновить сообщение о покупке {tracked.purchase_id}: {e}")
@@ -0,0 +1,76 @@
+"""Одна покупка на предмет: общий запрос для одновременных попыток"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from utils.expiring import ExpiringMap
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+SHARED_ATTEMPTS = metrics.counter('buy_deduplicated_total', 'Попытки покупки без отдельного запроса',
+                                  {'reason': 'in_flight'})
+ALREADY_BOUGHT = metrics.counter('buy_deduplicated_total', 'Попытки покупки без отдельного запроса',
+                                 {'reason': 'already_bought'})
+
+
+class PurchaseFlights:
+    """Общее состояние покупок: запросы в полёте и уже купленные id.
+
+    Купленные id хранятся ttl секунд и не больше capacity штук,
+    чтобы память не росла.
+    """
+
+    def __init__(self, capacity: int = 10000, ttl: float = 7 * 24 * 3600):
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.bought = ExpiringMap(ttl, capacity)
+
+    def remember(self, key: str, result: Dict[str, Any]):
+        self.bought.set(key, result)
+
+    def is_bought(self, skin_id) -> bool:
+        return str(skin_id) in self.bought
+
+
+class SingleFlightPurchaser:
+    """Обёртка над покупателем с дедупликацией по id предмета.
+
+    Одновременные попытки купить один предмет ждут один общий запрос
+    и получают его результат. Повторная попытка после успешной покупки
+    возвращает сохранённый результат без запроса. Неудачные покупки
+    не запоминаются и могут быть повторены.
+    """
+
+    def __init__(self, purchaser, flights: PurchaseFlights):
+        self.purchaser = purchaser
+        self.flights = flights
+
+    async def buy_skin(self, skin_id: int, max_price: Optional[float] = None,
+                       expected_value: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        key = str(skin_id)
+
+        result = self.flights.bought.get(key)
+        if result is not None:
+            ALREADY_BOUGHT.inc()
+            logger.info(f"♻️ Предмет {skin_id} уже куплен, повторный запрос не отправляется")
+            return result
+
+        future = self.flights.in_flight.get(key)
+        if future is not None:
+            SHARED_ATTEMPTS.inc()
+            logger.info(f"♻️ Покупка {skin_id} уже выполняется, ждём её результат")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._buy(key, skin_id, max_price, expected_value))
+        self.flights.in_flight[key] = future
+        return await asyncio.shield(future)
+
+    async def _buy(self, key: str, skin_id: int, max_price: Optional[float],
+                   expected_value: Optional[float]) -> Optional[Dict[str, Any]]:
+        try:
+            result = await self.purchaser.buy_skin(skin_id, max_price=max_price, expected_value=expected_value)
+            if result:
+                self.flights.remember(key, result)
+            return result
+        finally:
+            self.flights.in_flight.pop(key, None)
@@ -1,44 +1,266 @@
 """Модуль для покупки скинов"""
+import asyncio
+import json
+import math
+import time
 import aiohttp
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import uuid
 
-from config import API_KEY, STEAM_PARTNER, STEAM_TOKEN, API_BUY_URL
+from config import (
+    API_KEY, STEAM_PARTNER, STEAM_TOKEN, API_BUY_URL, API_PURCHASE_INFO_URL, API_PURCHASE_INFO_PARAM,
+    PURCHASE_POOL_SIZE, PURCHASE_DNS_TTL, PURCHASE_KEEPALIVE_INTERVAL, PURCHASE_KEEPALIVE_URL,
+    PURCHASE_HEDGE_PERCENTILE, PURCHASE_HEDGE_WINDOW, PURCHASE_HEDGE_MIN_SAMPLES, PURCHASE_HEDGE_INITIAL_DELAY
+)
 from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.supervisor import wait_task
 
 logger = setup_logger(__name__)
 
+BUY_SECONDS = metrics.histogram('stage_seconds', 'Длительность этапов горячего пути', {'stage': 'buy_http'})
+BUY_OK = metrics.counter('buy_requests_total', 'Запросы покупки', {'result': 'ok'})
+BUY_FAILED = metrics.counter('buy_requests_total', 'Запросы покупки', {'result': 'error'})
+_HEDGE_HELP = 'Покупки с повторным (хеджирующим) запросом по победившему запросу'
+HEDGE_PRIMARY_WON = metrics.counter('buy_hedged_total', _HEDGE_HELP, {'winner': 'primary'})
+HEDGE_WON = metrics.counter('buy_hedged_total', _HEDGE_HELP, {'winner': 'hedge'})
+HEDGE_FAILED = metrics.counter('buy_hedged_total', _HEDGE_HELP, {'winner': 'none'})
+
 
 class SkinPurchaser:
-    """Класс для покупки скинов"""
-    
-    def __init__(self, api_key: str = API_KEY, partner: str = STEAM_PARTNER, token: str = STEAM_TOKEN):
+    """Класс для покупки скинов.
+
+    Держит одну долгоживущую сессию с пулом keep-alive соединений и кешем
+    DNS. start() заранее открывает pool_size соединений; дальше раз в
+    PURCHASE_KEEPALIVE_INTERVAL уходит один пинг на сессию, чтобы
+    соединение к API не закрылось. Остальные соединения пула живут до
+    keepalive_timeout или закрытия сервером и открываются заново при
+    всплеске покупок. Без start() сессия создаётся при первой покупке.
+
+    При hedge_percentile > 0 покупка, не получившая ответ за этот перцентиль
+    недавних задержек, дублируется тем же телом (и тем же custom_id) через
+    отдельную сессию. Используется первый успешный ответ, второй запрос
+    отменяется.
+    """
+
+    def __init__(self, api_key: str = API_KEY, partner: str = STEAM_PARTNER, token: str = STEAM_TOKEN,
+                 buy_url: str = API_BUY_URL, keepalive_url: str = PURCHASE_KEEPALIVE_URL,
+                 info_url: str = API_PURCHASE_INFO_URL, info_param: str = API_PURCHASE_INFO_PARAM,
+                 pool_size: int = PURCHASE_POOL_SIZE, hedge_percentile: float = PURCHASE_HEDGE_PERCENTILE):
         self.api_key = api_key
+        self.buy_url = buy_url
+        self.keepalive_url = keepalive_url
+        self.info_url = info_url
+        self.info_param = info_param
+        self.pool_size = pool_size
         self.partner = partner
         self.token = token
-        self.headers = {"Authorization": f"Bearer {self.api_key}"}
-        
-    async def buy_skin(self, skin_id: int, max_price: Optional[float] = None) -> Dict[str, Any]:
-        """Покупка одного скина"""
-        custom_id = f"tg_purchase_{skin_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        
-        data = {
-            "ids": [skin_id],
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.hedge_session: Optional[aiohttp.ClientSession] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+        self.hedge_percentile = hedge_percentile
+        self._latencies = deque(maxlen=PURCHASE_HEDGE_WINDOW)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        # Неизменная часть тела запроса сериализуется один раз
+        self._body_prefix = json.dumps({
             "partner": self.partner,
             "token": self.token,
-            "custom_id": custom_id,
-            "skip_unavailable": True
-        }
-        
+            "skip_unavailable": True,
+        })[:-1].encode() + b', "ids": ['
+
+    def _new_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size * 2,
+            ttl_dns_cache=PURCHASE_DNS_TTL,
+            keepalive_timeout=PURCHASE_KEEPALIVE_INTERVAL * 3,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = self._new_session()
+        return self.session
+
+    def _get_hedge_session(self) -> aiohttp.ClientSession:
+        """Отдельный пул для хеджирующих запросов"""
+        if self.hedge_session is None or self.hedge_session.closed:
+            self.hedge_session = self._new_session()
+        return self.hedge_session
+
+    async def start(self):
+        """Открытие пула соединений и запуск keep-alive"""
+        self._get_session()
+        await self._warm_up(self.pool_size)
+        if self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+        logger.info(f"🔗 Клиент покупок готов: соединений в пуле {self.pool_size}")
+
+    async def wait(self):
+        """Ожидание завершения keep-alive (для супервизора)"""
+        await wait_task(self._keepalive_task)
+
+    async def close(self):
+        """Остановка keep-alive и закрытие сессии"""
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            try:
+                await self._keepalive_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._keepalive_task = None
+        for session in (self.session, self.hedge_session):
+            if session and not session.closed:
+                await session.close()
+        self.session = None
+        self.hedge_session = None
+
+    async def _ping(self, session: aiohttp.ClientSession):
+        async with session.get(self.keepalive_url) as response:
+            await response.read()
+
+    async def _warm_up(self, connections: int):
+        """Параллельные запросы, чтобы открыть сразу несколько соединений в каждой сессии"""
+        sessions = [self._get_session()]
+        if self.hedge_percentile:
+            sessions.append(self._get_hedge_session())
+        results = await asyncio.gather(
+            *(self._ping(session) for session in sessions for _ in range(connections)),
+            return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning(f"⚠️ Прогрев соединений: ошибок {len(failed)} из {len(results)}: {failed[0]}")
+
+    async def _keepalive_loop(self):
+        # Пинг каждого соединения пула - тысячи авторизованных запросов
+        # в сутки; одного достаточно, чтобы первая покупка не ждала рукопожатия
+        while True:
+            await asyncio.sleep(PURCHASE_KEEPALIVE_INTERVAL)
+            await self._warm_up(1)
+
+    def _build_body(self, skin_id: int, custom_id: str, max_price: Optional[float]) -> bytes:
+        """Тело запроса: к готовому префиксу добавляются только id, custom_id и цена"""
+        tail = f'{int(skin_id)}], "custom_id": "{custom_id}"'
         if max_price:
-            data["max_price"] = max_price
-            
-        async with aiohttp.ClientSession() as session:
-            async with session.post(API_BUY_URL, headers=self.headers, json=data) as response:
-                if response.status in [200, 201]:
-                    result = await response.json()
-                    return result.get('data', result)
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"Ошибка покупки: {error_text}")
\ No newline at end of file
+            tail += f', "max_price": {json.dumps(max_price)}'
+        return self._body_prefix + tail.encode() + b'}'
+
+    async def buy_skin(self, skin_id: int, max_price: Optional[float] = None,
+                       expected_value: Optional[float] = None) -> Dict[str, Any]:
+        """Покупка одного скина.
+
+        Один id на запрос намеренно: max_price в /market/buy ограничивает
+        сумму всей покупки, и в общем запросе один предмет мог бы занять
+        лимит остальных.
+
+        expected_value здесь не используется: параметр - часть общего
+        интерфейса покупателей (GovernedPurchaser, SingleFlightPurchaser,
+        PaperPurchaser), чтобы трекер вызывал любой из них одинаково.
+        """
+        custom_id = f"tg_purchase_{skin_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        body = self._build_body(skin_id, custom_id, max_price)
+
+        self.requests += 1
+        started = time.perf_counter()
+        try:
+            if self.hedge_percentile:
+                result = await self._hedged_post(body)
+            else:
+                result = await self._post(self._get_session(), body)
+            BUY_OK.inc()
+            return result
+        except Exception:
+            BUY_FAILED.inc()
+            raise
+        finally:
+            BUY_SECONDS.observe(time.perf_counter() - started)
+
+    async def _post(self, session: aiohttp.ClientSession, body: bytes) -> Dict[str, Any]:
+        async with session.post(self.buy_url, data=body) as response:
+            if response.status in [200, 201]:
+                result = await response.json()
+                return result.get('data', result)
+            else:
+                error_text = await response.text()
+                raise Exception(f"Ошибка покупки: {error_text}")
+
+    def _hedge_delay(self) -> float:
+        """Перцентиль недавних задержек (ближайший ранг)"""
+        if len(self._latencies) < PURCHASE_HEDGE_MIN_SAMPLES:
+            return PURCHASE_HEDGE_INITIAL_DELAY
+        ordered = sorted(self._latencies)
+        rank = max(1, math.ceil(self.hedge_percentile * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    async def _hedged_post(self, body: bytes) -> Dict[str, Any]:
+        """Запрос с повтором по отдельному соединению, если ответ задерживается.
+
+        Задержка покупки считается от отправки основного запроса до первого
+        успешного ответа, чей бы он ни был: отменённый медленный основной
+        запрос иначе выпал бы из окна, и перцентиль сползал бы вниз.
+        """
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._post(self._get_session(), body))
+        hedge: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay())
+            if done:
+                result = primary.result()
+                self._latencies.append(time.perf_counter() - started)
+                return result
+
+            self.hedged += 1
+            logger.info("⏱️ Нет ответа на покупку, отправляем хеджирующий запрос")
+            hedge = asyncio.ensure_future(self._post(self._get_hedge_session(), body))
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._latencies.append(time.perf_counter() - started)
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            HEDGE_WON.inc()
+                        else:
+                            HEDGE_PRIMARY_WON.inc()
+                        return task.result()
+
+            HEDGE_FAILED.inc()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def purchase_info(self, purchase_ids: List[int]) -> List[Dict[str, Any]]:
+        """Информация о нескольких покупках одним запросом"""
+        params = [(self.info_param, str(purchase_id)) for purchase_id in purchase_ids]
+        session = self._get_session()
+        async with session.get(self.info_url, params=params) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Ошибка получения статуса покупок: {error_text}")
+            result = await response.json()
+            return result.get('data', [])
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_rate': round(self.hedged / self.requests, 3) if self.requests else 0,
+            'hedge_wins': self.hedge_wins,
+            'win_rate': round(self.hedge_wins / self.hedged, 3) if self.hedged else 0,
+            'delay': round(self._hedge_delay(), 4) if self.hedge_percentile else None,
+        }
@@ -0,0 +1,128 @@
+"""Ограничение скорости и расходов автоматических покупок"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.rate_limit import RollingSum, TokenBucket
+
+logger = setup_logger(__name__)
+
+# Окна лимитов расходов: (длина окна в секундах, количество корзин)
+SPEND_WINDOWS = {
+    'minute': (60, 60),
+    'hour': (3600, 60),
+    'day': (86400, 96),
+}
+
+
+class BudgetExceeded(Exception):
+    """Покупка отклонена ограничителем"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class SpendGovernor:
+    """Токен-бакет на запросы покупки и скользящие лимиты расходов.
+
+    Последняя доля reserve каждого лимита доступна только покупкам
+    с ожидаемой ценностью не ниже reserve_min_value: когда бюджет
+    заканчивается, дешёвые кандидаты отсекаются первыми, а остаток
+    достаётся самым выгодным.
+    """
+
+    def __init__(self, rate: float, burst: int, limits: Dict[str, Optional[float]],
+                 reserve: float = 0.0, reserve_min_value: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.limits = {name: limit for name, limit in limits.items() if limit}
+        self.spent = {
+            name: RollingSum(*SPEND_WINDOWS[name], clock=clock) for name in self.limits
+        }
+        self.reserve = reserve
+        self.reserve_min_value = reserve_min_value
+        self.rejections: Dict[str, int] = {}
+
+        for name, limit in self.limits.items():
+            metrics.gauge('budget_remaining_usd', 'Остаток лимита расходов', {'window': name},
+                          getter=lambda name=name: self.remaining(name))
+
+    def remaining(self, window: str) -> float:
+        return round(self.limits[window] - self.spent[window].value(), 2)
+
+    def _reject(self, reason: str, message: str):
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        metrics.counter('buy_rejected_total', 'Покупки, отклонённые ограничителем', {'reason': reason}).inc()
+        logger.warning(f"🚧 Покупка отклонена: {message}")
+        raise BudgetExceeded(reason, message)
+
+    def admit(self, amount: Optional[float], expected_value: float = 0.0) -> Dict[str, int]:
+        """Проверка и резервирование суммы amount; BudgetExceeded при отказе.
+
+        Возвращает корзины резерва для settle(). Покупка без цены (None)
+        при заданных лимитах не допускается: оценить её расход нельзя.
+        """
+        if amount is None:
+            if self.limits:
+                self._reject("no_price", "покупка без ограничения цены не допускается при лимитах расходов")
+            amount = 0.0
+        for name, limit in self.limits.items():
+            spent = self.spent[name].value()
+            if spent + amount > limit:
+                self._reject(f"limit_{name}", f"лимит за {name} ({limit}$) исчерпан, потрачено {spent:.2f}$")
+            if spent + amount > limit * (1 - self.reserve) and expected_value < self.reserve_min_value:
+                self._reject(f"reserve_{name}",
+                             f"остаток лимита за {name} зарезервирован для покупок с ценностью "
+                             f"от {self.reserve_min_value}$")
+
+        if not self.bucket.try_acquire():
+            self._reject("rate", "превышена частота запросов покупки")
+
+        return {name: rolling.add(amount) for name, rolling in self.spent.items()}
+
+    def settle(self, buckets: Dict[str, int], reserved: float, actual: float):
+        """Корректировка после ответа: возврат неиспользованной суммы.
+
+        Поправка идёт в корзину резерва; если она уже вышла из окна,
+        поправлять нечего.
+        """
+        if actual != reserved:
+            for name, bucket in buckets.items():
+                self.spent[name].adjust(bucket, actual - reserved)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'remaining': {name: self.remaining(name) for name in self.limits},
+            'limits': dict(self.limits),
+            'tokens': round(self.bucket.available(), 2),
+            'rejections': dict(self.rejections),
+        }
+
+
+class GovernedPurchaser:
+    """Обёртка над покупателем, пропускающая покупки через SpendGovernor"""
+
+    def __init__(self, purchaser, governor: SpendGovernor, default_expected_value: float = 0.0):
+        self.purchaser = purchaser
+        self.governor = governor
+        self.default_expected_value = default_expected_value
+
+    async def buy_skin(self, skin_id: int, max_price: Optional[float] = None,
+                       expected_value: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        if expected_value is None:
+            expected_value = self.default_expected_value
+        buckets = self.governor.admit(max_price, expected_value)
+        reserved = max_price or 0.0
+
+        actual = 0.0
+        try:
+            result = await self.purchaser.buy_skin(skin_id, max_price=max_price)
+            if result:
+                skins = result.get('skins') or []
+                prices = [skin.get('price') for skin in skins if skin.get('price') is not None]
+                actual = sum(prices) if prices else reserved
+            return result
+        finally:
+            self.governor.settle(buckets, reserved, actual)
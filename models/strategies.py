@@ -0,0 +1,213 @@
+"""Декларативные стратегии автопокупки и оповещений"""
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ACTION_BUY = 'buy'
+ACTION_ALERT = 'alert'
+
+# Стоимость проверки условий: дешёвые сравнения чисел идут первыми,
+# поиск подстрок в названии и разбор наклеек — последними.
+_CONDITION_COST = {
+    'min_price': 0,
+    'max_price': 0,
+    'float_below': 1,
+    'min_float': 1,
+    'max_float': 1,
+    'paint_seeds': 2,
+    'name_excludes': 3,
+    'name_contains': 3,
+    'sticker_categories': 4,
+}
+
+
+class ItemView:
+    """Предмет из события с лениво вычисляемыми признаками"""
+
+    __slots__ = ('data', 'price', '_float', '_name', '_categories', '_classify')
+
+    _UNSET = object()
+
+    def __init__(self, data: Dict[str, Any], classify: Callable[[str], FrozenSet[str]]):
+        self.data = data
+        self.price = data.get('price')
+        self._float = self._UNSET
+        self._name = None
+        self._categories = None
+        self._classify = classify
+
+    @property
+    def float(self) -> Optional[float]:
+        if self._float is self._UNSET:
+            try:
+                value = self.data.get('item_float')
+                self._float = float(value) if value is not None else None
+            except (ValueError, TypeError):
+                self._float = None
+        return self._float
+
+    @property
+    def name(self) -> str:
+        if self._name is None:
+            self._name = self.data.get('name', '').lower()
+        return self._name
+
+    @property
+    def categories(self) -> FrozenSet[str]:
+        if self._categories is None:
+            found = frozenset()
+            for sticker in self.data.get('stickers') or ():
+                found = found | self._classify(sticker.get('name', ''))
+            self._categories = found
+        return self._categories
+
+
+class Predicate:
+    """Одно условие стратегии"""
+
+    __slots__ = ('key', 'cost', 'check')
+
+    def __init__(self, key: Tuple, cost: int, check: Callable[[ItemView], bool]):
+        self.key = key
+        self.cost = cost
+        self.check = check
+
+    def sort_key(self):
+        return (self.cost, repr(self.key))
+
+
+def _compile_condition(name: str, value: Any) -> Predicate:
+    """Условие из конфигурации -> предикат"""
+    if name == 'min_price':
+        value = float(value)
+        check = lambda item: item.price is not None and item.price >= value
+    elif name == 'max_price':
+        value = float(value)
+        check = lambda item: item.price is not None and item.price <= value
+    elif name == 'float_below':
+        value = float(value)
+        check = lambda item: item.float is not None and item.float < value
+    elif name == 'min_float':
+        value = float(value)
+        check = lambda item: item.float is not None and item.float >= value
+    elif name == 'max_float':
+        value = float(value)
+        check = lambda item: item.float is not None and item.float <= value
+    elif name == 'paint_seeds':
+        value = frozenset(int(seed) for seed in value)
+        check = lambda item: item.data.get('item_paint_seed') in value
+    elif name == 'name_excludes':
+        value = tuple(word.lower() for word in value)
+        check = lambda item: not any(word in item.name for word in value)
+    elif name == 'name_contains':
+        value = tuple(word.lower() for word in value)
+        check = lambda item: any(word in item.name for word in value)
+    elif name == 'sticker_categories':
+        value = frozenset(value)
+        check = lambda item: not value.isdisjoint(item.categories)
+    else:
+        raise ValueError(f"Неизвестное условие стратегии: {name}")
+
+    key = (name, tuple(sorted(value, key=repr)) if isinstance(value, (tuple, frozenset)) else value)
+    return Predicate(key, _CONDITION_COST[name], check)
+
+
+class Strategy:
+    """Стратегия: набор условий и действие.
+
+    expected_value - ожидаемая выгода от покупки в долларах; по ней
+    ограничитель расходов решает, кому достанется остаток бюджета.
+    """
+
+    __slots__ = ('name', 'action', 'max_price_multiplier', 'predicates', 'order', 'expected_value')
+
+    def __init__(self, name: str, action: str, predicates: List[Predicate],
+                 max_price_multiplier: float = 1.0, order: int = 0, expected_value: float = 0.0):
+        if action not in (ACTION_BUY, ACTION_ALERT):
+            raise ValueError(f"Неизвестное действие стратегии {name}: {action}")
+        self.name = name
+        self.action = action
+        self.max_price_multiplier = max_price_multiplier
+        self.predicates = sorted(predicates, key=Predicate.sort_key)
+        self.order = order
+        self.expected_value = expected_value
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any], order: int = 0) -> 'Strategy':
+        predicates = [
+            _compile_condition(name, value)
+            for name, value in spec.get('conditions', {}).items()
+        ]
+        return cls(
+            spec['name'],
+            spec.get('action', ACTION_ALERT),
+            predicates,
+            float(spec.get('max_price_multiplier', 1.0)),
+            order,
+            float(spec.get('expected_value', 0.0)),
+        )
+
+
+class _Node:
+    """Узел дерева предикатов: общий префикс условий нескольких стратегий"""
+
+    __slots__ = ('predicate', 'children', 'strategies')
+
+    def __init__(self, predicate: Optional[Predicate]):
+        self.predicate = predicate
+        self.children: List['_Node'] = []
+        self.strategies: List[Strategy] = []
+
+
+class StrategyEngine:
+    """Компилирует стратегии в дерево предикатов.
+
+    Условия каждой стратегии упорядочены от дешёвых к дорогим, а стратегии
+    с одинаковым префиксом условий делят узлы дерева. Ложное условие
+    отсекает сразу всё поддерево, поэтому одно событие проверяет каждое
+    общее условие не более одного раза.
+    """
+
+    def __init__(self, strategies: Iterable[Dict[str, Any]],
+                 classify: Callable[[str], FrozenSet[str]]):
+        self.strategies = [Strategy.from_dict(spec, i) for i, spec in enumerate(strategies)]
+        self.classify = classify
+        self.root = _Node(None)
+        for strategy in self.strategies:
+            self._insert(strategy)
+        self.has_buy = any(s.action == ACTION_BUY for s in self.strategies)
+
+    def _insert(self, strategy: Strategy):
+        node = self.root
+        for predicate in strategy.predicates:
+            for child in node.children:
+                if child.predicate.key == predicate.key:
+                    node = child
+                    break
+            else:
+                child = _Node(predicate)
+                node.children.append(child)
+                node.children.sort(key=lambda n: n.predicate.sort_key())
+                node = child
+        node.strategies.append(strategy)
+
+    def evaluate(self, data: Dict[str, Any]) -> List[Strategy]:
+        """Все стратегии, условия которых выполнены, в порядке объявления"""
+        item = ItemView(data, self.classify)
+        matched: List[Strategy] = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.predicate is not None and not node.predicate.check(item):
+                continue
+            matched.extend(node.strategies)
+            stack.extend(node.children)
+
+        if len(matched) > 1:
+            matched.sort(key=lambda s: s.order)
+        return matched
+
+    def describe(self) -> str:
+        return ", ".join(f"{s.name} ({s.action})" for s in self.strategies)
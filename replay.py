@@ -0,0 +1,122 @@
+"""Воспроизведение журнала публикаций через обработчик с бумажной торговлей
+
+Примеры:
+    python replay.py journal.jsonl.gz                 # максимальная скорость
+    python replay.py journal.jsonl --speed 1          # в реальном времени
+    python replay.py journal.jsonl --speed 10 --decisions decisions.jsonl
+"""
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from handlers.websocket_handler import CSGOEventHandler
+from models.paper_trading import PaperBot, PaperPurchaser, PaperTelegramApp
+from tracker.skin_tracker import CSGOSkinTracker
+from utils.journal import read_journal
+from utils.telegram_outbox import TelegramOutbox
+from utils.logger import setup_logger
+
+logger = setup_logger("Replay")
+
+
+def create_paper_tracker(purchase_latency: float = 0.0,
+                         telegram_latency: float = 0.0,
+                         purchaser=None) -> CSGOSkinTracker:
+    """Трекер с заглушками вместо API покупок и Telegram.
+
+    purchaser заменяет PaperPurchaser (бенчмарк передаёт SkinPurchaser
+    с локальным рынком). В отличие от main.py, покупатель не оборачивается
+    в GovernedPurchaser и SingleFlightPurchaser: лимиты расходов отклоняли
+    бы большую часть решений, и прогон мерил бы ограничитель, а не обработчик.
+    """
+    bot = PaperBot(latency=telegram_latency)
+    tracker = CSGOSkinTracker(
+        PaperTelegramApp(bot),
+        bot=bot,
+        purchaser=purchaser or PaperPurchaser(latency=purchase_latency),
+    )
+    tracker.journal = None
+    tracker.outbox = TelegramOutbox(bot, None)
+    return tracker
+
+
+async def replay(path: str, speed: float = 0.0,
+                 tracker: Optional[CSGOSkinTracker] = None) -> Dict[str, Any]:
+    """Прогон журнала. speed: 0 - максимальная скорость, 1 - реальное время, N - в N раз быстрее"""
+    tracker = tracker or create_paper_tracker()
+    handler = CSGOEventHandler(tracker, tracker.runtime)
+    tracker.pipeline.start()
+    tracker.outbox.start()
+
+    first_received = None
+    started = time.monotonic()
+    events = 0
+
+    for received_at, data in read_journal(path):
+        if speed > 0:
+            if first_received is None:
+                first_received = received_at
+            delay = (received_at - first_received) / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # На максимальной скорости не переполняем очередь, а ждём воркеров
+            while tracker.pipeline.depth() >= tracker.pipeline.queue_size:
+                await asyncio.sleep(0)
+
+        await handler.on_publication(SimpleNamespace(pub=SimpleNamespace(data=data)))
+        events += 1
+
+    ingested = time.monotonic() - started
+    await tracker.pipeline.join()
+    await tracker.outbox.join()
+    elapsed = time.monotonic() - started
+    await tracker.pipeline.stop()
+    await tracker.outbox.stop()
+
+    return {
+        'events': events,
+        'ingest_seconds': round(ingested, 3),
+        'total_seconds': round(elapsed, 3),
+        'events_per_second': round(events / elapsed, 1) if elapsed else None,
+        'buys': len(tracker.purchaser.decisions),
+        'alerts': len(tracker.bot.messages),
+        'pipeline': tracker.pipeline.stats(),
+    }
+
+
+def save_decisions(path: str, tracker: CSGOSkinTracker):
+    """Сохранение решений о покупках и уведомлениях в JSON Lines"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for decision in tracker.purchaser.decisions:
+            f.write(json.dumps({'type': 'buy', **decision}, ensure_ascii=False) + '\n')
+        for message in tracker.bot.messages:
+            f.write(json.dumps({'type': 'alert', **message}, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение журнала публикаций")
+    parser.add_argument("journal", help="Путь к журналу (.jsonl или .jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="0 - максимальная скорость, 1 - реальное время, N - в N раз быстрее")
+    parser.add_argument("--decisions", help="Файл для решений о покупках и уведомлениях")
+    parser.add_argument("--purchase-latency", type=float, default=0.0,
+                        help="Имитация задержки покупки, сек")
+    parser.add_argument("--telegram-latency", type=float, default=0.0,
+                        help="Имитация задержки Telegram, сек")
+    args = parser.parse_args()
+
+    tracker = create_paper_tracker(args.purchase_latency, args.telegram_latency)
+    stats = asyncio.run(replay(args.journal, args.speed, tracker))
+
+    if args.decisions:
+        save_decisions(args.decisions, tracker)
+
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
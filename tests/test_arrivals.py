@@ -0,0 +1,50 @@
+"""Слияние копий публикаций из нескольких подключений"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from handlers.websocket_handler import CSGOEventHandler
+from replay import create_paper_tracker
+from tracker.arrivals import ArrivalMerger
+from tracker.stream_cursor import StreamCursor
+
+
+def test_first_copy_wins_and_lead_is_credited_to_its_connection():
+    merger = ArrivalMerger(2, 60, 100)
+    with mock.patch('tracker.arrivals.time.monotonic', side_effect=[10.0, 10.25, 10.5]):
+        assert merger.accept((1, 'obtained_skin_added'), 1)
+        assert not merger.accept((1, 'obtained_skin_added'), 0)
+        # Другой тип события того же предмета - отдельная публикация
+        assert merger.accept((1, 'obtained_skin_deleted'), 0)
+
+    ws0, ws1 = merger.stats()
+    assert (ws0['first'], ws0['duplicates'], ws0['avg_lead_ms']) == (1, 1, None)
+    assert (ws1['first'], ws1['duplicates'], ws1['avg_lead_ms']) == (1, 0, 250.0)
+
+
+def test_copy_after_window_is_processed_again():
+    merger = ArrivalMerger(2, 0.05, 100)
+    assert merger.accept((1, 'obtained_skin_added'), 0)
+    time.sleep(0.06)
+    assert merger.accept((1, 'obtained_skin_added'), 1)
+
+
+def test_publication_from_two_connections_is_ingested_once():
+    async def run():
+        tracker = create_paper_tracker()
+        tracker.arrivals = ArrivalMerger(2, 60, 100)
+        handlers = [
+            CSGOEventHandler(tracker, tracker.runtime,
+                             SimpleNamespace(index=index, stream=StreamCursor(60), last_activity=0, events_count=0))
+            for index in range(2)
+        ]
+        data = {'id': 7, 'event': 'obtained_skin_deleted', 'game_id': 1, 'name': "AK-47 | Redline (Field-Tested)"}
+        for handler in handlers:
+            await handler.on_publication(SimpleNamespace(pub=SimpleNamespace(data=dict(data), offset=0)))
+        return tracker, handlers
+
+    tracker, handlers = asyncio.run(run())
+    assert tracker.events_count == 1
+    assert [handler.connection.events_count for handler in handlers] == [1, 1]
+    assert [stats['duplicates'] for stats in tracker.arrivals.stats()] == [0, 1]
@@ -0,0 +1,56 @@
+"""Пакетная проверка совпадает с обработкой событий по одному"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmark import SyntheticEventGenerator
+from config import AUTO_BUY_STRATEGIES, CHARM_AUTOBUY_STRATEGY
+from handlers.batch_evaluator import BatchEvaluator, EventBatch
+from handlers.websocket_handler import CSGOEventHandler
+from models.strategies import ACTION_ALERT, ACTION_BUY
+from tracker.runtime_config import RuntimeConfig
+from utils.keyword_matcher import default_keywords
+
+SPEC = {
+    'keywords': default_keywords(),
+    'float_ranges': {
+        'default': [[0.0, 0.01], [0.07, 0.071], [0.99, 1.0]],
+        'wear': {'Battle-Scarred': [[0.45, 0.5]]},
+        'items': {'AK-47 | Redline (Field-Tested)': [[0.15, 0.16]]},
+    },
+    'strategies': AUTO_BUY_STRATEGIES + [
+        CHARM_AUTOBUY_STRATEGY,
+        {'name': 'seeds', 'action': 'alert',
+         'conditions': {'paint_seeds': list(range(0, 1000, 10)), 'min_float': 0.1}},
+        {'name': 'awp', 'action': 'alert', 'conditions': {'name_contains': ['awp'], 'min_price': 50}},
+    ],
+}
+
+
+def test_batch_masks_match_per_event_decisions():
+    config = RuntimeConfig.build(SPEC, 1)
+    generator = SyntheticEventGenerator(seed=7, match_rate=0.1, delete_ratio=0, keyword_sticker_rate=0.3)
+    events = list(generator.events(400))
+    # Несколько предметов, которые обработчик отбрасывает по названию
+    events[::50] = [{**data, 'name': f"Case {data['id']}"} for data in events[::50]]
+
+    handler = CSGOEventHandler(None, SimpleNamespace(current=config))
+    expected_buy, expected_matches = [], []
+    for data in events:
+        if data['game_id'] != 1 or 'Case' in data['name']:
+            expected_buy.append(False)
+            expected_matches.append(False)
+            continue
+        strategies = handler._evaluate_strategies(data, config)
+        criteria = handler._check_item_criteria(data['name'], data['item_float'], data['stickers'], config)
+        expected_buy.append(any(s.action == ACTION_BUY for s in strategies))
+        expected_matches.append(bool(criteria['matches']) or any(s.action == ACTION_ALERT for s in strategies))
+
+    batch = EventBatch.from_events(events, config.keyword_matcher.classify)
+    result = BatchEvaluator(config.float_rules, config.strategy_engine).evaluate(batch)
+
+    # Пакет должен содержать все виды решений, иначе сравнение ничего не проверяет
+    assert 0 < sum(expected_buy) < len(events)
+    assert 0 < sum(expected_matches) < len(events)
+    np.testing.assert_array_equal(result['buy'], expected_buy)
+    np.testing.assert_array_equal(result['matches'], expected_matches)
@@ -0,0 +1,61 @@
+"""Покупки по кнопке идут через ограничитель расходов"""
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from handlers.telegram_handler import process_purchase
+from models.single_flight import PurchaseFlights, SingleFlightPurchaser
+from models.spend_governor import BudgetExceeded, GovernedPurchaser, SpendGovernor
+
+
+def _button_purchaser(inner):
+    governor = SpendGovernor(rate=100, burst=100, limits={'day': 10.0}, reserve=0.2, reserve_min_value=1.0)
+    governed = GovernedPurchaser(inner, governor, default_expected_value=float('inf'))
+    return SingleFlightPurchaser(governed, PurchaseFlights()), governor
+
+
+def test_button_buy_over_limit_raises_budget_exceeded():
+    inner = mock.AsyncMock()
+    purchaser, _ = _button_purchaser(inner)
+
+    with pytest.raises(BudgetExceeded):
+        asyncio.run(purchaser.buy_skin(1, max_price=11.0))
+    inner.buy_skin.assert_not_called()
+
+
+def test_button_buy_may_use_reserve():
+    inner = mock.AsyncMock()
+    inner.buy_skin.return_value = {'purchase_id': 7, 'skins': [{'price': 9.5}]}
+    purchaser, governor = _button_purchaser(inner)
+
+    assert asyncio.run(purchaser.buy_skin(1, max_price=9.5))['purchase_id'] == 7
+    assert governor.remaining('day') == 0.5
+
+
+def test_button_buy_over_limit_replies_to_user():
+    inner = mock.AsyncMock()
+    purchaser, _ = _button_purchaser(inner)
+    query = SimpleNamespace(edit_message_text=mock.AsyncMock(), message=None)
+    context = SimpleNamespace(bot_data={'purchaser': purchaser})
+
+    asyncio.run(process_purchase(query, 1, 20.0, context))
+
+    inner.buy_skin.assert_not_called()
+    text = query.edit_message_text.call_args.args[0]
+    assert 'отклонена ограничителем' in text
+    assert 'лимит за day' in text
+
+
+def test_button_buy_without_price_is_rejected():
+    inner = mock.AsyncMock()
+    purchaser, _ = _button_purchaser(inner)
+    query = SimpleNamespace(edit_message_text=mock.AsyncMock(), message=None)
+    context = SimpleNamespace(bot_data={'purchaser': purchaser})
+
+    # Кнопка старого формата с истёкшей записью: цена неизвестна
+    asyncio.run(process_purchase(query, 1, 0, context))
+
+    inner.buy_skin.assert_not_called()
+    assert 'без ограничения цены' in query.edit_message_text.call_args.args[0]
@@ -0,0 +1,41 @@
+"""Подпись цены в кнопках покупки"""
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from handlers.telegram_handler import handle_purchase_callback
+from utils.callback_store import encode_buy_callback, parse_buy_callback
+
+SECRET = 'test-secret'
+
+
+def test_signed_price_round_trip():
+    data = encode_buy_callback(123456789, 12.34, SECRET)
+
+    assert parse_buy_callback(data, SECRET) == (123456789, 12.34)
+    assert len(encode_buy_callback(2 ** 64, 99999.99, SECRET).encode()) <= 64
+
+
+def test_forged_or_unsigned_price_is_rejected():
+    item_id, cents, signature = encode_buy_callback(42, 5.0, SECRET)[len('buy_'):].split('_')
+
+    assert parse_buy_callback(f"buy_{item_id}_{10 ** 9}_{signature}", SECRET) is None
+    assert parse_buy_callback(f"buy_{item_id}_{cents}", SECRET) is None
+    assert parse_buy_callback(f"buy_{item_id}_{cents}_{signature}", 'other-secret') is None
+
+
+def test_legacy_button_carries_only_id():
+    assert parse_buy_callback("buy_42", SECRET) == (42, None)
+    assert parse_buy_callback("sell_42", SECRET) is None
+
+
+def test_forged_button_tap_does_not_buy():
+    purchaser = mock.AsyncMock()
+    query = SimpleNamespace(data="buy_42_100000000_0000000000000000",
+                            answer=mock.AsyncMock(), edit_message_text=mock.AsyncMock(), message=None)
+    context = SimpleNamespace(bot_data={'purchaser': purchaser})
+
+    asyncio.run(handle_purchase_callback(SimpleNamespace(callback_query=query), context))
+
+    purchaser.buy_skin.assert_not_called()
+    assert 'подделаны' in query.edit_message_text.call_args.args[0]
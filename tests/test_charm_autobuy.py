@@ -0,0 +1,29 @@
+"""Автопокупка предметов с брелками включается только явно"""
+from config import AUTO_BUY_STRATEGIES, CHARM_AUTOBUY, CHARM_AUTOBUY_STRATEGY
+from models.strategies import ACTION_BUY, StrategyEngine
+from utils.keyword_matcher import build_keyword_matcher
+
+
+def _buys(engine, charm, price=5.0):
+    data = {'name': "AK-47 | Redline (Field-Tested)", 'price': price,
+            'stickers': [{'name': charm, 'slot': 0}]}
+    return [s.name for s in engine.evaluate(data) if s.action == ACTION_BUY]
+
+
+def test_charm_autobuy_is_off_by_default():
+    assert CHARM_AUTOBUY is False
+    assert all(spec['name'] != 'charm' for spec in AUTO_BUY_STRATEGIES)
+
+
+def test_enabled_charm_autobuy_buys_only_listed_charms():
+    engine = StrategyEngine([CHARM_AUTOBUY_STRATEGY], build_keyword_matcher().classify)
+
+    # Сравнение без учёта регистра
+    assert _buys(engine, "Charm | Hot Howl") == ['charm']
+    assert _buys(engine, "charm | DIAMOND DOG") == ['charm']
+    assert _buys(engine, "Charm | Die-cast AK") == ['charm']
+    # Нет в CHARM_KEYWORDS
+    assert _buys(engine, "Charm | Diner Dog") == []
+    assert _buys(engine, "Sticker | Crown (Foil)") == []
+    # Дороже 10$
+    assert _buys(engine, "Charm | Hot Howl", price=10.01) == []
@@ -0,0 +1,65 @@
+"""Приём публикаций: в конвейер попадают только предметы, которым есть что делать"""
+import asyncio
+from types import SimpleNamespace
+
+from handlers.websocket_handler import CSGOEventHandler
+from replay import create_paper_tracker
+
+
+def _added(item_id, stickers=(), item_float="0.2500000000"):
+    return {
+        'id': item_id,
+        'event': 'obtained_skin_added',
+        'game_id': 1,
+        'name': "AK-47 | Redline (Field-Tested)",
+        'price': 12.5,
+        'item_float': item_float,
+        'stickers': [{'name': name, 'slot': slot, 'wear': 0} for slot, name in enumerate(stickers)],
+    }
+
+
+def _ingest(events):
+    async def run():
+        tracker = create_paper_tracker()
+        handler = CSGOEventHandler(tracker, tracker.runtime)
+        for data in events:
+            await handler.on_publication(SimpleNamespace(pub=SimpleNamespace(data=data)))
+        return tracker
+    return asyncio.run(run())
+
+
+def test_unmatched_item_is_not_queued():
+    tracker = _ingest([_added(1, ["Sticker | Clown"])])
+
+    assert tracker.pipeline.stats()['depth']['alert'] == 0
+    assert '1' not in tracker.sent_new_items
+
+
+def test_duplicate_publication_is_dropped_while_first_is_in_flight():
+    item = _added(2, ["Sticker | iBUYPOWER | Katowice 2014"])
+    tracker = _ingest([item, dict(item)])
+
+    # Воркеры не запущены: первая задача ещё в очереди, вторая отсечена при приёме
+    assert tracker.pipeline.stats()['depth']['alert'] == 1
+    assert '2' in tracker.sent_new_items
+
+
+def test_republish_of_evicted_autobuy_is_processed():
+    async def run():
+        tracker = create_paper_tracker()
+        tracker.pipeline.queue_size = 1
+        handler = CSGOEventHandler(tracker, tracker.runtime)
+        # Второй кандидат вытесняет первый, повторная публикация первого - второй
+        for item_id in (3, 4, 3):
+            data = _added(item_id, item_float="0.0005000000")
+            await handler.on_publication(SimpleNamespace(pub=SimpleNamespace(data=data)))
+        reserved = {item_id: item_id in tracker.sent_new_items for item_id in ('3', '4')}
+        tracker.pipeline.start()
+        await tracker.pipeline.join()
+        await tracker.pipeline.stop()
+        return tracker, reserved
+
+    tracker, reserved = asyncio.run(run())
+
+    assert reserved == {'3': True, '4': False}
+    assert [decision['id'] for decision in tracker.purchaser.decisions] == [3]
@@ -0,0 +1,87 @@
+"""Словарь с истечением записей: TTL и вытеснение по размеру"""
+from utils.expiring import ExpiringMap
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entry_expires_after_ttl():
+    clock = FakeClock()
+    entries = ExpiringMap(10, 100, clock=clock)
+    entries.set('a', 1)
+
+    clock.now = 9.9
+    assert 'a' in entries
+    assert entries.get('a') == 1
+
+    clock.now = 10.0
+    assert 'a' not in entries
+    assert entries.get('a') is None
+    assert entries.pop('a') is None
+
+
+def test_set_restarts_ttl_and_moves_entry_to_the_end():
+    clock = FakeClock()
+    entries = ExpiringMap(10, 100, clock=clock)
+    entries.set('a')
+    clock.now = 5
+    entries.set('b')
+    clock.now = 7
+    entries.set('a')
+
+    assert [key for key, _, _ in entries.items()] == ['b', 'a']
+    clock.now = 16
+    assert 'a' in entries
+    assert 'b' not in entries
+
+
+def test_overflow_evicts_oldest_entries_first():
+    clock = FakeClock()
+    entries = ExpiringMap(100, 3, clock=clock)
+    for key in 'abcd':
+        clock.now += 1
+        entries.set(key)
+
+    assert [key for key, _, _ in entries.items()] == ['b', 'c', 'd']
+    assert entries.evicted == 1
+
+
+def test_adding_removes_expired_entries_from_the_front():
+    clock = FakeClock()
+    entries = ExpiringMap(10, 100, clock=clock)
+    entries.set('old')
+    clock.now = 5
+    entries.set('young')
+
+    clock.now = 11
+    entries.set('new')
+
+    assert len(entries) == 2
+    assert [key for key, _, _ in entries.items()] == ['young', 'new']
+
+
+def test_expire_removes_all_expired_entries():
+    clock = FakeClock()
+    entries = ExpiringMap(10, 100, clock=clock)
+    for index in range(ExpiringMap.EVICT_STEP * 2):
+        entries.set(index)
+
+    clock.now = 10
+    entries.expire()
+
+    assert len(entries) == 0
+    assert entries.evicted == ExpiringMap.EVICT_STEP * 2
+
+
+def test_restore_keeps_remaining_ttl_and_capacity():
+    clock = FakeClock(100)
+    entries = ExpiringMap(10, 2, clock=clock)
+    entries.restore([('gone', 1, 0), ('a', 1, 2), ('b', 2, 5), ('c', 3, 50)])
+
+    # Старейшая живая запись вытеснена, оставшееся время не больше ttl
+    assert [(key, value, remaining) for key, value, remaining in entries.items()] == [('b', 2, 5), ('c', 3, 10)]
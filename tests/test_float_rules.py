@@ -0,0 +1,43 @@
+"""Окна float: объединение окон предмета, износа и общих"""
+from models.float_rules import FloatIntervalIndex, FloatRuleStore
+
+REDLINE = "AK-47 | Redline (Field-Tested)"
+
+STORE = FloatRuleStore(
+    default=[[0.0, 0.01]],
+    wear={'Field-Tested': [[0.15, 0.16]], 'Battle-Scarred': [[0.45, 0.5]]},
+    items={REDLINE: [[0.37, 0.38], [0.155, 0.2]]},
+)
+
+
+def test_overlapping_ranges_are_merged():
+    index = FloatIntervalIndex([[0.3, 0.4], [0.1, 0.2], [0.15, 0.25], [0.4, 0.5]])
+
+    assert index.ranges() == [(0.1, 0.25), (0.3, 0.5)]
+    assert index.contains(0.1) and index.contains(0.5)
+    assert not index.contains(0.27)
+
+
+def test_item_matches_union_of_its_windows():
+    # Окно предмета, окно износа и общее окно
+    assert STORE.matches(REDLINE, 0.375)
+    assert STORE.matches(REDLINE, 0.15)
+    assert STORE.matches(REDLINE, 0.005)
+    assert not STORE.matches(REDLINE, 0.3)
+    # Окна чужого износа не действуют
+    assert not STORE.matches(REDLINE, 0.47)
+
+
+def test_index_for_matches_the_same_floats():
+    index = STORE.index_for(REDLINE)
+
+    assert index.ranges() == [(0.0, 0.01), (0.15, 0.2), (0.37, 0.38)]
+    for value in (0.0, 0.005, 0.02, 0.15, 0.175, 0.2, 0.3, 0.375, 0.47):
+        assert index.contains(value) == STORE.matches(REDLINE, value)
+
+
+def test_item_without_own_windows_uses_only_defaults():
+    assert STORE.index_for("AWP | Asiimov (Minimal Wear)") is None
+    assert STORE.index_for("Sticker | Crown (Foil)") is None
+    assert STORE.matches("AWP | Asiimov (Minimal Wear)", 0.005)
+    assert not STORE.matches("AWP | Asiimov (Minimal Wear)", 0.155)
@@ -0,0 +1,112 @@
+"""Курсы валют с локальным источником"""
+import asyncio
+import json
+import time
+
+from utils.fx_rates import FxRates, StaticRateSource, CombinedRateSource, cbr_rates
+
+DEFAULTS = {'RUB': 79.0, 'CNY': 7.2}
+
+
+def test_refresh_success_updates_all_rates(tmp_path):
+    path = str(tmp_path / 'fx.json')
+    rates = FxRates(DEFAULTS, path, source=StaticRateSource({'RUB': 90.0, 'CNY': 7.0}))
+
+    assert asyncio.run(rates.refresh()) is True
+    assert rates.rate('RUB') == 90.0
+    assert rates.convert(10, 'CNY') == 70.0
+    assert not rates.is_stale()
+
+    # Снимок переживает перезапуск
+    restored = FxRates(DEFAULTS, path, source=StaticRateSource({}, fail=True))
+    assert restored.rates == DEFAULTS
+    asyncio.run(restored.load())
+    assert restored.rates == {'RUB': 90.0, 'CNY': 7.0}
+    assert not restored.is_stale()
+
+
+def test_partial_refresh_keeps_missing_currency_stale(tmp_path):
+    # Как у ЕЦБ: RUB в источнике нет
+    rates = FxRates(DEFAULTS, str(tmp_path / 'fx.json'), source=StaticRateSource({'CNY': 7.1}))
+
+    assert asyncio.run(rates.refresh()) is False
+    assert rates.rate('CNY') == 7.1
+    assert rates.rate('RUB') == 79.0
+    assert not rates.is_stale('CNY')
+    assert rates.is_stale('RUB')
+    assert rates.is_stale()
+    assert rates.updated_at is None
+
+
+def test_failed_refresh_keeps_previous_rates(tmp_path):
+    source = StaticRateSource({'RUB': 90.0, 'CNY': 7.0})
+    rates = FxRates(DEFAULTS, str(tmp_path / 'fx.json'), source=source)
+    asyncio.run(rates.refresh())
+
+    source.fail = True
+    assert asyncio.run(rates.refresh()) is False
+    assert rates.rates == {'RUB': 90.0, 'CNY': 7.0}
+    assert source.calls == 2
+
+
+def test_old_rates_become_stale(tmp_path):
+    rates = FxRates(DEFAULTS, str(tmp_path / 'fx.json'), source=StaticRateSource(DEFAULTS), max_age=60)
+    asyncio.run(rates.refresh())
+    rates.updated['RUB'] = time.time() - 120
+    assert rates.is_stale('RUB')
+    assert not rates.is_stale('CNY')
+
+
+def test_legacy_snapshot_with_single_timestamp(tmp_path):
+    path = tmp_path / 'fx.json'
+    now = time.time()
+    path.write_text(json.dumps({'rates': {'RUB': 85.0}, 'updated_at': now}))
+
+    rates = FxRates(DEFAULTS, str(path), source=StaticRateSource({}, fail=True))
+    asyncio.run(rates.load())
+    assert rates.rate('RUB') == 85.0
+    assert not rates.is_stale('RUB')
+    assert rates.is_stale('CNY')
+
+
+def test_load_does_not_overwrite_newer_rates(tmp_path):
+    path = tmp_path / 'fx.json'
+    rates = FxRates(DEFAULTS, str(path), source=StaticRateSource({'RUB': 90.0}))
+    asyncio.run(rates.refresh())
+
+    # Снимок старше курса в памяти
+    path.write_text(json.dumps({'rates': {'RUB': 85.0, 'CNY': 7.0}, 'updated': {'RUB': 1.0, 'CNY': 1.0}}))
+    asyncio.run(rates.load())
+    assert rates.rates == {'RUB': 90.0, 'CNY': 7.0}
+
+
+def test_cbr_rates_quote_rub_and_cross_rates():
+    daily = {'Valute': {
+        'USD': {'Nominal': 1, 'Value': 90.0},
+        'CNY': {'Nominal': 10, 'Value': 125.0},
+    }}
+    assert cbr_rates(daily, ['RUB', 'CNY', 'EUR']) == {'RUB': 90.0, 'CNY': 7.2}
+
+
+def test_combined_source_takes_each_currency_from_first_source(tmp_path):
+    # Как ЦБ + ЕЦБ: первый источник знает RUB, второй - только CNY
+    cbr = StaticRateSource({'RUB': 90.0})
+    ecb = StaticRateSource({'RUB': 1.0, 'CNY': 7.1})
+    rates = FxRates(DEFAULTS, str(tmp_path / 'fx.json'), source=CombinedRateSource(cbr, ecb))
+
+    assert asyncio.run(rates.refresh()) is True
+    assert rates.rates == {'RUB': 90.0, 'CNY': 7.1}
+    assert not rates.is_stale()
+
+
+def test_combined_source_survives_one_failed_source(tmp_path):
+    cbr = StaticRateSource({'RUB': 90.0, 'CNY': 7.0}, fail=True)
+    ecb = StaticRateSource({'CNY': 7.1})
+    rates = FxRates(DEFAULTS, str(tmp_path / 'fx.json'), source=CombinedRateSource(cbr, ecb))
+
+    assert asyncio.run(rates.refresh()) is False
+    assert rates.rates == {'RUB': 79.0, 'CNY': 7.1}
+
+    ecb.fail = True
+    assert asyncio.run(rates.refresh()) is False
+    assert rates.rates == {'RUB': 79.0, 'CNY': 7.1}
@@ -0,0 +1,65 @@
+"""Хеджирующий запрос покупки при задержке ответа"""
+import asyncio
+
+from models.skin_purchaser import SkinPurchaser
+
+
+class ScriptedPurchaser(SkinPurchaser):
+    """Ответы на запросы по очереди: (задержка, результат или исключение)"""
+
+    def __init__(self, *responses):
+        super().__init__(api_key='test', hedge_percentile=0.9)
+        self.responses = list(responses)
+        self.posts = []
+        self.cancelled = []
+        # Хватает замеров, чтобы задержка хеджа была перцентилем, а не начальной
+        self._latencies.extend([0.02] * 20)
+
+    async def _post(self, session, body):
+        index = len(self.posts)
+        self.posts.append((session is self.hedge_session, body))
+        delay, outcome = self.responses[index]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _buy(purchaser):
+    async def run():
+        try:
+            return await purchaser.buy_skin(42, max_price=5.0)
+        finally:
+            await purchaser.close()
+    return asyncio.run(run())
+
+
+def test_fast_response_is_not_hedged():
+    purchaser = ScriptedPurchaser((0.0, {'purchase_id': 1}))
+
+    assert _buy(purchaser) == {'purchase_id': 1}
+    assert len(purchaser.posts) == 1
+    assert purchaser.hedged == 0
+
+
+def test_slow_primary_is_hedged_with_same_body_and_cancelled():
+    purchaser = ScriptedPurchaser((1.0, {'purchase_id': 1}), (0.0, {'purchase_id': 2}))
+
+    assert _buy(purchaser) == {'purchase_id': 2}
+    (primary_hedge, primary_body), (hedge_hedge, hedge_body) = purchaser.posts
+    assert (primary_hedge, hedge_hedge) == (False, True)
+    # Тот же custom_id: сервер не создаст вторую покупку
+    assert primary_body == hedge_body
+    assert purchaser.cancelled == [0]
+    assert (purchaser.hedged, purchaser.hedge_wins) == (1, 1)
+
+
+def test_failed_hedge_falls_back_to_primary():
+    purchaser = ScriptedPurchaser((0.1, {'purchase_id': 1}), (0.0, Exception("Ошибка покупки")))
+
+    assert _buy(purchaser) == {'purchase_id': 1}
+    assert (purchaser.hedged, purchaser.hedge_wins) == (1, 0)
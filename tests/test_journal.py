@@ -0,0 +1,35 @@
+"""Журнал публикаций: запись вне цикла событий и чтение обратно"""
+import asyncio
+
+from utils.journal import PublicationJournal, read_journal
+
+
+def test_records_are_buffered_and_written_on_stop(tmp_path):
+    path = tmp_path / 'journal.jsonl.gz'
+
+    async def run():
+        journal = PublicationJournal(str(path))
+        for item_id in range(3):
+            journal.record({'id': item_id}, received_at=float(item_id))
+        # Приём публикации не трогает диск
+        written_before_stop = path.exists()
+        await journal.stop()
+        return written_before_stop
+
+    assert asyncio.run(run()) is False
+    assert list(read_journal(str(path))) == [(0.0, {'id': 0}), (1.0, {'id': 1}), (2.0, {'id': 2})]
+
+
+def test_full_buffer_drops_new_records(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+
+    async def run():
+        journal = PublicationJournal(str(path), max_buffer=2)
+        for item_id in range(3):
+            journal.record({'id': item_id}, received_at=0.0)
+        await journal.stop()
+        return journal
+
+    journal = asyncio.run(run())
+    assert (journal.records, journal.dropped) == (2, 1)
+    assert [data['id'] for _, data in read_journal(str(path))] == [0, 1]
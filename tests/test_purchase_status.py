@@ -0,0 +1,117 @@
+"""Опрос статусов покупок"""
+import asyncio
+
+from models.paper_trading import PaperBot
+from models.purchase_status import PurchaseStatusTracker
+from models.skin_purchaser import SkinPurchaser
+from tools.local_market import LocalMarketServer
+
+
+class ScriptedInfo:
+    """Покупатель, отдающий заданные статусы покупок"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.requests = []
+
+    async def purchase_info(self, purchase_ids):
+        self.requests.append(list(purchase_ids))
+        return [{'purchase_id': int(purchase_id), 'skins': [{'id': 1, 'status': self.statuses[purchase_id]}]}
+                for purchase_id in purchase_ids if purchase_id in self.statuses]
+
+
+def _tracker(purchaser, bot=None, **kwargs):
+    options = dict(initial_delay=1.0, max_delay=4.0, backoff=2.0, timeout=100.0, batch_size=50)
+    options.update(kwargs)
+    return PurchaseStatusTracker(purchaser, bot or PaperBot(), **options)
+
+
+def test_due_purchases_share_one_request_against_local_market():
+    async def run():
+        market = LocalMarketServer(status_timeline=((0.0, 'processing'), (0.15, 'accepted')),
+                                   info_param='ids[]')
+        await market.start()
+        purchaser = SkinPurchaser(api_key='test', buy_url=market.buy_url, keepalive_url=market.balance_url,
+                                  info_url=market.info_url, info_param='ids[]', pool_size=1, hedge_percentile=0)
+        bot = PaperBot()
+        tracker = _tracker(purchaser, bot, initial_delay=0.05, max_delay=0.1)
+        try:
+            tracker.start()
+            purchase_ids = [(await purchaser.buy_skin(item_id, max_price=5.0))['purchase_id']
+                            for item_id in (10, 20, 30)]
+            for message_id, (purchase_id, item_id) in enumerate(zip(purchase_ids, (10, 20, 30)), start=1):
+                tracker.track(purchase_id, 1, message_id, f"покупка {item_id}", item_id)
+            for _ in range(200):
+                if not tracker.pending:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await tracker.stop()
+            await purchaser.close()
+            await market.stop()
+        return market, bot, tracker, purchase_ids
+
+    market, bot, tracker, purchase_ids = asyncio.run(run())
+
+    assert not tracker.pending
+    assert sorted(market.info_requests[0]) == sorted(purchase_ids)
+    final = {edit['message_id']: edit['text'] for edit in bot.edits}
+    assert final == {
+        message_id: f"покупка {item_id}\n\nСтатус: ✅ трейд принят"
+        for message_id, item_id in ((1, 10), (2, 20), (3, 30))
+    }
+
+
+def test_backoff_grows_while_status_is_unchanged_and_resets_on_change():
+    async def run():
+        info = ScriptedInfo()
+        bot = PaperBot()
+        tracker = _tracker(info, bot)
+        info.statuses['7'] = 'processing'
+        tracker.track(7, 1, 1, "покупка")
+        tracked = tracker.pending[('7', 1)]
+
+        delays = []
+        for status in ('processing', 'processing', 'processing', 'processing', 'wait_accept', 'wait_accept'):
+            info.statuses['7'] = status
+            await tracker._poll([tracked])
+            delays.append(tracked.delay)
+        return delays, bot
+
+    delays, bot = asyncio.run(run())
+
+    # Первый ответ - изменение статуса, дальше рост до max_delay
+    assert delays == [1.0, 2.0, 4.0, 4.0, 1.0, 2.0]
+    # Сообщение правится только при смене статуса
+    assert [edit['text'] for edit in bot.edits] == [
+        "покупка\n\nСтатус: ⏳ обрабатывается",
+        "покупка\n\nСтатус: 📨 трейд отправлен, ожидает принятия",
+    ]
+
+
+def test_final_status_stops_tracking():
+    async def run():
+        info = ScriptedInfo()
+        tracker = _tracker(info)
+        tracker.track(7, 1, 1, "покупка")
+        info.statuses['7'] = 'accepted'
+        await tracker._poll(list(tracker.pending.values()))
+        return tracker
+
+    assert not asyncio.run(run()).pending
+
+
+def test_timeout_stops_tracking():
+    async def run():
+        info = ScriptedInfo()
+        tracker = _tracker(info, timeout=10.0)
+        tracker.track(7, 1, 1, "покупка")
+        tracker.track(8, 1, 2, "покупка")
+        info.statuses['7'] = 'processing'
+        tracker.pending[('7', 1)].started -= 11.0
+        await tracker._poll(list(tracker.pending.values()))
+        return tracker, info
+
+    tracker, info = asyncio.run(run())
+    assert list(tracker.pending) == [('8', 2)]
+    assert info.requests == [['7', '8']]
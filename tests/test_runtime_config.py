@@ -0,0 +1,36 @@
+"""Перезагрузка фильтров без перезапуска"""
+import asyncio
+import json
+import signal
+
+from tracker.runtime_config import RuntimeConfigStore
+
+
+def _store(tmp_path, strategies):
+    overrides = tmp_path / 'runtime.json'
+    overrides.write_text(json.dumps({'strategies': strategies}))
+    ranges = tmp_path / 'float_ranges.json'
+    ranges.write_text('{}')
+    return RuntimeConfigStore(str(overrides), str(ranges)), overrides
+
+
+def test_reload_swaps_strategies(tmp_path):
+    store, overrides = _store(tmp_path, [{'name': 'a', 'action': 'alert', 'conditions': {'max_price': 1}}])
+    overrides.write_text(json.dumps({'strategies': [{'name': 'b', 'action': 'alert', 'conditions': {}}]}))
+
+    ok, _ = asyncio.run(store.reload())
+    assert ok
+    assert store.current.version == 2
+    assert [s.name for s in store.current.strategy_engine.strategies] == ['b']
+
+
+def test_stop_removes_sighup_handler(tmp_path):
+    store, _ = _store(tmp_path, [])
+
+    async def run():
+        store.start()
+        await store.stop()
+        # Обработчика уже нет - снимать нечего
+        return asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+
+    assert asyncio.run(run()) is False
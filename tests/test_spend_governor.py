@@ -0,0 +1,82 @@
+"""Лимиты расходов: резерв и поправка после ответа"""
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from handlers.telegram_handler import budget_command
+from models.spend_governor import BudgetExceeded, SpendGovernor
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _governor(clock, limit=100.0):
+    return SpendGovernor(rate=1000, burst=1000, limits={'minute': limit}, clock=clock)
+
+
+def test_refund_goes_to_reservation_bucket():
+    clock = FakeClock(0.5)
+    governor = _governor(clock)
+    buckets = governor.admit(10.0)
+
+    # Ответ пришёл уже в следующей корзине
+    clock.now = 1.2
+    governor.settle(buckets, 10.0, 4.0)
+    assert governor.remaining('minute') == 96.0
+
+    # Корзина резерва вышла из окна: сумма не уходит в минус
+    clock.now = 60.6
+    assert governor.spent['minute'].value() == 0.0
+    assert governor.remaining('minute') == 100.0
+
+
+def test_refund_after_reservation_expired_is_dropped():
+    clock = FakeClock(0.0)
+    governor = _governor(clock)
+    buckets = governor.admit(50.0)
+
+    clock.now = 61.0
+    governor.settle(buckets, 50.0, 0.0)
+    assert governor.spent['minute'].value() == 0.0
+
+    # Поправка не превратилась в лишний бюджет
+    with pytest.raises(BudgetExceeded):
+        governor.admit(101.0)
+
+
+def test_failed_buy_releases_reservation():
+    clock = FakeClock(0.0)
+    governor = _governor(clock)
+    buckets = governor.admit(80.0)
+    clock.now = 0.5
+    governor.settle(buckets, 80.0, 0.0)
+    assert governor.remaining('minute') == 100.0
+
+
+def test_buy_without_price_rejected_under_limits():
+    governor = _governor(FakeClock())
+    with pytest.raises(BudgetExceeded) as error:
+        governor.admit(None)
+    assert error.value.reason == 'no_price'
+
+
+def test_buy_without_price_allowed_without_limits():
+    governor = SpendGovernor(rate=1000, burst=1000, limits={}, clock=FakeClock())
+    assert governor.admit(None) == {}
+
+
+def test_budget_is_not_shown_to_other_chats():
+    message = SimpleNamespace(reply_text=mock.AsyncMock())
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=-1), message=message)
+    context = SimpleNamespace(bot_data={'governor': _governor(FakeClock())})
+
+    asyncio.run(budget_command(update, context))
+
+    message.reply_text.assert_not_called()
@@ -0,0 +1,44 @@
+"""Снимки состояния переживают ошибку записи"""
+import asyncio
+
+from utils.expiring import ExpiringMap
+from utils.state_snapshot import StateSnapshot
+
+
+def test_failed_write_is_retried_on_next_flush(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.sqlite3')
+
+    async def save():
+        store = ExpiringMap(3600, 100)
+        snapshot = StateSnapshot(path, interval=3600)
+        snapshot.register('bought', store)
+        snapshot.start()
+
+        store.set('1', {'purchase_id': 10})
+        store.set('2')
+        write = snapshot._write
+
+        def failing_write(changes):
+            raise OSError("database or disk is full")
+
+        monkeypatch.setattr(snapshot, '_write', failing_write)
+        await snapshot.flush()
+
+        # Изменение после сбоя не затирается повторной записью старого
+        store.set('1', {'purchase_id': 11})
+        monkeypatch.setattr(snapshot, '_write', write)
+        await snapshot.flush()
+        await snapshot.stop()
+
+    async def load():
+        store = ExpiringMap(3600, 100)
+        snapshot = StateSnapshot(path, interval=3600)
+        snapshot.register('bought', store)
+        await snapshot.restore()
+        return store
+
+    asyncio.run(save())
+    store = asyncio.run(load())
+
+    assert store.get('1') == {'purchase_id': 11}
+    assert store.get('2') is True
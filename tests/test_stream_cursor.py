@@ -0,0 +1,82 @@
+"""Позиция в потоке канала: восстановление после разрыва и повторы"""
+from types import SimpleNamespace
+
+from tracker.stream_cursor import StreamCursor
+
+
+def _subscribed(epoch='e1', offset=10, was_recovering=False, recovered=False):
+    position = SimpleNamespace(epoch=epoch, offset=offset) if offset is not None else None
+    return SimpleNamespace(stream_position=position, was_recovering=was_recovering, recovered=recovered)
+
+
+def _subscription():
+    return SimpleNamespace(_recover=False, _epoch='', _offset=0)
+
+
+def test_first_subscription_stores_position_and_seeds_next_one():
+    cursor = StreamCursor(3600)
+    assert not cursor.seed(_subscription())
+
+    cursor.on_subscribed(_subscribed(offset=10))
+    assert cursor.accept(11)
+    assert cursor.accept(12)
+
+    sub = _subscription()
+    assert cursor.seed(sub)
+    assert (sub._recover, sub._epoch, sub._offset) == (True, 'e1', 12)
+
+
+def test_repeated_offsets_are_dropped():
+    cursor = StreamCursor(3600)
+    cursor.on_subscribed(_subscribed(offset=10))
+
+    assert cursor.accept(11)
+    assert not cursor.accept(11)
+    assert not cursor.accept(5)
+    # Публикации без offset не отбрасываются
+    assert cursor.accept(0)
+    assert cursor.position() == ('e1', 11)
+
+
+def test_recovered_subscription_counts_missed_publications():
+    cursor = StreamCursor(3600)
+    cursor.on_subscribed(_subscribed(offset=10))
+
+    result = cursor.on_subscribed(_subscribed(offset=15, was_recovering=True, recovered=True))
+
+    assert result.recovered and result.recovered_count == 5
+    # Позицию сдвинут восстановленные публикации, а не ответ на подписку
+    assert cursor.position() == ('e1', 10)
+    assert all(cursor.accept(offset) for offset in range(11, 16))
+    assert cursor.position() == ('e1', 15)
+
+
+def test_unrecovered_subscription_reports_loss_and_jumps_ahead():
+    cursor = StreamCursor(3600)
+    cursor.on_subscribed(_subscribed(offset=10))
+
+    result = cursor.on_subscribed(_subscribed(offset=40, was_recovering=True))
+    assert not result.recovered and result.lost_count == 30
+    assert cursor.position() == ('e1', 40)
+
+    # Новый epoch: сколько пропущено, неизвестно
+    result = cursor.on_subscribed(_subscribed(epoch='e2', offset=3, was_recovering=True))
+    assert result.lost_count is None
+    assert cursor.position() == ('e2', 3)
+
+
+def test_channel_without_positions_clears_cursor():
+    cursor = StreamCursor(3600)
+    cursor.on_subscribed(_subscribed(offset=10))
+
+    cursor.on_subscribed(_subscribed(offset=None))
+
+    assert cursor.position() is None
+    assert not cursor.seed(_subscription())
+
+
+def test_subscription_without_private_fields_is_not_seeded():
+    cursor = StreamCursor(3600)
+    cursor.on_subscribed(_subscribed(offset=10))
+
+    assert not cursor.seed(SimpleNamespace())
@@ -0,0 +1,99 @@
+"""Супервизор компонентов: бюджет перезапусков и паузы между ними"""
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from utils.rate_limit import Backoff
+from utils.supervisor import RestartBudget, Supervisor, SupervisorGaveUp
+
+
+class Crashing:
+    """Компонент, падающий первые crashes запусков, затем работающий до отмены"""
+
+    def __init__(self, crashes: float = float('inf')):
+        self.crashes = crashes
+        self.started = []
+
+    async def run(self):
+        self.started.append(time.monotonic())
+        if len(self.started) <= self.crashes:
+            raise RuntimeError(f"падение {len(self.started)}")
+        await asyncio.Event().wait()
+
+
+class RecordingBackoff(Backoff):
+    """Backoff, запоминающий выданные паузы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delays = []
+
+    def next_delay(self) -> float:
+        delay = super().next_delay()
+        self.delays.append(delay)
+        return delay
+
+
+def test_supervisor_gives_up_after_restart_budget():
+    component = Crashing()
+    supervisor = Supervisor(max_restarts=2, window=60, restart_delay=0.01, max_restart_delay=0.01)
+    supervisor.add('feed', component.run)
+
+    with pytest.raises(SupervisorGaveUp) as error:
+        asyncio.run(supervisor.run())
+
+    assert error.value.component == 'feed'
+    assert str(error.value.error) == "падение 3"
+    # Первый запуск и два перезапуска
+    assert len(component.started) == 3
+
+
+def test_crashed_component_restarts_while_others_keep_running():
+    flaky, steady = Crashing(crashes=2), Crashing(crashes=0)
+    supervisor = Supervisor(max_restarts=5, window=60, restart_delay=0.01, max_restart_delay=0.01)
+    supervisor.add('flaky', flaky.run)
+    supervisor.add('steady', steady.run)
+
+    async def run():
+        task = asyncio.create_task(supervisor.run())
+        while len(flaky.started) < 3:
+            await asyncio.sleep(0.005)
+        supervisor.stop()
+        await task
+
+    asyncio.run(run())
+    assert supervisor.stats() == {'flaky': 2, 'steady': 0}
+    assert len(steady.started) == 1
+
+
+def test_first_restart_is_immediate_then_backoff_applies():
+    component = Crashing(crashes=3)
+    supervisor = Supervisor(max_restarts=5, window=60, restart_delay=0.05, max_restart_delay=0.08)
+    supervisor.add('feed', component.run)
+    backoff = supervisor.components['feed'].backoff = RecordingBackoff(0.05, 0.08, rand=lambda: 0.0)
+
+    async def run():
+        task = asyncio.create_task(supervisor.run())
+        while len(component.started) < 4:
+            await asyncio.sleep(0.005)
+        supervisor.stop()
+        await task
+
+    asyncio.run(run())
+    assert backoff.delays == [0.0, 0.05, 0.08]
+    # Часы цикла событий могут сработать чуть раньше срока
+    _, second, third, fourth = component.started
+    assert third - second >= 0.045
+    assert fourth - third >= 0.075
+
+
+def test_restart_budget_frees_up_after_window():
+    budget = RestartBudget(max_restarts=2, window=10)
+    with mock.patch('utils.supervisor.time.monotonic', side_effect=[0.0, 1.0, 5.0, 11.5]):
+        assert budget.spend()
+        assert budget.spend()
+        assert not budget.spend()
+        # Перезапуск в момент 0 вышел из окна
+        assert budget.spend()
@@ -0,0 +1,146 @@
+"""Очередь Telegram: приоритеты, сводки, 429 и spool"""
+import asyncio
+from datetime import timedelta
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import NetworkError, RetryAfter
+
+from models.paper_trading import PaperBot
+from utils.telegram_outbox import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, OutboundMessage, TelegramOutbox
+
+
+class FlakyBot(PaperBot):
+    """Бот, первые вызовы которого завершаются заданными ошибками"""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return await super().send_message(*args, **kwargs)
+
+
+async def _drain(outbox: TelegramOutbox):
+    outbox.start()
+    try:
+        await outbox.join(timeout=5)
+    finally:
+        await outbox.stop()
+
+
+def test_higher_priority_is_sent_first():
+    bot = PaperBot()
+    outbox = TelegramOutbox(bot, 1)
+    outbox.send("продажа", PRIORITY_LOW)
+    outbox.send("новый предмет", PRIORITY_NORMAL)
+    outbox.send("покупка", PRIORITY_HIGH)
+
+    asyncio.run(_drain(outbox))
+    assert [message['text'] for message in bot.messages] == ["покупка", "новый предмет", "продажа"]
+
+
+def test_low_priority_messages_merge_into_digest():
+    bot = PaperBot()
+    outbox = TelegramOutbox(bot, 1)
+    for index in range(3):
+        outbox.send(f"продажа {index}", PRIORITY_LOW)
+
+    asyncio.run(_drain(outbox))
+    assert len(bot.messages) == 1
+    text = bot.messages[0]['text']
+    assert "Сводка: 3" in text
+    assert all(f"продажа {index}" in text for index in range(3))
+
+
+def test_overflow_drops_incoming_message_below_queued_ones():
+    outbox = TelegramOutbox(PaperBot(), 1, queue_size=2)
+    outbox.send("покупка 1", PRIORITY_HIGH)
+    outbox.send("покупка 2", PRIORITY_HIGH)
+    outbox.send("продажа", PRIORITY_LOW)
+
+    assert [message.text for message in outbox.queues[PRIORITY_HIGH]] == ["покупка 1", "покупка 2"]
+    assert not outbox.queues[PRIORITY_LOW]
+    assert outbox.dropped == 1
+
+
+def test_overflow_evicts_oldest_lowest_priority_message():
+    outbox = TelegramOutbox(PaperBot(), 1, queue_size=2)
+    outbox.send("продажа 1", PRIORITY_LOW)
+    outbox.send("продажа 2", PRIORITY_LOW)
+    outbox.send("покупка", PRIORITY_HIGH)
+
+    assert [message.text for message in outbox.queues[PRIORITY_LOW]] == ["продажа 2"]
+    assert [message.text for message in outbox.queues[PRIORITY_HIGH]] == ["покупка"]
+    assert outbox.dropped == 1
+
+
+def test_retry_after_waits_and_resends():
+    bot = FlakyBot([RetryAfter(timedelta(0))])
+    outbox = TelegramOutbox(bot, 1)
+    outbox.send("покупка", PRIORITY_HIGH)
+
+    asyncio.run(_drain(outbox))
+    assert bot.calls == 2
+    assert [message['text'] for message in bot.messages] == ["покупка"]
+    assert outbox.stats()['held'] == 0
+
+
+def test_retry_after_is_capped():
+    bot = FlakyBot([RetryAfter(timedelta(0))] * 10)
+    outbox = TelegramOutbox(bot, 1, retry_after_limit=2)
+    message = OutboundMessage("покупка", PRIORITY_HIGH)
+
+    assert asyncio.run(outbox._deliver(message)) is False
+    assert bot.calls == 3
+    assert outbox.outage
+
+
+def test_held_message_is_spooled_during_outage_and_sent_from_spool(tmp_path):
+    path = tmp_path / 'spool.jsonl'
+    sent = []
+
+    async def run():
+        outbox = TelegramOutbox(FlakyBot([NetworkError("нет связи")]), 1, spool_path=str(path),
+                                retries=1, outage_retry_interval=0.2)
+        outbox.send("покупка", PRIORITY_HIGH, on_sent=sent.append)
+        outbox.start()
+        while not outbox.spooled:
+            await asyncio.sleep(0.01)
+        # Процесс мог бы упасть здесь: сообщение уже на диске
+        spooled = path.read_text(encoding='utf-8')
+        await outbox.join(timeout=5)
+        await outbox.stop()
+        return spooled
+
+    spooled = asyncio.run(run())
+    assert "покупка" in spooled
+    assert len(sent) == 1
+    assert not path.exists()
+
+
+def test_unsent_messages_survive_restart_via_spool(tmp_path):
+    path = str(tmp_path / 'spool.jsonl')
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("Купить", callback_data="buy_1_2.5")]])
+
+    async def outage():
+        outbox = TelegramOutbox(FlakyBot([NetworkError("нет связи")] * 10), 1, spool_path=path,
+                                retries=1, outage_retry_interval=60)
+        outbox.send("новый предмет", PRIORITY_NORMAL, reply_markup=markup)
+        outbox.send("продажа", PRIORITY_LOW)
+        outbox.start()
+        while not outbox.outage:
+            await asyncio.sleep(0.01)
+        await outbox.stop(drain_timeout=0.05)
+        return outbox
+
+    assert asyncio.run(outage()).spooled == 2
+
+    bot = PaperBot()
+    asyncio.run(_drain(TelegramOutbox(bot, 1, spool_path=path)))
+    assert [(message['text'], message['has_button']) for message in bot.messages] == [
+        ("новый предмет", True), ("продажа", False)
+    ]
@@ -0,0 +1,123 @@
+"""Токен WebSocket: кеш, обновление заранее и паузы переподключения"""
+import asyncio
+import base64
+import json
+import socket
+import time
+
+from aiohttp import web
+
+from tracker.ws_token import WsTokenCache
+from utils.rate_limit import Backoff
+
+
+def _jwt(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode()).decode().rstrip('=')
+    return f"header.{payload}.signature"
+
+
+class TokenServer:
+    """Отдаёт токены со сроками из lifetimes (последний повторяется)"""
+
+    def __init__(self, *lifetimes: float, latency: float = 0.0):
+        self.lifetimes = list(lifetimes)
+        self.latency = latency
+        self.issued = []
+        self._runner = None
+        self.url = None
+
+    async def _handle(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        lifetime = self.lifetimes[min(len(self.issued), len(self.lifetimes) - 1)]
+        token = _jwt(time.time() + lifetime)
+        self.issued.append(token)
+        return web.json_response({'data': {'token': token}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/token', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}/token"
+        await web.SockSite(self._runner, sock).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def _with_cache(server, run, ttl=3600, refresh_ahead=60):
+    await server.start()
+    cache = WsTokenCache(server.url, 'key', ttl, refresh_ahead)
+    try:
+        return await run(cache)
+    finally:
+        await cache.stop()
+        await server.stop()
+
+
+def test_cached_token_is_reused_and_concurrent_calls_share_one_request():
+    server = TokenServer(3600, latency=0.05)
+
+    async def run(cache):
+        tokens = await asyncio.gather(*(cache.get() for _ in range(5)))
+        tokens.append(await cache.get())
+        return cache, tokens
+
+    cache, tokens = asyncio.run(_with_cache(server, run))
+    assert server.issued == [tokens[0]] and set(tokens) == {tokens[0]}
+    assert abs(cache.expires_at - cache.refresh_at - 60) < 1e-6
+
+
+def test_short_lived_token_is_refreshed_after_half_its_life():
+    server = TokenServer(10)
+
+    async def run(cache):
+        await cache.get()
+        return cache
+
+    cache = asyncio.run(_with_cache(server, run))
+    assert abs((cache.expires_at - cache.refresh_at) - 5) < 0.1
+
+
+def test_background_refresh_replaces_token_before_expiry():
+    server = TokenServer(0.4, 3600)
+
+    async def run(cache):
+        first = await cache.get()
+        cache.start()
+        # Обновление за refresh_ahead до истечения, без вызова get()
+        await asyncio.sleep(0.35)
+        return first, cache.token
+
+    first, current = asyncio.run(_with_cache(server, run, refresh_ahead=0.2))
+    assert server.issued == [first, current]
+
+
+def test_invalidated_token_is_fetched_again():
+    server = TokenServer(3600)
+
+    async def run(cache):
+        first = await cache.get()
+        cache.invalidate()
+        return first, await cache.get()
+
+    first, second = asyncio.run(_with_cache(server, run))
+    assert len(server.issued) == 2 and first != second
+
+
+def test_backoff_grows_to_max_delay_and_resets():
+    backoff = Backoff(1.0, 5.0, jitter=0.5, rand=lambda: 0.0)
+
+    assert [backoff.next_delay() for _ in range(6)] == [0.0, 1.0, 2.0, 4.0, 5.0, 5.0]
+    backoff.reset()
+    assert backoff.next_delay() == 0.0
+
+
+def test_backoff_jitter_only_shortens_delay():
+    backoff = Backoff(2.0, 60.0, jitter=0.5, rand=lambda: 1.0)
+    backoff.next_delay()
+
+    assert backoff.next_delay() == 1.0
@@ -0,0 +1,4 @@
+"""Вспомогательные средства для бенчмарков и тестов"""
+from .local_market import LocalMarketServer
+
+__all__ = ['LocalMarketServer']
@@ -0,0 +1,131 @@
+"""Локальная замена API маркета для бенчмарков и прогонов без сети"""
+import asyncio
+import random
+import socket
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class LocalMarketServer:
+    """HTTP сервер на 127.0.0.1, отвечающий как /market/buy.
+
+    Для каждого запроса покупки запоминает момент получения
+    (time.perf_counter) и id предметов, чтобы измерять задержку
+    от публикации до отправки запроса. Доля tail_ratio запросов отвечает
+    с задержкой tail_latency вместо latency - для проверки хеджирования.
+
+    /market/info отдаёт статусы покупок по status_timeline: список пар
+    (секунд после покупки, статус); id покупок берутся из параметра info_param.
+    """
+
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0,
+                 tail_latency: float = 0.0, tail_ratio: float = 0.0, seed: int = 0,
+                 status_timeline: Sequence[Tuple[float, str]] = ((0.0, 'processing'), (1.0, 'accepted')),
+                 info_param: str = 'purchase_ids[]'):
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_ratio = tail_ratio
+        self._random = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.buy_requests: List[Dict[str, Any]] = []
+        self.received_at: Dict[int, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._purchase_seq = 0
+        self.status_timeline = sorted(status_timeline)
+        self.info_param = info_param
+        self.purchases: Dict[int, Dict[str, Any]] = {}
+        self.info_requests: List[List[int]] = []
+
+        self.app = web.Application()
+        self.app.router.add_post('/v1/market/buy', self._handle_buy)
+        self.app.router.add_get('/v1/user/balance', self._handle_balance)
+        self.app.router.add_get('/v1/market/info', self._handle_info)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def buy_url(self) -> str:
+        return f"{self.base_url}/market/buy"
+
+    @property
+    def balance_url(self) -> str:
+        return f"{self.base_url}/user/balance"
+
+    @property
+    def info_url(self) -> str:
+        return f"{self.base_url}/market/info"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+        logger.info(f"🧪 Локальный маркет запущен: {self.base_url}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_balance(self, request: web.Request) -> web.Response:
+        return web.json_response({'data': {'balance': 1000.0}})
+
+    async def _handle_buy(self, request: web.Request) -> web.Response:
+        now = time.perf_counter()
+        payload = await request.json()
+        ids = payload.get('ids', [])
+        for item_id in ids:
+            self.received_at.setdefault(item_id, now)
+        self.buy_requests.append({'time': now, 'payload': payload})
+
+        latency = self.latency
+        if self.tail_ratio and self._random.random() < self.tail_ratio:
+            latency = self.tail_latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        self._purchase_seq += 1
+        purchase = {
+            'purchase_id': self._purchase_seq,
+            'steam_id': None,
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'custom_id': payload.get('custom_id'),
+            'skins': [
+                {'id': item_id, 'price': payload.get('max_price'), 'status': 'processing'}
+                for item_id in ids
+            ],
+        }
+        self.purchases[self._purchase_seq] = {'time': time.perf_counter(), 'purchase': purchase}
+        return web.json_response({'data': purchase})
+
+    def _status_at(self, elapsed: float) -> str:
+        status = self.status_timeline[0][1]
+        for offset, name in self.status_timeline:
+            if elapsed >= offset:
+                status = name
+        return status
+
+    async def _handle_info(self, request: web.Request) -> web.Response:
+        ids = [int(value) for value in request.query.getall(self.info_param, [])]
+        self.info_requests.append(ids)
+        now = time.perf_counter()
+        data = []
+        for purchase_id in ids:
+            stored = self.purchases.get(purchase_id)
+            if stored is None:
+                continue
+            status = self._status_at(now - stored['time'])
+            purchase = stored['purchase']
+            data.append({**purchase, 'skins': [{**skin, 'status': status} for skin in purchase['skins']]})
+        return web.json_response({'data': data})
@@ -0,0 +1,69 @@
+"""Слияние копий публикаций из нескольких подключений"""
+import time
+from typing import Any, Dict, Hashable, List
+
+from utils.expiring import ExpiringMap
+from utils.metrics import metrics
+
+# Опережение бывает от долей миллисекунды до секунд
+LEAD_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class ArrivalMerger:
+    """Первая копия публикации проходит дальше, остальные отбрасываются.
+
+    Ключ - (id предмета, тип события), окно - window секунд. Для
+    каждого подключения считается, сколько раз его копия пришла первой
+    и на сколько она опередила копии остальных подключений.
+    """
+
+    def __init__(self, connections: int, window: float, capacity: int):
+        self.seen = ExpiringMap(window, capacity)
+        self.first = [0] * connections
+        self.duplicates = [0] * connections
+        self.lead_total = [0.0] * connections
+        self.lead_count = [0] * connections
+
+        self._first_counters = [
+            metrics.counter('ws_first_arrivals_total', 'Публикации, первой пришедшие по подключению',
+                            {'connection': f'ws{index}'})
+            for index in range(connections)
+        ]
+        self._lead_histograms = [
+            metrics.histogram('ws_arrival_lead_seconds', 'Опережение копии подключения над остальными',
+                              {'connection': f'ws{index}'}, buckets=LEAD_BUCKETS)
+            for index in range(connections)
+        ]
+
+    def accept(self, key: Hashable, connection: int) -> bool:
+        """True, если копия пришла первой и её нужно обработать"""
+        now = time.monotonic()
+        entry = self.seen.get(key)
+        if entry is None:
+            self.seen.set(key, (connection, now))
+            self.first[connection] += 1
+            self._first_counters[connection].inc()
+            return True
+
+        winner, arrived = entry
+        if winner != connection:
+            lead = now - arrived
+            self.lead_total[winner] += lead
+            self.lead_count[winner] += 1
+            self._lead_histograms[winner].observe(lead)
+        self.duplicates[connection] += 1
+        return False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        total = sum(self.first) or 1
+        return [
+            {
+                'connection': f'ws{index}',
+                'first': self.first[index],
+                'duplicates': self.duplicates[index],
+                'first_share': round(self.first[index] / total, 3),
+                'avg_lead_ms': round(self.lead_total[index] / self.lead_count[index] * 1000, 2)
+                if self.lead_count[index] else None,
+            }
+            for index in range(len(self.first))
+        ]
@@ -0,0 +1,192 @@
+"""Подключение к WebSocket с подпиской на канал"""
+import asyncio
+import time
+from typing import Optional
+
+from centrifuge import Client, ClientEventHandler, ConnectedContext, DisconnectedContext
+
+from config import (
+    WS_URL, WS_CHANNEL, WS_STREAM_POSITION_TTL,
+    RECONNECT_DELAY, RECONNECT_MAX_DELAY, RECONNECT_JITTER, RECONNECT_HEALTHY_AFTER,
+    RECONNECT_ALERT_AFTER, NO_EVENTS_TIMEOUT
+)
+from handlers.websocket_handler import CSGOEventHandler
+from tracker.stream_cursor import StreamCursor
+from utils.logger import setup_logger
+from utils.rate_limit import Backoff
+from utils.telegram_outbox import PRIORITY_HIGH
+
+logger = setup_logger(__name__)
+
+
+class ConnectionMonitor(ClientEventHandler):
+    """Мониторинг состояния соединения"""
+    def __init__(self, connection: 'WsConnection'):
+        self.connection = connection
+
+    async def on_connected(self, ctx: ConnectedContext) -> None:
+        logger.info(f"✅ [{self.connection.name}] WebSocket подключен: client_id={ctx.client}, version={ctx.version}")
+        self.connection.is_connected = True
+
+    async def on_disconnected(self, ctx: DisconnectedContext) -> None:
+        logger.warning(f"❌ [{self.connection.name}] WebSocket отключен: code={ctx.code}, reason={ctx.reason}")
+        self.connection.is_connected = False
+        self.connection.lost.set()
+
+        # Токен истёк или отклонён: следующее подключение получит новый
+        if ctx.code in (3005, 3500):
+            self.connection.tracker.tokens.invalidate()
+
+        # Коды ошибок, требующие переподключения
+        reconnect_codes = [1, 3005, 3501, 1006]
+
+        if ctx.code in reconnect_codes:
+            logger.warning(f"🔄 [{self.connection.name}] Требуется переподключение из-за отключения WebSocket")
+            self.connection.needs_reconnect = True
+            self.connection.running = False  # Прерываем текущий цикл
+
+
+class WsConnection:
+    """Одно подключение к WS_CHANNEL со своим циклом переподключения.
+
+    У каждого подключения своя позиция в потоке (для восстановления
+    после разрыва) и свой контроль тишины: если по нему нет публикаций
+    NO_EVENTS_TIMEOUT секунд, переподключается только оно. Обрыв,
+    тишина и остановка выставляют событие lost, которое сразу будит
+    цикл подключения.
+    """
+
+    def __init__(self, tracker, index: int):
+        self.tracker = tracker
+        self.index = index
+        self.name = f"ws{index}"
+        self.client: Optional[Client] = None
+        self.running = True
+        self.is_connected = False
+        self.needs_reconnect = False
+        self.connected_at: Optional[float] = None
+        self.last_activity = time.monotonic()
+        self.events_count = 0
+        self.lost = asyncio.Event()
+        self.watchdog_task: Optional[asyncio.Task] = None
+        self.backoff = Backoff(RECONNECT_DELAY, RECONNECT_MAX_DELAY, RECONNECT_JITTER)
+        self.stream = StreamCursor(WS_STREAM_POSITION_TTL)
+
+    async def watchdog(self):
+        """Переподключение, если по подключению NO_EVENTS_TIMEOUT секунд нет публикаций.
+
+        Спит ровно до момента, когда тишина превысит порог.
+        """
+        while not self.lost.is_set():
+            remaining = self.last_activity + NO_EVENTS_TIMEOUT - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"⚠️ [{self.name}] Нет событий {NO_EVENTS_TIMEOUT} сек, инициируем переподключение...")
+                self.needs_reconnect = True
+                self.lost.set()
+                return
+            await asyncio.sleep(remaining)
+
+    async def connect_and_subscribe(self):
+        """Подключение и подписка с обработкой ошибок"""
+        self.lost.clear()
+        try:
+            token = await self.tracker.get_websocket_token()
+
+            # Создаем новый клиент
+            self.client = Client(
+                WS_URL,
+                token=token,
+                get_token=self.tracker.get_websocket_token,
+                events=ConnectionMonitor(self)
+            )
+
+            logger.info(f"📡 [{self.name}] Создание подписки...")
+            sub = self.client.new_subscription(
+                WS_CHANNEL,
+                events=CSGOEventHandler(self.tracker, self.tracker.runtime, self),
+                recoverable=True,
+                positioned=True
+            )
+            self.stream.seed(sub)
+
+            logger.info(f"🔌 [{self.name}] Подключение к WebSocket...")
+            await self.client.connect()
+
+            logger.info(f"📥 [{self.name}] Подписка на канал...")
+            await sub.subscribe()
+            await sub.ready()
+
+            logger.info(f"✅ [{self.name}] Успешно подключено к WebSocket")
+            self.connected_at = time.monotonic()
+            self.last_activity = self.connected_at
+            self.is_connected = True
+            self.needs_reconnect = False
+
+            self.watchdog_task = asyncio.create_task(self.watchdog())
+
+            # Держим соединение до обрыва, тишины или остановки
+            await self.lost.wait()
+
+            logger.info(f"🔚 [{self.name}] Выход из цикла подключения")
+
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Ошибка соединения: {str(e)}")
+            self.is_connected = False
+            raise
+        finally:
+            # Отменяем фоновые задачи
+            if self.watchdog_task:
+                self.watchdog_task.cancel()
+                try:
+                    await self.watchdog_task
+                except asyncio.CancelledError:
+                    pass
+                self.watchdog_task = None
+
+            if self.client:
+                try:
+                    await self.client.disconnect()
+                except:
+                    pass
+                self.client = None
+            self.is_connected = False
+
+    async def run(self):
+        """Подключение с переподключением до остановки трекера"""
+        while not self.tracker.stop_requested:
+            try:
+                logger.info(f"🔄 [{self.name}] Попытка подключения {self.backoff.attempts + 1}")
+                self.running = True
+                self.is_connected = False
+                self.needs_reconnect = False
+
+                await self.connect_and_subscribe()
+
+            except Exception as e:
+                logger.error(f"❌ [{self.name}] Соединение потеряно: {str(e)}")
+
+            if self.tracker.stop_requested:
+                break
+
+            # Соединение продержалось достаточно - это новый сбой, а не серия
+            if self.connected_at is not None and time.monotonic() - self.connected_at >= RECONNECT_HEALTHY_AFTER:
+                self.backoff.reset()
+            self.connected_at = None
+
+            delay = self.backoff.next_delay()
+            if self.backoff.attempts == RECONNECT_ALERT_AFTER:
+                self.tracker.send_alert(f"⚠️ <b>Нет соединения с WebSocket ({self.name})</b>\n"
+                                        f"Неудачных попыток: {self.backoff.attempts}, переподключение продолжается",
+                                        priority=PRIORITY_HIGH)
+            if delay:
+                logger.info(f"⏳ [{self.name}] Переподключение через {delay:.1f} сек...")
+                try:
+                    await asyncio.wait_for(self.tracker.stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                logger.info(f"📡 [{self.name}] Переподключение...")
+
+    def stop(self):
+        self.running = False
+        self.lost.set()
@@ -0,0 +1,163 @@
+"""Фильтры и стратегии, перезагружаемые без перезапуска бота"""
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config import AUTO_BUY_STRATEGIES
+from models.float_rules import FloatRuleStore
+from models.strategies import StrategyEngine
+from utils.keyword_matcher import KeywordMatcher, default_keywords, build_keyword_matcher
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+RELOAD_OK = metrics.counter('config_reloads_total', 'Перезагрузки фильтров и стратегий', {'result': 'ok'})
+RELOAD_FAILED = metrics.counter('config_reloads_total', 'Перезагрузки фильтров и стратегий', {'result': 'error'})
+
+
+class RuntimeConfig:
+    """Неизменяемый набор собранных фильтров одной версии"""
+
+    __slots__ = ('version', 'digest', 'keyword_matcher', 'float_rules', 'strategy_engine', 'loaded_at')
+
+    def __init__(self, version: int, digest: str, keyword_matcher: KeywordMatcher,
+                 float_rules: FloatRuleStore, strategy_engine: StrategyEngine):
+        self.version = version
+        self.digest = digest
+        self.keyword_matcher = keyword_matcher
+        self.float_rules = float_rules
+        self.strategy_engine = strategy_engine
+        self.loaded_at = time.time()
+
+    @classmethod
+    def build(cls, spec: Dict[str, Any], version: int) -> 'RuntimeConfig':
+        """Сборка матчера, индексов float и дерева стратегий; ошибки пробрасываются"""
+        keyword_matcher = build_keyword_matcher(spec['keywords'])
+        float_rules = FloatRuleStore.from_dict(spec['float_ranges'])
+        strategy_engine = StrategyEngine(spec['strategies'], keyword_matcher.classify)
+        digest = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+        return cls(version, digest, keyword_matcher, float_rules, strategy_engine)
+
+
+class RuntimeConfigStore:
+    """Текущая версия фильтров и её атомарная замена.
+
+    Исходные данные: ключевые слова и стратегии из config.py, поверх
+    которых накладывается overrides_path (JSON с ключами "keywords" и
+    "strategies"), и диапазоны float из float_ranges_path. Новая версия
+    собирается в отдельном потоке и подменяет current одной операцией
+    присваивания: обработчик берёт current один раз на событие, поэтому
+    каждое событие видит одну согласованную версию. Ошибка сборки
+    оставляет прежнюю версию.
+
+    Перезагрузка: reload() (команда /reload), изменение файлов
+    (проверка раз в watch_interval секунд) или SIGHUP.
+    """
+
+    def __init__(self, overrides_path: Optional[str], float_ranges_path: str, watch_interval: float = 0.0):
+        self.overrides_path = overrides_path
+        self.float_ranges_path = float_ranges_path
+        self.watch_interval = watch_interval
+        self._lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._sighup = False
+        self._mtimes = self._file_mtimes()
+
+        try:
+            self.current = RuntimeConfig.build(self._read_spec(), 1)
+        except Exception as e:
+            logger.error(f"Ошибка конфигурации фильтров, используются значения из config.py: {e}")
+            spec = {'keywords': default_keywords(), 'strategies': AUTO_BUY_STRATEGIES,
+                    'float_ranges': self._read_float_ranges(strict=False)}
+            self.current = RuntimeConfig.build(spec, 1)
+
+        metrics.gauge('config_version', 'Версия фильтров и стратегий', getter=lambda: self.current.version)
+
+    def _file_mtimes(self) -> Tuple[Optional[float], ...]:
+        mtimes = []
+        for path in (self.overrides_path, self.float_ranges_path):
+            try:
+                mtimes.append(os.stat(path).st_mtime if path else None)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _read_float_ranges(self, strict: bool = True) -> Dict[str, Any]:
+        try:
+            with open(self.float_ranges_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            if strict:
+                raise
+            logger.error(f"Не удалось загрузить диапазоны float из {self.float_ranges_path}: {e}")
+            return {}
+
+    def _read_spec(self) -> Dict[str, Any]:
+        spec = {
+            'keywords': default_keywords(),
+            'strategies': AUTO_BUY_STRATEGIES,
+            'float_ranges': self._read_float_ranges(),
+        }
+        if self.overrides_path and os.path.exists(self.overrides_path):
+            with open(self.overrides_path, encoding='utf-8') as f:
+                overrides = json.load(f)
+            spec['keywords'] = {**spec['keywords'], **overrides.get('keywords', {})}
+            spec['strategies'] = overrides.get('strategies', spec['strategies'])
+        return spec
+
+    async def reload(self, reason: str = 'manual') -> Tuple[bool, str]:
+        """Сборка новой версии и замена текущей; (успех, описание)"""
+        async with self._lock:
+            self._mtimes = self._file_mtimes()
+            version = self.current.version + 1
+            try:
+                spec = await asyncio.to_thread(self._read_spec)
+                config = await asyncio.to_thread(RuntimeConfig.build, spec, version)
+            except Exception as e:
+                RELOAD_FAILED.inc()
+                logger.error(f"❌ Перезагрузка фильтров ({reason}) не удалась, остаётся v{self.current.version}: {e}")
+                return False, f"ошибка: {e}"
+
+            if config.digest == self.current.digest:
+                return True, f"без изменений, v{self.current.version}"
+
+            self.current = config
+            RELOAD_OK.inc()
+            logger.info(f"🔄 Фильтры перезагружены ({reason}): v{config.version} [{config.digest}]")
+            return True, f"v{config.version} [{config.digest}]"
+
+    def start(self):
+        """Слежение за файлами и SIGHUP"""
+        if self.watch_interval and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGHUP, lambda: asyncio.ensure_future(self.reload('SIGHUP'))
+            )
+            self._sighup = True
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # SIGHUP нет на Windows, сигналы доступны только в главном потоке
+            pass
+
+    async def stop(self):
+        if self._sighup:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            self._sighup = False
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self._file_mtimes() != self._mtimes:
+                await self.reload('изменение файла')
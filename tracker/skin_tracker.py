@@ -1,339 +1,243 @@
 """Основной класс трекера скинов"""
 import asyncio
-import aiohttp
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from centrifuge import Client, ClientEventHandler, ConnectedContext, DisconnectedContext
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application
 
 from config import (
     API_KEY, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID,
-    WS_URL, WS_TOKEN_URL, WS_CHANNEL,
-    MAX_RECONNECT_ATTEMPTS, RECONNECT_DELAY,
-    HEARTBEAT_INTERVAL, NO_EVENTS_TIMEOUT,
-    CACHE_CLEANUP_INTERVAL, CACHE_ITEM_TTL,
-    FLOAT_RANGES
+    WS_TOKEN_URL, WS_TOKEN_TTL, WS_TOKEN_REFRESH_AHEAD,
+    WS_CONNECTIONS, WS_ARRIVAL_WINDOW, WS_ARRIVAL_CAPACITY, HEARTBEAT_INTERVAL,
+    DUPLICATE_CHECK_WINDOW, DUPLICATE_CACHE_CAPACITY, ACTIVE_LISTINGS_TTL, ACTIVE_LISTINGS_CAPACITY,
+    FLOAT_RANGES_FILE, RUNTIME_CONFIG_FILE, RUNTIME_CONFIG_WATCH_INTERVAL,
+    PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, JOURNAL_PATH,
+    TELEGRAM_RATE, TELEGRAM_BURST, TELEGRAM_QUEUE_SIZE, TELEGRAM_OUTAGE_RETRY, TELEGRAM_RETRY_AFTER_LIMIT,
+    TELEGRAM_SPOOL_PATH,
+    STATE_SNAPSHOT_PATH, STATE_SNAPSHOT_INTERVAL,
+    SUPERVISOR_MAX_RESTARTS, SUPERVISOR_RESTART_WINDOW, SUPERVISOR_RESTART_DELAY, SUPERVISOR_MAX_RESTART_DELAY
 )
 from models.skin_purchaser import SkinPurchaser
-from handlers.websocket_handler import CSGOEventHandler
+from models.spend_governor import BudgetExceeded
+from handlers.websocket_handler import ActiveListing
+from tracker.arrivals import ArrivalMerger
+from tracker.connection import WsConnection
+from tracker.runtime_config import RuntimeConfigStore
+from tracker.ws_token import WsTokenCache
 from utils.logger import setup_logger
+from utils.event_pipeline import EventPipeline
+from utils.journal import PublicationJournal
+from utils.expiring import ExpiringMap
+from utils.state_snapshot import StateSnapshot
+from utils.supervisor import Supervisor, service
+from utils.metrics import metrics
+from utils.callback_store import encode_buy_callback
+from utils.telegram_outbox import TelegramOutbox, PRIORITY_NORMAL
 
 logger = setup_logger(__name__)
 
 
-class ConnectionMonitor(ClientEventHandler):
-    """Мониторинг состояния соединения"""
-    def __init__(self, tracker):
-        self.tracker = tracker
-    
-    async def on_connected(self, ctx: ConnectedContext) -> None:
-        logger.info(f"✅ WebSocket подключен: client_id={ctx.client}, version={ctx.version}")
-        self.tracker.is_connected = True
-        
-    async def on_disconnected(self, ctx: DisconnectedContext) -> None:
-        logger.warning(f"❌ WebSocket отключен: code={ctx.code}, reason={ctx.reason}")
-        self.tracker.is_connected = False
-        
-        # Коды ошибок, требующие переподключения
-        reconnect_codes = [1, 3005, 3501, 1006]
-        
-        if ctx.code in reconnect_codes:
-            logger.warning("🔄 Требуется переподключение из-за отключения WebSocket")
-            self.tracker.needs_reconnect = True
-            self.tracker.running = False  # Прерываем текущий цикл
-
-
 class CSGOSkinTracker:
     """Основной класс трекера CS:GO скинов"""
     
-    def __init__(self, telegram_app: Application):
-        self.bot = Bot(token=TELEGRAM_TOKEN)
+    def __init__(self, telegram_app: Application, bot: Optional[Bot] = None,
+                 purchaser: Optional[SkinPurchaser] = None):
+        self.bot = bot or Bot(token=TELEGRAM_TOKEN)
         self.telegram_app = telegram_app
-        self.client = None
         self.running = True
-        self.is_connected = False
-        self.needs_reconnect = False
-        self.reconnect_attempts = 0
-        self.max_reconnect_attempts = MAX_RECONNECT_ATTEMPTS
-        self.reconnect_delay = RECONNECT_DELAY
+        self.stopping = asyncio.Event()
+        self.supervisor: Optional[Supervisor] = None
+        self.tokens = WsTokenCache(WS_TOKEN_URL, API_KEY, WS_TOKEN_TTL, WS_TOKEN_REFRESH_AHEAD)
         self.last_event_time = datetime.now()
         self.heartbeat_task = None
         self.events_count = 0
-        self.purchaser = SkinPurchaser()
+        self.purchaser = purchaser or SkinPurchaser()
+        self.status_tracker = None
+        self.outbox = TelegramOutbox(
+            self.bot, TELEGRAM_CHAT_ID, TELEGRAM_RATE, TELEGRAM_BURST, TELEGRAM_QUEUE_SIZE,
+            TELEGRAM_SPOOL_PATH, outage_retry_interval=TELEGRAM_OUTAGE_RETRY,
+            retry_after_limit=TELEGRAM_RETRY_AFTER_LIMIT
+        )
+        self.journal = PublicationJournal(JOURNAL_PATH) if JOURNAL_PATH else None
+        self.pipeline = EventPipeline(PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE)
+        self.runtime = RuntimeConfigStore(RUNTIME_CONFIG_FILE, FLOAT_RANGES_FILE, RUNTIME_CONFIG_WATCH_INTERVAL)
         
-        # Кеши для дедупликации
-        self.sent_new_items = {}
-        self.sent_sold_items = {}
-        self.cache_cleanup_interval = CACHE_CLEANUP_INTERVAL
-
-    async def send_alert(self, message: str, item_id: Optional[int] = None, 
-                        price: Optional[float] = None):
-        """Отправка сообщения с кнопкой покупки"""
+        # Предметы, прошедшие критерии, живут между переподключениями
+        self.active_listings = ExpiringMap(ACTIVE_LISTINGS_TTL, ACTIVE_LISTINGS_CAPACITY)
+        metrics.gauge('active_listings', 'Отслеживаемые выставленные предметы',
+                      getter=lambda: len(self.active_listings))
+        
+        # Кеши для дедупликации: id живёт DUPLICATE_CHECK_WINDOW секунд
+        self.sent_new_items = ExpiringMap(DUPLICATE_CHECK_WINDOW, DUPLICATE_CACHE_CAPACITY)
+        self.sent_sold_items = ExpiringMap(DUPLICATE_CHECK_WINDOW, DUPLICATE_CACHE_CAPACITY)
+        
+        # Подключения к каналу; при нескольких публикации сливаются:
+        # обрабатывается копия, пришедшая первой
+        self.connections = [WsConnection(self, index) for index in range(max(1, WS_CONNECTIONS))]
+        self.arrivals = ArrivalMerger(len(self.connections), WS_ARRIVAL_WINDOW, WS_ARRIVAL_CAPACITY) \
+            if len(self.connections) > 1 else None
+        
+        # Снимки на диск: после перезапуска состояние восстанавливается
+        # в track_skins (купленные id регистрирует main.py)
+        self.state = StateSnapshot(STATE_SNAPSHOT_PATH, STATE_SNAPSHOT_INTERVAL)
+        self.state.register('active_listings', self.active_listings,
+                            ActiveListing.to_record, ActiveListing.from_record)
+        self.state.register('sent_new', self.sent_new_items)
+        self.state.register('sent_sold', self.sent_sold_items)
+        # Позиция в потоке у каждого подключения своя
+        for connection in self.connections:
+            name = 'stream' if connection.index == 0 else f'stream_{connection.index}'
+            self.state.register(name, connection.stream.positions)
+
+    def send_alert(self, message: str, item_id: Optional[int] = None,
+                   price: Optional[float] = None, priority: str = PRIORITY_NORMAL,
+                   on_sent: Optional[Callable[[Any], None]] = None):
+        """Постановка сообщения с кнопкой покупки в очередь Telegram.
+
+        Не ждёт отправки; on_sent вызывается с отправленным сообщением.
+        """
         try:
             keyboard = []
             
             if item_id:
-                callback_data = f"buy_{item_id}"
+                callback_data = encode_buy_callback(item_id, price)
                 keyboard.append([InlineKeyboardButton("🛒 Купить", callback_data=callback_data)])
-                
-                # Сохраняем данные о предмете
-                if not hasattr(self.telegram_app.bot_data, 'purchase_data'):
-                    self.telegram_app.bot_data['purchase_data'] = {}
-                    
-                self.telegram_app.bot_data['purchase_data'][str(item_id)] = {
-                    "id": item_id,
-                    "price": price,
-                    "timestamp": datetime.now().isoformat()
-                }
             
             reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-            
-            await self.bot.send_message(
-                chat_id=TELEGRAM_CHAT_ID,
-                text=message,
-                parse_mode="HTML",
-                reply_markup=reply_markup
-            )
+            self.outbox.send(message, priority, reply_markup, on_sent)
         except Exception as e:
             logger.error(f"Ошибка отправки в Telegram: {e}")
 
     async def get_websocket_token(self) -> str:
-        """Получение токена для WebSocket"""
-        headers = {"Authorization": f"Bearer {API_KEY}"}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(WS_TOKEN_URL, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                return data['data']['token']
+        """Токен для WebSocket: из кеша, новый - только перед истечением"""
+        return await self.tokens.get()
 
     def is_csgo_item(self, data: Dict[str, Any]) -> bool:
         """Проверка, является ли предмет из CS:GO"""
         return data.get('game_id') == 1
 
-    async def heartbeat_monitor(self):
-        """Мониторинг активности соединения"""
-        while self.running:
-            try:
-                await asyncio.sleep(HEARTBEAT_INTERVAL)
-                
-                time_since_last_event = datetime.now() - self.last_event_time
-                logger.info(f"📊 Статус: События обработано: {self.events_count}, "
-                          f"Последнее событие: {time_since_last_event.seconds} сек назад")
-                
-                if time_since_last_event > timedelta(seconds=NO_EVENTS_TIMEOUT):
-                    logger.warning("⚠️ Нет событий более 5 минут, инициируем переподключение...")
-                    self.running = False
-                    break
-                        
-            except Exception as e:
-                logger.error(f"Ошибка в heartbeat: {e}")
+    @property
+    def stop_requested(self) -> bool:
+        return self.stopping.is_set()
 
-    async def cleanup_cache(self):
-        """Очистка старых записей из кеша"""
-        while self.running:
-            try:
-                await asyncio.sleep(self.cache_cleanup_interval)
-                current_time = datetime.now()
-                cutoff_time = current_time - timedelta(seconds=CACHE_ITEM_TTL)
-                
-                # Очистка кешей
-                self.sent_new_items = {
-                    item_id: timestamp 
-                    for item_id, timestamp in self.sent_new_items.items() 
-                    if timestamp > cutoff_time
-                }
-                
-                self.sent_sold_items = {
-                    item_id: timestamp 
-                    for item_id, timestamp in self.sent_sold_items.items() 
-                    if timestamp > cutoff_time
-                }
-                
-                logger.info(f"🧹 Очистка кеша: новых {len(self.sent_new_items)}, "
-                          f"проданных {len(self.sent_sold_items)}")
-            except Exception as e:
-                logger.error(f"Ошибка очистки кеша: {e}")
+    @property
+    def is_connected(self) -> bool:
+        return any(connection.is_connected for connection in self.connections)
 
     async def heartbeat_monitor(self):
-        """Мониторинг активности соединения"""
-        while self.running:
+        """Периодический отчёт о состоянии"""
+        while not self.stop_requested:
             try:
                 await asyncio.sleep(HEARTBEAT_INTERVAL)
                 
                 time_since_last_event = datetime.now() - self.last_event_time
+                connected = sum(connection.is_connected for connection in self.connections)
                 logger.info(f"📊 Статус: События обработано: {self.events_count}, "
                           f"Последнее событие: {time_since_last_event.seconds} сек назад, "
-                          f"Подключен: {self.is_connected}")
+                          f"Подключений: {connected}/{len(self.connections)}")
+                
+                if self.arrivals:
+                    for stats in self.arrivals.stats():
+                        logger.info(f"🏁 {stats['connection']}: первым {stats['first']} "
+                                  f"({stats['first_share']:.0%}), копий {stats['duplicates']}, "
+                                  f"опережение {stats['avg_lead_ms']} мс")
                 
-                # Если нет событий более 5 минут или соединение потеряно
-                if time_since_last_event > timedelta(seconds=NO_EVENTS_TIMEOUT) or not self.is_connected:
-                    logger.warning("⚠️ Проблема с соединением, инициируем переподключение...")
-                    self.needs_reconnect = True
-                    self.running = False
-                    break
+                pipeline_stats = self.pipeline.stats()
+                logger.info(f"⚙️ Конвейер: очередь {pipeline_stats['depth']}, "
+                          f"отброшено {pipeline_stats['dropped']}, "
+                          f"макс. глубина {pipeline_stats['max_depth']}")
+                logger.info(f"📌 Отслеживается выставленных предметов: {len(self.active_listings)}, "
+                          f"в кеше дубликатов: новых {len(self.sent_new_items)}, "
+                          f"проданных {len(self.sent_sold_items)}")
                         
             except Exception as e:
                 logger.error(f"Ошибка в heartbeat: {e}")
 
-    async def connect_and_subscribe(self):
-        """Подключение и подписка с обработкой ошибок"""
-        try:
-            logger.info("🔑 Получение токена...")
-            token = await self.get_websocket_token()
-            logger.info("✅ Токен получен")
-            
-            # Создаем новый клиент
-            self.client = Client(
-                WS_URL,
-                token=token,
-                events=ConnectionMonitor(self)  # Передаем self для доступа к tracker
-            )
-            
-            logger.info("📡 Создание подписки...")
-            sub = self.client.new_subscription(
-                WS_CHANNEL,
-                events=CSGOEventHandler(self, FLOAT_RANGES)
-            )
-            
-            logger.info("🔌 Подключение к WebSocket...")
-            await self.client.connect()
+    async def track_skins(self, supervisor: Optional[Supervisor] = None):
+        """Работа трекера до остановки.
 
-            await asyncio.sleep(0.5)
-            
-            logger.info("📥 Подписка на канал...")
-            await sub.subscribe()
-            
-            logger.info("✅ Успешно подключено к WebSocket")
-            self.reconnect_attempts = 0
-            self.is_connected = True
-            self.needs_reconnect = False
-            
-            # Запускаем фоновые задачи
-            if self.heartbeat_task:
-                self.heartbeat_task.cancel()
-                try:
-                    await self.heartbeat_task
-                except asyncio.CancelledError:
-                    pass
-                    
-            self.heartbeat_task = asyncio.create_task(self.heartbeat_monitor())
-            
-            self.cache_cleanup_task = asyncio.create_task(self.cleanup_cache())
-            
-            logger.info("💓 Heartbeat мониторинг запущен")
-            
-            # Держим соединение
-            while self.running and self.is_connected and not self.needs_reconnect:
-                await asyncio.sleep(1)
-                
-            logger.info("🔚 Выход из цикла подключения")
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка соединения: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            self.is_connected = False
-            raise
-        finally:
-            # Отменяем фоновые задачи
-            if self.heartbeat_task:
-                self.heartbeat_task.cancel()
-                try:
-                    await self.heartbeat_task
-                except asyncio.CancelledError:
-                    pass
-                
-            if hasattr(self, 'cache_cleanup_task'):
-                self.cache_cleanup_task.cancel()
-                try:
-                    await self.cache_cleanup_task
-                except asyncio.CancelledError:
-                    pass
-                
-            if self.client:
-                try:
-                    await self.client.disconnect()
-                except:
-                    pass
-                self.client = None
-    
-    async def track_skins(self):
-        """Основной цикл с автоматическим переподключением"""
+        Подключения к WebSocket, очередь Telegram и отчёт о состоянии -
+        компоненты супервизора: упавший перезапускается отдельно, без
+        потери состояния трекера. supervisor может уже содержать
+        компоненты вызывающего кода (покупки); SupervisorGaveUp
+        пробрасывается после остановки трекера.
+        """
         logger.info("🚀 Запуск трекера CS:GO предметов...")
-
         
         # Выводим настройки
         self._log_settings()
         
-        while self.reconnect_attempts < self.max_reconnect_attempts:
-            try:
-                logger.info(f"🔄 Попытка подключения {self.reconnect_attempts + 1}/{self.max_reconnect_attempts}")
-                self.running = True
-                self.is_connected = False
-                self.needs_reconnect = False
-                
-                await self.connect_and_subscribe()
-                
-                # Если вышли из connect_and_subscribe из-за self.needs_reconnect
-                if self.needs_reconnect:
-                    logger.info("📡 Требуется переподключение...")
-                    self.reconnect_attempts += 1
-                    
-                    if self.reconnect_attempts < self.max_reconnect_attempts:
-                        delay = min(self.reconnect_delay * self.reconnect_attempts, 60)
-                        logger.info(f"⏳ Переподключение через {delay} секунд...")
-                        await asyncio.sleep(delay)
-                        continue
-                    else:
-                        logger.error("❌ Превышено максимальное количество попыток переподключения")
-                        await self.send_alert("❌ <b>Бот остановлен</b>\nПревышено количество попыток переподключения")
-                        break
-                elif not self.running:
-                    # Если остановка была вызвана извне (например, Ctrl+C)
-                    logger.info("🛑 Остановка по запросу")
-                    break
-                    
-            except Exception as e:
-                self.reconnect_attempts += 1
-                logger.error(f"❌ Соединение потеряно: {str(e)}")
-                
-                if self.reconnect_attempts < self.max_reconnect_attempts:
-                    delay = min(self.reconnect_delay * self.reconnect_attempts, 60)
-                    logger.info(f"⏳ Переподключение через {delay} секунд...")
-                    await asyncio.sleep(delay)
-                else:
-                    logger.error("❌ Превышено максимальное количество попыток переподключения")
-                    await self.send_alert("❌ <b>Бот остановлен</b>\nПревышено количество попыток переподключения")
-                    break
+        await self.state.restore()
+        self.state.start()
+        self.pipeline.start()
+        self.runtime.start()
+        self.tokens.start()
+        if self.journal:
+            self.journal.start()
+        
+        self.supervisor = supervisor or Supervisor(
+            SUPERVISOR_MAX_RESTARTS, SUPERVISOR_RESTART_WINDOW,
+            SUPERVISOR_RESTART_DELAY, SUPERVISOR_MAX_RESTART_DELAY
+        )
+        # Подключения независимы: сбой одного не трогает остальные
+        for connection in self.connections:
+            self.supervisor.add(connection.name, connection.run)
+        self.supervisor.add('telegram', service(self.outbox.start, self.outbox.stop, self.outbox.wait))
+        self.supervisor.add('heartbeat', self.heartbeat_monitor)
         
-        logger.info("🔌 Трекер остановлен")
-        self.running = False
-        self.is_connected = False
-
-    async def auto_buy_skin(self, skin_id: int, price: float):
         try:
-            result = await self.purchaser.buy_skin(skin_id, max_price=price * 1.1)
+            if not self.stop_requested:
+                await self.supervisor.run()
+        finally:
+            self.stop()
+            await self.outbox.stop()
+            await self.pipeline.stop()
+            await self.runtime.stop()
+            await self.state.stop()
+            await self.tokens.stop()
+            if self.journal:
+                await self.journal.stop()
+            logger.info("🔌 Трекер остановлен")
+            self.running = False
+
+    async def auto_buy_skin(self, skin_id: int, price: float, price_multiplier: float = 1.1,
+                            expected_value: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Автопокупка с ограничением цены price * price_multiplier"""
+        try:
+            result = await self.purchaser.buy_skin(
+                skin_id, max_price=price * price_multiplier, expected_value=expected_value
+            )
             if result:
                 purchase_id = result.get('purchase_id')
                 logger.info(f"✅ Автопокупка успешна! Purchase ID: {purchase_id}")
+                return result
             else:
                 logger.error("❌ Ошибка автопокупки")
+        except BudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Ошибка автопокупки: {e}")
+        return None
 
     def stop(self):
         """Остановка трекера"""
+        if self.stop_requested:
+            return
         logger.info("🛑 Остановка трекера...")
+        self.stopping.set()
         self.running = False
+        for connection in self.connections:
+            connection.stop()
+        if self.supervisor:
+            self.supervisor.stop()
 
     def _log_settings(self):
         """Вывод текущих настроек"""
-        from config import STICKER_KEYWORDS, CHARM_KEYWORDS
+        config = self.runtime.current
         
-        logger.info(f"📋 Настройки:")
+        logger.info(f"📋 Настройки (фильтры v{config.version} [{config.digest}]):")
         logger.info(f"   API Key: {API_KEY[:10]}...")
-        logger.info(f"   Float диапазоны: {FLOAT_RANGES}")
-        logger.info(f"   Ключевые слова стикеров: {len(STICKER_KEYWORDS)} шт.")
-        logger.info(f"   Ключевые слова чармов: {len(CHARM_KEYWORDS)} шт.")
\ No newline at end of file
+        logger.info(f"   Float диапазоны: {config.float_rules.summary()}")
+        logger.info(f"   Ключевые слова: {config.keyword_matcher.describe()}")
+        logger.info(f"   Стратегии: {config.strategy_engine.describe()}")
+        logger.info(f"   Подключений к каналу: {len(self.connections)}")
\ No newline at end of file
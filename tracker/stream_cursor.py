@@ -0,0 +1,115 @@
+"""Позиция в потоке канала для восстановления пропущенных публикаций"""
+from typing import Optional, Tuple
+
+from utils.expiring import ExpiringMap
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+RECOVERED = metrics.counter('stream_recovery_total', 'Переподписки с восстановлением позиции',
+                            {'result': 'recovered'})
+NOT_RECOVERED = metrics.counter('stream_recovery_total', 'Переподписки с восстановлением позиции',
+                                {'result': 'lost'})
+RECOVERED_PUBLICATIONS = metrics.counter('stream_recovered_publications_total',
+                                         'Публикации, полученные при восстановлении')
+LOST_PUBLICATIONS = metrics.counter('stream_lost_publications_total',
+                                    'Публикации, пропущенные без восстановления (оценка)')
+DUPLICATE_PUBLICATIONS = metrics.counter('stream_duplicate_publications_total',
+                                         'Повторно полученные публикации')
+
+POSITION_KEY = 'position'
+
+
+class RecoveryResult:
+    """Итог переподписки: восстановлено и потеряно публикаций (None - неизвестно)"""
+
+    __slots__ = ('was_recovering', 'recovered', 'recovered_count', 'lost_count')
+
+    def __init__(self, was_recovering: bool, recovered: bool,
+                 recovered_count: int = 0, lost_count: Optional[int] = None):
+        self.was_recovering = was_recovering
+        self.recovered = recovered
+        self.recovered_count = recovered_count
+        self.lost_count = lost_count
+
+
+class StreamCursor:
+    """Последняя обработанная позиция (epoch, offset) в потоке канала.
+
+    Клиент Centrifugo пересоздаётся при каждом переподключении, поэтому
+    позиция хранится здесь и передаётся новой подписке (seed): сервер
+    досылает публикации, пропущенные за время разрыва. Повторы по
+    offset отбрасываются (accept). Позиция лежит в ExpiringMap, чтобы
+    попадать в снимок состояния и переживать перезапуск.
+    """
+
+    def __init__(self, ttl: float):
+        self.positions = ExpiringMap(ttl, 1)
+
+    def position(self) -> Optional[Tuple[str, int]]:
+        position = self.positions.get(POSITION_KEY)
+        return tuple(position) if position else None
+
+    def seed(self, sub) -> bool:
+        """Подписка с восстановлением с сохранённой позиции"""
+        position = self.position()
+        if position is None:
+            return False
+        epoch, offset = position
+        # Публичный способ задать позицию (get_state) требует Centrifugo 6.8+
+        # и отказа сервера при невосстановимой позиции; здесь достаточно
+        # обычного восстановления с ответом recovered=false. Поля подписки
+        # внутренние (centrifuge-python 0.3-0.6), поэтому проверяются
+        if not all(hasattr(sub, name) for name in ('_recover', '_epoch', '_offset')):
+            logger.warning("⚠️ Эта версия centrifuge-python не позволяет задать позицию подписки, "
+                           "пропущенные публикации не будут восстановлены")
+            return False
+        sub._recover = True
+        sub._epoch = epoch
+        sub._offset = offset
+        logger.info(f"📍 Подписка с восстановлением с позиции {offset} (epoch {epoch})")
+        return True
+
+    def accept(self, offset: int) -> bool:
+        """Учёт публикации; False для уже обработанного offset"""
+        if not offset:
+            return True
+        position = self.position()
+        if position is not None:
+            if offset <= position[1]:
+                DUPLICATE_PUBLICATIONS.inc()
+                return False
+            self.positions.set(POSITION_KEY, (position[0], offset))
+        return True
+
+    def on_subscribed(self, ctx) -> RecoveryResult:
+        """Позиция из ответа на подписку и оценка восстановленного/потерянного"""
+        previous = self.position()
+        current = ctx.stream_position
+        result = RecoveryResult(ctx.was_recovering, ctx.recovered)
+
+        if ctx.was_recovering and previous is not None and current is not None:
+            epoch, offset = previous
+            missed = max(0, current.offset - offset) if current.epoch == epoch else None
+            if ctx.recovered:
+                RECOVERED.inc()
+                result.recovered_count = missed or 0
+                RECOVERED_PUBLICATIONS.inc(result.recovered_count)
+            else:
+                NOT_RECOVERED.inc()
+                result.lost_count = missed
+                if missed:
+                    LOST_PUBLICATIONS.inc(missed)
+        elif ctx.was_recovering and not ctx.recovered:
+            NOT_RECOVERED.inc()
+
+        if current is None:
+            # Канал без позиций: восстанавливать нечего
+            self.positions.clear()
+        elif ctx.recovered and previous is not None:
+            # Восстановленные публикации придут следом и сдвинут позицию
+            pass
+        else:
+            self.positions.set(POSITION_KEY, (current.epoch, current.offset))
+        return result
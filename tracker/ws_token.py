@@ -0,0 +1,124 @@
+"""Токен WebSocket с кешированием и обновлением заранее"""
+import asyncio
+import base64
+import json
+import time
+from typing import Optional
+
+import aiohttp
+
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+TOKEN_FETCHES = metrics.counter('ws_token_fetch_total', 'Запросы токена WebSocket', {'result': 'ok'})
+TOKEN_FETCH_FAILED = metrics.counter('ws_token_fetch_total', 'Запросы токена WebSocket', {'result': 'error'})
+
+# Пауза перед повтором неудачного фонового обновления, секунд
+REFRESH_RETRY_DELAY = 5.0
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Время истечения из поля exp JWT (без проверки подписи)"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class WsTokenCache:
+    """Токен для подключения к WebSocket.
+
+    get() отдаёт сохранённый токен, пока до истечения больше
+    refresh_ahead секунд, иначе получает новый; одновременные вызовы
+    ждут один запрос. Фоновая задача обновляет токен за refresh_ahead
+    до истечения, так что переподключение не ждёт HTTP-запроса. Срок
+    берётся из exp токена, если его нет - ttl от момента получения.
+    """
+
+    def __init__(self, url: str, api_key: str, ttl: float, refresh_ahead: float):
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._fetching: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _fresh(self) -> bool:
+        return self.token is not None and time.time() < self.refresh_at
+
+    async def get(self) -> str:
+        if self._fresh():
+            return self.token
+        return await self.refresh()
+
+    def invalidate(self):
+        """Сброс токена, отклонённого сервером"""
+        self.token = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+
+    async def refresh(self) -> str:
+        """Получение нового токена; параллельные вызовы делят один запрос"""
+        if self._fetching is None or self._fetching.done():
+            self._fetching = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._fetching)
+
+    async def _fetch(self) -> str:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers=self.headers)
+        try:
+            async with self.session.get(self.url) as response:
+                response.raise_for_status()
+                data = await response.json()
+                token = data['data']['token']
+        except Exception:
+            TOKEN_FETCH_FAILED.inc()
+            raise
+
+        TOKEN_FETCHES.inc()
+        self.token = token
+        now = time.time()
+        self.expires_at = token_expiry(token) or now + self.ttl
+        if self.expires_at <= now:
+            # Часы расходятся с сервером: exp уже в прошлом
+            self.expires_at = now + self.ttl
+        # Короткоживущий токен обновляется не раньше середины срока
+        self.refresh_at = self.expires_at - min(self.refresh_ahead, (self.expires_at - now) / 2)
+        logger.info(f"🔑 Токен WebSocket получен, действует {self.expires_at - now:.0f} сек")
+        return token
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def _refresh_loop(self):
+        while True:
+            if self._fresh():
+                await asyncio.sleep(max(0.0, self.refresh_at - time.time()))
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось обновить токен WebSocket: {e}")
+                await asyncio.sleep(REFRESH_RETRY_DELAY)
@@ -1,4 +1,6 @@
 """Утилиты"""
 from .logger import setup_logger
+from .event_pipeline import EventPipeline, LANE_AUTOBUY, LANE_ALERT, LANE_SOLD
+from .keyword_matcher import KeywordMatcher
 
-__all__ = ['setup_logger']
\ No newline at end of file
+__all__ = ['setup_logger', 'EventPipeline', 'LANE_AUTOBUY', 'LANE_ALERT', 'LANE_SOLD', 'KeywordMatcher']
\ No newline at end of file
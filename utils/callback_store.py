@@ -0,0 +1,51 @@
+"""Данные кнопок покупки в сообщениях Telegram"""
+import hashlib
+import hmac
+from typing import Optional, Tuple
+
+from config import CALLBACK_SECRET
+
+BUY_PREFIX = "buy_"
+# Длина подписи в callback_data, hex-символов
+SIGNATURE_LENGTH = 16
+
+
+def _sign(payload: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return digest[:SIGNATURE_LENGTH]
+
+
+def encode_buy_callback(item_id: int, price: Optional[float], secret: str = CALLBACK_SECRET) -> str:
+    """callback_data кнопки: buy_<id>_<цена в центах>_<подпись>.
+
+    Даже при 64-битном id это меньше 64 байт - ограничения Telegram.
+    """
+    if price is None:
+        return f"{BUY_PREFIX}{item_id}"
+    payload = f"{item_id}_{round(price * 100)}"
+    return f"{BUY_PREFIX}{payload}_{_sign(payload, secret)}"
+
+
+def parse_buy_callback(callback_data: str,
+                       secret: str = CALLBACK_SECRET) -> Optional[Tuple[int, Optional[float]]]:
+    """(id, цена) из callback_data; поддерживается и старый формат buy_<id>.
+
+    Цена принимается только с верной подписью: кнопку с изменённой ценой
+    или без подписи может прислать любой участник чата. Для таких данных -
+    None.
+    """
+    if not callback_data or not callback_data.startswith(BUY_PREFIX):
+        return None
+    parts = callback_data[len(BUY_PREFIX):].split('_')
+    try:
+        item_id = int(parts[0])
+        if len(parts) == 1:
+            return item_id, None
+        if len(parts) != 3:
+            return None
+        payload = f"{parts[0]}_{parts[1]}"
+        if not hmac.compare_digest(parts[2], _sign(payload, secret)):
+            return None
+        return item_id, int(parts[1]) / 100
+    except ValueError:
+        return None
@@ -0,0 +1,156 @@
+"""Конвейер обработки событий с приоритетными полосами"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Полосы конвейера в порядке убывания приоритета
+LANE_AUTOBUY = 0
+LANE_ALERT = 1
+LANE_SOLD = 2
+
+LANE_NAMES = ('autobuy', 'alert', 'sold')
+
+# Полосы, где при переполнении вытесняется самая старая задача:
+# для автобая свежий предмет ценнее давно ждущего
+DROP_OLDEST_LANES = frozenset({LANE_AUTOBUY})
+
+
+class EventPipeline:
+    """Ограниченная очередь задач и пул воркеров.
+
+    Приём события только кладёт задачу в полосу и не ждёт её выполнения.
+    Воркеры всегда забирают задачу из самой приоритетной непустой полосы,
+    поэтому кандидаты на автобай обгоняют уведомления и проданные предметы.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers_count = max(1, workers)
+        self.queue_size = queue_size
+        self._lanes = [deque() for _ in LANE_NAMES]
+        self._available = asyncio.Semaphore(0)
+        self._workers = []
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.dropped = [0] * len(LANE_NAMES)
+        self.processed = [0] * len(LANE_NAMES)
+        self.max_depth = 0
+        self._wait_metrics = []
+        for lane, name in enumerate(LANE_NAMES):
+            labels = {'lane': name}
+            self._wait_metrics.append(metrics.histogram(
+                'stage_seconds', 'Длительность этапов горячего пути', {'stage': 'queue_wait', **labels}
+            ))
+            metrics.gauge('pipeline_depth', 'Задачи в очереди конвейера', labels,
+                          getter=lambda lane=lane: len(self._lanes[lane]))
+            metrics.gauge('pipeline_dropped', 'Отброшенные из-за переполнения задачи', labels,
+                          getter=lambda lane=lane: self.dropped[lane])
+
+    def start(self):
+        """Запуск воркеров"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers_count)
+        ]
+        logger.info(f"⚙️ Конвейер событий запущен: воркеров {self.workers_count}")
+
+    async def stop(self):
+        """Остановка воркеров; невыполненные задачи отбрасываются"""
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+        discarded = self.depth()
+        for queue in self._lanes:
+            queue.clear()
+        self._available = asyncio.Semaphore(0)
+        self._unfinished = 0
+        self._idle.set()
+        if discarded:
+            logger.info(f"⚙️ Конвейер остановлен, отброшено задач: {discarded}")
+
+    def submit(self, lane: int, func: Callable[..., Awaitable[Any]], *args,
+               on_evict: Optional[Callable[[], Any]] = None) -> bool:
+        """Постановка задачи в полосу без ожидания. False, если полоса переполнена.
+
+        В полосах DROP_OLDEST_LANES вместо новой задачи вытесняется самая старая;
+        для неё вызывается on_evict, переданный при её постановке.
+        """
+        queue = self._lanes[lane]
+        if len(queue) >= self.queue_size:
+            self.dropped[lane] += 1
+            if lane not in DROP_OLDEST_LANES or not queue:
+                logger.warning(f"⚠️ Полоса {LANE_NAMES[lane]} переполнена, событие отброшено")
+                return False
+            # Место старой задачи занимает новая: счётчики не меняются
+            evicted = queue.popleft()
+            queue.append((func, args, time.perf_counter(), on_evict))
+            if evicted[3]:
+                evicted[3]()
+            logger.warning(f"⚠️ Полоса {LANE_NAMES[lane]} переполнена, вытеснено самое старое событие")
+            return True
+
+        queue.append((func, args, time.perf_counter(), on_evict))
+        self._unfinished += 1
+        self._idle.clear()
+        self._available.release()
+
+        depth = self.depth()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    async def join(self):
+        """Ожидание выполнения всех поставленных задач"""
+        await self._idle.wait()
+
+    def depth(self) -> int:
+        """Текущее количество задач во всех полосах"""
+        return sum(len(queue) for queue in self._lanes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очередей и счётчики по полосам"""
+        return {
+            'depth': {name: len(self._lanes[i]) for i, name in enumerate(LANE_NAMES)},
+            'dropped': dict(zip(LANE_NAMES, self.dropped)),
+            'processed': dict(zip(LANE_NAMES, self.processed)),
+            'max_depth': self.max_depth,
+        }
+
+    def _pop(self):
+        for lane, queue in enumerate(self._lanes):
+            if queue:
+                return lane, queue.popleft()
+        return None, None
+
+    async def _worker(self, index: int):
+        while True:
+            await self._available.acquire()
+            lane, job = self._pop()
+            if job is None:
+                continue
+
+            func, args, queued_at, _ = job
+            self._wait_metrics[lane].observe(time.perf_counter() - queued_at)
+            try:
+                await func(*args)
+            except Exception as e:
+                logger.error(f"Ошибка в воркере {index}: {e}")
+            finally:
+                self.processed[lane] += 1
+                self._unfinished -= 1
+                if not self._unfinished:
+                    self._idle.set()
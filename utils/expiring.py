@@ -0,0 +1,153 @@
+"""Словарь с истечением записей и ограничением размера"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+
+class ExpiringMap:
+    """Записи живут ttl секунд (по монотонным часам), не больше capacity штук.
+
+    Записи хранятся в порядке добавления, и у всех одинаковый ttl, поэтому
+    самые старые - в начале. Каждое добавление снимает с начала не больше
+    нескольких просроченных записей и вытесняет самые старые при
+    переполнении: очистка идёт понемногу, без периодических полных
+    проходов. Просроченная запись, до которой очистка ещё не дошла,
+    при чтении считается отсутствующей.
+
+    После track_changes() добавленные и удалённые через pop ключи
+    копятся до drain_changes() - для инкрементальных снимков на диск.
+    """
+
+    __slots__ = ('ttl', 'capacity', 'evicted', '_data', '_clock', '_changes')
+
+    # Сколько просроченных записей снимать за одну операцию
+    EVICT_STEP = 8
+
+    def __init__(self, ttl: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.evicted = 0
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._clock = clock
+        self._changes: Optional[Dict[Hashable, bool]] = None
+
+    def set(self, key: Hashable, value: Any = True):
+        """Добавление или обновление записи; срок жизни отсчитывается заново"""
+        now = self._clock()
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (now + self.ttl, value)
+        if self._changes is not None:
+            self._changes[key] = True
+        self._evict(now)
+
+    def restore(self, entries: Iterable[Tuple[Hashable, Any, float]]):
+        """Загрузка записей (ключ, значение, оставшееся время жизни).
+
+        Записи должны идти по возрастанию оставшегося времени, чтобы
+        сохранился порядок истечения. Изменениями не считаются.
+        """
+        now = self._clock()
+        data = self._data
+        for key, value, remaining in entries:
+            if remaining > 0:
+                data[key] = (now + min(remaining, self.ttl), value)
+        while len(data) > self.capacity:
+            data.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= self._clock():
+            del self._data[key]
+            self.evicted += 1
+            return default
+        return entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is not None and self._changes is not None:
+            self._changes[key] = False
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any, float]]:
+        """Живые записи: (ключ, значение, оставшееся время жизни)"""
+        now = self._clock()
+        for key, (expires, value) in list(self._data.items()):
+            if expires > now:
+                yield key, value, expires - now
+
+    def clear(self):
+        if self._changes is not None:
+            self._changes.update(dict.fromkeys(self._data, False))
+        self._data.clear()
+
+    def track_changes(self):
+        if self._changes is None:
+            self._changes = {}
+
+    def drain_changes(self) -> List[Tuple[Hashable, Any, Optional[float]]]:
+        """Изменения с прошлого вызова: (ключ, значение, оставшееся время жизни).
+
+        Для удалённых ключей значение и время - None. Просроченные и
+        вытесненные записи не сообщаются: на диске они истекают сами.
+        """
+        if not self._changes:
+            return []
+        changes, self._changes = self._changes, {}
+        now = self._clock()
+        data = self._data
+        result = []
+        for key, present in changes.items():
+            entry = data.get(key) if present else None
+            if entry is not None:
+                result.append((key, entry[1], entry[0] - now))
+            elif not present:
+                result.append((key, None, None))
+        return result
+
+    def requeue_changes(self, changes: Iterable[Tuple[Hashable, bool]]):
+        """Возврат изменений (ключ, есть ли ключ), которые не удалось записать.
+
+        Более новое изменение того же ключа не затирается.
+        """
+        if self._changes is None:
+            return
+        for key, present in changes:
+            self._changes.setdefault(key, present)
+
+    def _evict(self, now: float):
+        data = self._data
+        while len(data) > self.capacity:
+            data.popitem(last=False)
+            self.evicted += 1
+        for _ in range(self.EVICT_STEP):
+            if not data:
+                break
+            key, (expires, _) = next(iter(data.items()))
+            if expires > now:
+                break
+            del data[key]
+            self.evicted += 1
+
+    def expire(self):
+        """Снять все просроченные записи"""
+        now = self._clock()
+        data = self._data
+        while data:
+            key, (expires, _) = next(iter(data.items()))
+            if expires > now:
+                break
+            del data[key]
+            self.evicted += 1
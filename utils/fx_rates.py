@@ -0,0 +1,267 @@
+"""Курсы валют для сообщений: фоновое обновление, чтение без сети"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import aiohttp
+
+from config import FX_DEFAULT_RATES, FX_REFRESH_INTERVAL, FX_MAX_AGE, FX_SNAPSHOT_PATH, FX_CBR_URL
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Источник курсов: по списку валют возвращает курсы к доллару
+RateSource = Callable[[Iterable[str]], Awaitable[Dict[str, float]]]
+
+FX_REFRESH_OK = metrics.counter('fx_refresh_total', 'Обновления курсов валют', {'result': 'ok'})
+FX_REFRESH_FAILED = metrics.counter('fx_refresh_total', 'Обновления курсов валют', {'result': 'error'})
+FX_REFRESH_PARTIAL = metrics.counter('fx_refresh_total', 'Обновления курсов валют', {'result': 'partial'})
+
+
+async def forex_python_source(currencies: Iterable[str]) -> Dict[str, float]:
+    """Курсы из forex-python; блокирующий запрос выполняется в отдельном потоке"""
+    from forex_python.converter import CurrencyRates
+
+    rates = await asyncio.to_thread(CurrencyRates().get_rates, 'USD')
+    return {currency: rates[currency] for currency in currencies if currency in rates}
+
+
+def cbr_rates(daily: Dict[str, Any], currencies: Iterable[str]) -> Dict[str, float]:
+    """Курсы к доллару из дневного JSON ЦБ РФ (рублей за Nominal единиц валюты)"""
+    valutes = daily['Valute']
+    usd = valutes['USD']
+    rub_per_usd = float(usd['Value']) / float(usd['Nominal'])
+    rates = {}
+    for currency in currencies:
+        if currency == 'RUB':
+            rates[currency] = rub_per_usd
+        elif currency in valutes:
+            valute = valutes[currency]
+            rates[currency] = rub_per_usd / (float(valute['Value']) / float(valute['Nominal']))
+    return rates
+
+
+async def cbr_source(currencies: Iterable[str]) -> Dict[str, float]:
+    """Курсы ЦБ РФ, в том числе RUB"""
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(FX_CBR_URL) as response:
+            response.raise_for_status()
+            # Файл отдаётся как application/javascript
+            daily = await response.json(content_type=None)
+    return cbr_rates(daily, currencies)
+
+
+class CombinedRateSource:
+    """Источники по очереди: каждая валюта берётся из первого источника,
+    который её вернул; следующий спрашивается только о недостающих.
+    Ошибка одного источника не мешает остальным, исключение - только
+    если не ответил ни один.
+    """
+
+    def __init__(self, *sources: RateSource):
+        self.sources = sources
+
+    async def __call__(self, currencies: Iterable[str]) -> Dict[str, float]:
+        missing = list(currencies)
+        rates: Dict[str, float] = {}
+        errors = []
+        for source in self.sources:
+            if not missing:
+                break
+            try:
+                fresh = await source(missing)
+            except Exception as e:
+                errors.append(e)
+                logger.warning(f"⚠️ Источник курсов {getattr(source, '__name__', source)} недоступен: {e}")
+                continue
+            rates.update({currency: rate for currency, rate in fresh.items() if currency in missing})
+            missing = [currency for currency in missing if currency not in rates]
+        if errors and len(errors) == len(self.sources):
+            raise errors[-1]
+        return rates
+
+
+class StaticRateSource:
+    """Локальный источник с заданными курсами для прогонов без сети"""
+
+    def __init__(self, rates: Dict[str, float], fail: bool = False):
+        self.rates = dict(rates)
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self, currencies: Iterable[str]) -> Dict[str, float]:
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("источник курсов недоступен")
+        return {currency: self.rates[currency] for currency in currencies if currency in self.rates}
+
+
+class FxRates:
+    """Снимок курсов USD -> валюта.
+
+    Форматирование сообщений читает курс из словаря в памяти (rate,
+    convert) и никогда не ходит в сеть. Фоновая задача обновляет снимок
+    раз в refresh_interval и сохраняет его на диск; при ошибке остаются
+    последние удачные значения, при старте - сохранённые или по умолчанию.
+    Сохранённый снимок читается не при создании, а в load() (её вызывает
+    и фоновая задача), поэтому импорт модуля не обращается к диску.
+    Время обновления хранится по каждой валюте: если ни один источник не
+    вернул валюту, её курс остаётся прежним и со временем считается
+    устаревшим, а обновление - неполным. По умолчанию RUB и остальные
+    валюты из данных ЦБ РФ, недостающие - из forex-python (ЕЦБ).
+    """
+
+    def __init__(self, defaults: Dict[str, float], snapshot_path: Optional[str] = None,
+                 source: RateSource = CombinedRateSource(cbr_source, forex_python_source),
+                 refresh_interval: float = FX_REFRESH_INTERVAL, max_age: float = FX_MAX_AGE):
+        self.rates: Dict[str, float] = dict(defaults)
+        self.updated: Dict[str, float] = {}
+        self.snapshot_path = snapshot_path
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+        self._register_gauges(self.rates)
+
+    def _register_gauges(self, currencies: Iterable[str]):
+        for currency in currencies:
+            metrics.gauge('fx_rate_age_seconds', 'Возраст курсов валют', {'currency': currency},
+                          getter=lambda currency=currency: self.age(currency) if currency in self.updated else -1)
+
+    @property
+    def updated_at(self) -> Optional[float]:
+        """Время обновления самого старого курса; None, если какой-то не обновлялся"""
+        if any(currency not in self.updated for currency in self.rates):
+            return None
+        return min(self.updated.values(), default=None)
+
+    def age(self, currency: str) -> Optional[float]:
+        updated = self.updated.get(currency)
+        return time.time() - updated if updated is not None else None
+
+    def rate(self, currency: str) -> float:
+        return self.rates[currency]
+
+    def convert(self, usd: float, currency: str) -> float:
+        return round(usd * self.rates[currency], 2)
+
+    def is_stale(self, currency: Optional[str] = None) -> bool:
+        """Курс валюты (без currency - любой из курсов) устарел или не обновлялся"""
+        currencies = [currency] if currency else list(self.rates)
+        for name in currencies:
+            age = self.age(name)
+            if age is None or age > self.max_age:
+                return True
+        return False
+
+    async def load(self):
+        """Чтение сохранённого снимка в рабочем потоке (один раз).
+
+        Курсы, обновлённые в памяти позже снимка, не затираются.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        snapshot = await asyncio.to_thread(self._read_snapshot)
+        if snapshot is None:
+            return
+        rates, updated = snapshot
+        newer = [currency for currency in rates
+                 if currency not in self.updated or updated.get(currency, 0.0) > self.updated[currency]]
+        self._register_gauges(currency for currency in newer if currency not in self.rates)
+        self.rates = {**self.rates, **{currency: rates[currency] for currency in newer}}
+        self.updated = {**self.updated, **{currency: updated[currency] for currency in newer if currency in updated}}
+
+    def _read_snapshot(self) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            rates = {currency: float(rate) for currency, rate in snapshot['rates'].items()}
+            updated = snapshot.get('updated')
+            if updated is None and snapshot.get('updated_at') is not None:
+                # Старый формат: одно время на все курсы снимка
+                updated = dict.fromkeys(snapshot['rates'], snapshot['updated_at'])
+            return rates, {currency: float(value) for currency, value in (updated or {}).items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Не удалось прочитать сохранённые курсы {self.snapshot_path}: {e}")
+            return None
+
+    def _save(self, rates: Dict[str, float], updated: Dict[str, float]):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'rates': rates, 'updated': updated}, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить курсы: {e}")
+
+    async def refresh(self) -> bool:
+        """Обновление снимка; при ошибке сохраняются прежние курсы.
+
+        False, если обновить не удалось или источник вернул не все валюты
+        (полученные при этом всё равно применяются).
+        """
+        requested = list(self.rates)
+        try:
+            fresh = await self.source(requested)
+            fresh = {currency: float(rate) for currency, rate in fresh.items() if float(rate) > 0}
+            if not fresh:
+                raise ValueError("источник не вернул курсов")
+        except Exception as e:
+            FX_REFRESH_FAILED.inc()
+            state = "устаревшие" if self.is_stale() else "сохранённые"
+            logger.warning(f"⚠️ Курсы валют не обновлены, используются {state}: {e}")
+            return False
+
+        # Новый словарь целиком, чтобы читатели не видели частично обновлённый снимок
+        self.rates = {**self.rates, **fresh}
+        now = time.time()
+        self.updated = {**self.updated, **dict.fromkeys(fresh, now)}
+        if self.snapshot_path:
+            # Словари снимка не меняются на месте, их можно писать из потока
+            await asyncio.to_thread(self._save, self.rates, self.updated)
+
+        missing = [currency for currency in requested if currency not in fresh]
+        if missing:
+            FX_REFRESH_PARTIAL.inc()
+            stale = [currency for currency in missing if self.is_stale(currency)]
+            logger.warning(f"⚠️ Источник не вернул курсы {', '.join(missing)}, используются прежние"
+                           + (f" (устарели: {', '.join(stale)})" if stale else "")
+                           + f"; обновлены: {fresh}")
+            return False
+        FX_REFRESH_OK.inc()
+        logger.info(f"💱 Курсы валют обновлены: {self.rates}")
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        await self.load()
+        # Сохранённый снимок ещё свежий - первое обновление по расписанию
+        if self.updated_at is not None:
+            age = time.time() - self.updated_at
+            await asyncio.sleep(max(0.0, self.refresh_interval - age))
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+
+fx_rates = FxRates(FX_DEFAULT_RATES, FX_SNAPSHOT_PATH)
@@ -0,0 +1,116 @@
+"""Журнал сырых публикаций для последующего воспроизведения"""
+import asyncio
+import gzip
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+FLUSH_INTERVAL = 1.0  # секунд
+# Строк в буфере, сверх которых публикации не записываются (диск не успевает)
+MAX_BUFFER = 100000
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class PublicationJournal:
+    """Дозапись публикаций в файл построчно: [время получения, данные].
+
+    Файл с расширением .gz пишется сжатым. record() только добавляет
+    строку в буфер в памяти; фоновая задача раз в FLUSH_INTERVAL пишет
+    накопленное в рабочем потоке, так что открытие файла, сжатие и сброс
+    на диск не занимают цикл событий. Без start() пишется только при stop().
+    """
+
+    def __init__(self, path: str, max_buffer: int = MAX_BUFFER):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.records = 0
+        self.dropped = 0
+        self._buffer: List[str] = []
+        self._file = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+
+    def record(self, data: Dict[str, Any], received_at: Optional[float] = None):
+        """Запись одной публикации"""
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            if self.dropped == 1:
+                logger.warning(f"⚠️ Журнал {self.path} не успевает записываться, публикации пропускаются")
+            return
+
+        if received_at is None:
+            received_at = time.time()
+        self._buffer.append(
+            json.dumps([round(received_at, 6), data], ensure_ascii=False, separators=(',', ':')) + '\n'
+        )
+        self.records += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Остановка с записью буфера и закрытием файла"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Запись, начатая отменённой задачей, завершается в своём потоке
+        if self._writing is not None and not self._writing.done():
+            await asyncio.wait([self._writing])
+        await self.flush()
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+            logger.info(f"📝 Журнал закрыт, записано публикаций: {self.records}"
+                        + (f", пропущено: {self.dropped}" if self.dropped else ""))
+
+    async def flush(self):
+        """Запись буфера в рабочем потоке"""
+        if not self._buffer:
+            return
+        lines, self._buffer = ''.join(self._buffer), []
+        self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, lines))
+        try:
+            await asyncio.shield(self._writing)
+        except OSError as e:
+            logger.error(f"Ошибка записи журнала {self.path}: {e}")
+
+    def _write(self, lines: str):
+        if self._file is None:
+            self._file = _open(self.path, 'a')
+            logger.info(f"📝 Запись публикаций в журнал {self.path}")
+        self._file.write(lines)
+        self._file.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+
+def read_journal(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Чтение журнала: (время получения, данные публикации)"""
+    with _open(path, 'r') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                received_at, data = json.loads(line)
+            except ValueError:
+                logger.warning(f"Пропущена повреждённая строка журнала {path}:{line_no}")
+                continue
+            yield received_at, data
@@ -0,0 +1,108 @@
+"""Поиск ключевых слов по всем категориям за один проход"""
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from config import STICKER_KEYWORDS, CHARM_KEYWORDS, HIGHLIGHT_KEYWORDS
+
+_EMPTY = frozenset()
+
+# Категории ключевых слов для наклеек
+CATEGORY_STICKERS = 'stickers'
+CATEGORY_CHARMS = 'charms'
+CATEGORY_HIGHLIGHTS = 'highlights'
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик по ключевым словам без учёта регистра.
+
+    Строится один раз из словаря {категория: [ключевые слова]} и за один
+    проход по названию возвращает все категории, ключевые слова которых
+    встречаются в нём как подстроки. Время проверки зависит от длины
+    названия, а не от количества ключевых слов.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], cache_size: int = 4096):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [_EMPTY]
+        self._cache = {}
+        self._cache_size = cache_size
+        self.keywords_count = 0
+        self.category_counts: Dict[str, int] = {}
+
+        for category, keywords in categories.items():
+            self.category_counts[category] = 0
+            for keyword in keywords:
+                if keyword:
+                    self._add(keyword.casefold(), category)
+                    self.keywords_count += 1
+                    self.category_counts[category] += 1
+
+        self._build()
+
+    def _add(self, keyword: str, category: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(_EMPTY)
+            state = next_state
+        self._out[state] = self._out[state] | {category}
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fallback = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fallback if fallback != next_state else 0
+                self._out[next_state] = self._out[next_state] | self._out[self._fail[next_state]]
+
+    def describe(self) -> str:
+        return ", ".join(f"{category}: {count}" for category, count in self.category_counts.items())
+
+    def classify(self, text: str) -> FrozenSet[str]:
+        """Все категории, ключевые слова которых встречаются в тексте"""
+        if not text:
+            return _EMPTY
+
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found = _EMPTY
+        state = 0
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found = found | out[state]
+
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[text] = found
+        return found
+
+
+def default_keywords() -> Dict[str, List[str]]:
+    """Списки ключевых слов из конфигурации по категориям"""
+    return {
+        CATEGORY_STICKERS: list(STICKER_KEYWORDS),
+        CATEGORY_CHARMS: list(CHARM_KEYWORDS),
+        CATEGORY_HIGHLIGHTS: list(HIGHLIGHT_KEYWORDS),
+    }
+
+
+def build_keyword_matcher(keywords: Optional[Dict[str, List[str]]] = None) -> KeywordMatcher:
+    """Сборка матчера из списков ключевых слов (по умолчанию - из конфигурации)"""
+    return KeywordMatcher(keywords if keywords is not None else default_keywords())
@@ -0,0 +1,192 @@
+"""Метрики горячего пути в формате Prometheus"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Границы бакетов задержек, секунд
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонный счётчик"""
+
+    kind = 'counter'
+    __slots__ = ('labels', 'value')
+
+    def __init__(self, labels: Labels):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self, name: str) -> List[str]:
+        return [f"{name}{_format_labels(self.labels)} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """Текущее значение, задаваемое вручную или функцией"""
+
+    kind = 'gauge'
+    __slots__ = ('labels', 'value', 'getter')
+
+    def __init__(self, labels: Labels, getter: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0
+        self.getter = getter
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str) -> List[str]:
+        value = self.getter() if self.getter else self.value
+        return [f"{name}{_format_labels(self.labels)} {_format_value(value)}"]
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами, O(log b) на наблюдение"""
+
+    kind = 'histogram'
+    __slots__ = ('labels', 'buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, labels: Labels, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> '_Timer':
+        """Контекстный менеджер для замера длительности блока"""
+        return _Timer(self)
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append(
+                f"{name}_bucket{_format_labels(self.labels, ('le', _format_value(bound)))} {cumulative}"
+            )
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {self.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self, prefix: str = 'skin_tracker'):
+        self.prefix = prefix
+        self._metrics: Dict[str, Tuple[str, str, Dict[Labels, object]]] = {}
+
+    def _get(self, cls, name: str, help_text: str, labels: Optional[Dict[str, str]], **kwargs):
+        full_name = f"{self.prefix}_{name}"
+        key = tuple(sorted((labels or {}).items()))
+        kind, _, series = self._metrics.setdefault(full_name, (cls.kind, help_text, {}))
+        if kind != cls.kind:
+            raise ValueError(f"Метрика {full_name} уже зарегистрирована как {kind}")
+        metric = series.get(key)
+        if metric is None:
+            metric = series[key] = cls(key, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+              getter: Optional[Callable[[], float]] = None) -> Gauge:
+        gauge = self._get(Gauge, name, help_text, labels)
+        if getter is not None:
+            gauge.getter = getter
+        return gauge
+
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        for name, (kind, help_text, series) in self._metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in series.values():
+                try:
+                    lines.extend(metric.samples(name))
+                except Exception as e:
+                    logger.error(f"Ошибка чтения метрики {name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsServer:
+    """Локальный HTTP эндпоинт /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = metrics, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"📊 Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type='text/plain')
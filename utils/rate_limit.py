@@ -0,0 +1,128 @@
+"""Ограничители скорости и скользящие суммы с O(1) учётом"""
+import random
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', '_clock')
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Забрать токены, если они есть"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Через сколько секунд будет доступно tokens токенов"""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate if self.rate else float('inf')
+
+
+class RollingSum:
+    """Сумма значений за последние window секунд.
+
+    Окно разбито на buckets корзин; добавление и чтение стоят O(1)
+    (устаревшие корзины обнуляются по мере продвижения времени).
+    """
+
+    __slots__ = ('window', 'bucket_width', 'values', 'total', 'current', '_clock')
+
+    def __init__(self, window: float, buckets: int = 60, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.bucket_width = window / buckets
+        self.values = [0.0] * buckets
+        self.total = 0.0
+        self._clock = clock
+        self.current = int(clock() // self.bucket_width)
+
+    def _advance(self):
+        index = int(self._clock() // self.bucket_width)
+        steps = index - self.current
+        if steps <= 0:
+            return
+        size = len(self.values)
+        if steps >= size:
+            self.values = [0.0] * size
+            self.total = 0.0
+        else:
+            for i in range(self.current + 1, index + 1):
+                slot = i % size
+                self.total -= self.values[slot]
+                self.values[slot] = 0.0
+        self.current = index
+
+    def add(self, value: float) -> int:
+        """Добавление в текущую корзину; возвращает её номер для adjust()"""
+        self._advance()
+        self.values[self.current % len(self.values)] += value
+        self.total += value
+        return self.current
+
+    def adjust(self, bucket: int, delta: float) -> bool:
+        """Поправка значения, добавленного ранее в корзину bucket.
+
+        Если корзина уже вышла из окна, её значение в сумме не участвует
+        и поправка отбрасывается (False).
+        """
+        self._advance()
+        if bucket <= self.current - len(self.values) or bucket > self.current:
+            return False
+        self.values[bucket % len(self.values)] += delta
+        self.total += delta
+        return True
+
+    def value(self) -> float:
+        self._advance()
+        return self.total
+
+
+class Backoff:
+    """Паузы между повторными попытками.
+
+    Первая повторная попытка - сразу, дальше base, 2*base, 4*base...
+    но не больше max_delay. Каждая пауза случайно укорачивается
+    на долю до jitter, чтобы попытки не шли синхронно.
+    """
+
+    __slots__ = ('base', 'max_delay', 'jitter', 'attempts', '_random')
+
+    def __init__(self, base: float, max_delay: float, jitter: float = 0.5,
+                 rand: Callable[[], float] = random.random):
+        self.base = base
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempts = 0
+        self._random = rand
+
+    def next_delay(self) -> float:
+        self.attempts += 1
+        if self.attempts == 1:
+            return 0.0
+        delay = min(self.max_delay, self.base * 2 ** min(self.attempts - 2, 32))
+        return delay * (1 - self.jitter * self._random())
+
+    def reset(self):
+        self.attempts = 0
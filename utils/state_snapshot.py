@@ -0,0 +1,199 @@
+"""Снимки состояния на диск для тёплого перезапуска"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.expiring import ExpiringMap
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+SNAPSHOT_ROWS = metrics.counter('state_snapshot_rows_total', 'Строки, записанные в снимок состояния')
+SNAPSHOT_FAILED = metrics.counter('state_snapshot_errors_total', 'Ошибки записи снимка состояния')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID
+"""
+
+
+class _Section:
+    __slots__ = ('name', 'store', 'encode', 'decode')
+
+    def __init__(self, name: str, store: ExpiringMap,
+                 encode: Callable[[Any], Any], decode: Callable[[Any], Any]):
+        self.name = name
+        self.store = store
+        self.encode = encode
+        self.decode = decode
+
+
+class StateSnapshot:
+    """Инкрементальные снимки ExpiringMap в SQLite.
+
+    Каждая зарегистрированная таблица хранится строками (ключ, значение
+    в JSON, момент истечения по настенным часам; у множеств, где значение
+    True, вместо JSON хранится NULL). Раз в interval секунд
+    в базу уходят только ключи, изменённые с прошлого снимка: цикл
+    событий забирает изменения и снимает с значений копии через encode,
+    а сериализация и запись выполняются в отдельном потоке. Просроченные
+    строки удаляются там же. Изменения, которые не удалось записать,
+    уходят со следующим снимком.
+
+    При старте restore() читает живые строки и загружает их в таблицы
+    с оставшимся временем жизни.
+    """
+
+    def __init__(self, path: Optional[str], interval: float):
+        self.path = path
+        self.interval = interval
+        self.sections: Dict[str, _Section] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+
+    def register(self, name: str, store: ExpiringMap,
+                 encode: Callable[[Any], Any] = lambda value: value,
+                 decode: Callable[[Any], Any] = lambda value: value):
+        """encode/decode переводят значение в JSON-совместимый вид и обратно.
+
+        encode вызывается в цикле событий и должен возвращать копию,
+        которую не изменят, пока снимок пишется в потоке.
+        """
+        self.sections[name] = _Section(name, store, encode, decode)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Соединение используется из рабочих потоков, но только одним за раз
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(SCHEMA)
+        return self._conn
+
+    def _read(self) -> Dict[str, List[Tuple[str, Any, float]]]:
+        conn = self._connect()
+        now = time.time()
+        loaded: Dict[str, List[Tuple[str, Any, float]]] = {}
+        for kind, section in self.sections.items():
+            rows = conn.execute(
+                "SELECT key, value, expires_at FROM entries WHERE kind = ? AND expires_at > ?",
+                (kind, now)
+            ).fetchall()
+            entries = []
+            for key, value, expires_at in rows:
+                if value is None:
+                    entries.append((key, True, expires_at - now))
+                    continue
+                try:
+                    entries.append((key, section.decode(json.loads(value)), expires_at - now))
+                except Exception as e:
+                    logger.warning(f"Пропущена повреждённая запись снимка {kind}/{key}: {e}")
+            # ExpiringMap ждёт записи в порядке истечения
+            entries.sort(key=lambda entry: entry[2])
+            loaded[kind] = entries
+        return loaded
+
+    async def restore(self):
+        """Загрузка сохранённого состояния; ошибки не мешают запуску"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        started = time.perf_counter()
+        try:
+            loaded = await asyncio.to_thread(self._read)
+        except Exception as e:
+            logger.error(f"Не удалось прочитать снимок состояния {self.path}: {e}")
+            return
+
+        for name, entries in loaded.items():
+            self.sections[name].store.restore(entries)
+        counts = ", ".join(f"{name}: {len(entries)}" for name, entries in loaded.items())
+        logger.info(f"♻️ Состояние восстановлено за {(time.perf_counter() - started) * 1000:.0f} мс ({counts})")
+
+    def _write(self, changes: List[Tuple[str, Any, Any, Optional[float]]]) -> int:
+        conn = self._connect()
+        now = time.time()
+        upserts = []
+        deletes = []
+        for kind, key, value, remaining in changes:
+            if remaining is None:
+                deletes.append((kind, str(key)))
+            else:
+                encoded = None if value is True else json.dumps(
+                    value, ensure_ascii=False, separators=(',', ':'), default=str
+                )
+                upserts.append((kind, str(key), encoded, now + remaining))
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", upserts)
+            conn.executemany("DELETE FROM entries WHERE kind = ? AND key = ?", deletes)
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        return len(upserts) + len(deletes)
+
+    async def flush(self):
+        """Запись изменений с прошлого снимка"""
+        drained = {name: section.store.drain_changes() for name, section in self.sections.items()}
+        changes = [
+            (name, key, None if remaining is None else self.sections[name].encode(value), remaining)
+            for name, entries in drained.items()
+            for key, value, remaining in entries
+        ]
+        if not changes:
+            return
+        # Запись в потоке доводится до конца, даже если ожидание отменено
+        self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, changes))
+        self._writing.add_done_callback(lambda writing: self._requeue(writing, drained))
+        try:
+            written = await asyncio.shield(self._writing)
+            SNAPSHOT_ROWS.inc(written)
+        except Exception as e:
+            SNAPSHOT_FAILED.inc()
+            logger.error(f"Ошибка записи снимка состояния: {e}")
+
+    def _requeue(self, writing: asyncio.Future, drained: Dict[str, List[Tuple[Any, Any, Optional[float]]]]):
+        """Незаписанные изменения возвращаются в таблицы и уйдут со следующим снимком"""
+        if writing.cancelled() or writing.exception() is None:
+            return
+        for name, entries in drained.items():
+            self.sections[name].store.requeue_changes(
+                (key, remaining is not None) for key, _, remaining in entries
+            )
+
+    def start(self):
+        if self.path and self._task is None:
+            for section in self.sections.values():
+                section.store.track_changes()
+            self._task = asyncio.create_task(self._snapshot_loop())
+
+    async def stop(self):
+        """Остановка с записью последних изменений"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._writing is not None and not self._writing.done():
+            await asyncio.wait([self._writing])
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
@@ -0,0 +1,174 @@
+"""Супервизор фоновых компонентов внутри процесса"""
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.rate_limit import Backoff
+
+logger = setup_logger(__name__)
+
+
+class SupervisorGaveUp(Exception):
+    """Компонент исчерпал бюджет перезапусков"""
+
+    def __init__(self, component: str, error: BaseException):
+        super().__init__(f"{component}: {error}")
+        self.component = component
+        self.error = error
+
+
+async def wait_task(task: Optional[asyncio.Task]):
+    """Ожидание фоновой задачи без её отмены; ошибка задачи пробрасывается"""
+    if task is None:
+        return
+    await asyncio.wait([task])
+    if not task.cancelled() and task.exception() is not None:
+        raise task.exception()
+
+
+async def _maybe_await(result: Any):
+    if inspect.isawaitable(result):
+        await result
+
+
+def service(start: Callable[[], Any], stop: Callable[[], Awaitable[None]],
+            wait: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """Компонент из объекта со start/stop и ожиданием фоновой задачи.
+
+    Перезапуск - stop() и снова start() того же объекта, так что
+    его состояние (очереди, пулы, счётчики) сохраняется.
+    """
+    async def run():
+        await _maybe_await(start())
+        try:
+            await wait()
+        finally:
+            await stop()
+    return run
+
+
+class RestartBudget:
+    """Не больше max_restarts перезапусков за window секунд"""
+
+    __slots__ = ('max_restarts', 'window', '_restarts')
+
+    def __init__(self, max_restarts: int, window: float):
+        self.max_restarts = max_restarts
+        self.window = window
+        self._restarts: Deque[float] = deque()
+
+    def spend(self) -> bool:
+        """Учесть перезапуск; False, если бюджет исчерпан"""
+        now = time.monotonic()
+        while self._restarts and now - self._restarts[0] > self.window:
+            self._restarts.popleft()
+        if len(self._restarts) >= self.max_restarts:
+            return False
+        self._restarts.append(now)
+        return True
+
+
+class _Component:
+    __slots__ = ('name', 'run', 'budget', 'backoff', 'restarts', 'restart_counter')
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[None]],
+                 budget: RestartBudget, backoff: Backoff):
+        self.name = name
+        self.run = run
+        self.budget = budget
+        self.backoff = backoff
+        self.restarts = 0
+        self.restart_counter = metrics.counter('supervisor_restarts_total', 'Перезапуски компонентов',
+                                               {'component': name})
+
+
+class Supervisor:
+    """Компоненты - задачи одной TaskGroup.
+
+    Упавший компонент перезапускается сразу же, как только его задача
+    завершилась с ошибкой (первый раз без паузы, дальше с нарастающей
+    паузой); остальные компоненты продолжают работать. Если компонент
+    падает чаще, чем позволяет его бюджет, супервизор выбрасывает
+    SupervisorGaveUp и TaskGroup останавливает все компоненты. Компонент,
+    завершившийся без ошибки, считается закончившим работу. stop()
+    останавливает все компоненты и завершает run().
+    """
+
+    def __init__(self, max_restarts: int, window: float,
+                 restart_delay: float, max_restart_delay: float):
+        self.max_restarts = max_restarts
+        self.window = window
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.components: Dict[str, _Component] = {}
+        self.stopping = asyncio.Event()
+
+    def add(self, name: str, run: Callable[[], Awaitable[None]],
+            max_restarts: Optional[int] = None, window: Optional[float] = None):
+        budget = RestartBudget(max_restarts if max_restarts is not None else self.max_restarts,
+                               window if window is not None else self.window)
+        backoff = Backoff(self.restart_delay, self.max_restart_delay)
+        self.components[name] = _Component(name, run, budget, backoff)
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {name: component.restarts for name, component in self.components.items()}
+
+    async def run(self):
+        """Работа до stop() или до исчерпания бюджета одним из компонентов"""
+        try:
+            async with asyncio.TaskGroup() as group:
+                for component in self.components.values():
+                    group.create_task(self._supervise(component), name=component.name)
+        except* SupervisorGaveUp as errors:
+            raise errors.exceptions[0]
+
+    async def _supervise(self, component: _Component):
+        stopping = asyncio.ensure_future(self.stopping.wait())
+        task: Optional[asyncio.Future] = None
+        try:
+            while not self.stopping.is_set():
+                started = time.monotonic()
+                task = asyncio.ensure_future(component.run())
+                await asyncio.wait([task, stopping], return_when=asyncio.FIRST_COMPLETED)
+
+                if not task.done():
+                    # Остановка супервизора, задача отменяется в finally
+                    return
+
+                if task.cancelled() or task.exception() is None:
+                    logger.info(f"Компонент {component.name} завершил работу")
+                    return
+
+                error = task.exception()
+                if not component.budget.spend():
+                    logger.error(f"❌ Компонент {component.name} падает слишком часто "
+                                 f"({component.budget.max_restarts} за {component.budget.window:.0f} сек), "
+                                 f"остановка: {error!r}")
+                    raise SupervisorGaveUp(component.name, error)
+
+                component.restarts += 1
+                component.restart_counter.inc()
+                # Долго проработавший компонент перезапускается без паузы
+                if time.monotonic() - started >= component.budget.window:
+                    component.backoff.reset()
+                delay = component.backoff.next_delay()
+                logger.error(f"💥 Компонент {component.name} упал: {error!r}; "
+                             f"перезапуск {component.restarts}" + (f" через {delay:.1f} сек" if delay else ""))
+                if delay:
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            stopping.cancel()
+            # Остановка или отмена группы после отказа другого компонента
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.wait([task])
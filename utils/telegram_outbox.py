@@ -0,0 +1,446 @@
+"""Очередь исходящих сообщений Telegram с учётом лимитов"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.rate_limit import TokenBucket
+from utils.supervisor import wait_task
+
+logger = setup_logger(__name__)
+
+PRIORITY_HIGH = 'high'  # Результаты покупок и ошибки бота
+PRIORITY_NORMAL = 'normal'  # Новые предметы с кнопкой покупки
+PRIORITY_LOW = 'low'  # Продажи и прочие справочные сообщения
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n— — —\n\n"
+
+TELEGRAM_SECONDS = metrics.histogram('stage_seconds', 'Длительность этапов горячего пути', {'stage': 'telegram_send'})
+SENT = metrics.counter('telegram_messages_total', 'Сообщения в Telegram', {'result': 'ok'})
+FAILED = metrics.counter('telegram_messages_total', 'Сообщения в Telegram', {'result': 'error'})
+_OUTBOX_HELP = 'Сообщения очереди Telegram, не отправленные по отдельности'
+DIGESTED = metrics.counter('telegram_outbox_total', _OUTBOX_HELP, {'result': 'digested'})
+DROPPED = metrics.counter('telegram_outbox_total', _OUTBOX_HELP, {'result': 'dropped'})
+SPOOLED = metrics.counter('telegram_outbox_total', _OUTBOX_HELP, {'result': 'spooled'})
+RETRY_AFTER = metrics.counter('telegram_retry_after_total', 'Ответы 429 от Telegram')
+
+
+class OutboundMessage:
+    """Сообщение в очереди; message_id задан для правки существующего"""
+
+    __slots__ = ('text', 'priority', 'reply_markup', 'on_sent', 'chat_id', 'message_id', 'created', 'key')
+
+    def __init__(self, text: str, priority: str = PRIORITY_NORMAL,
+                 reply_markup: Optional[InlineKeyboardMarkup] = None,
+                 on_sent: Optional[Callable[[Any], None]] = None,
+                 chat_id=None, message_id: Optional[int] = None, created: Optional[float] = None,
+                 key: Optional[int] = None):
+        self.text = text
+        self.priority = priority
+        self.reply_markup = reply_markup
+        self.on_sent = on_sent
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.created = created or time.time()
+        # Связь записи spool с on_sent, который остался в памяти
+        self.key = key
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'text': self.text,
+            'priority': self.priority,
+            'reply_markup': self.reply_markup.to_dict() if self.reply_markup else None,
+            'created': self.created,
+        }
+        if self.key is not None:
+            data['key'] = self.key
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OutboundMessage':
+        markup = data.get('reply_markup')
+        return cls(
+            data['text'],
+            data.get('priority', PRIORITY_NORMAL),
+            InlineKeyboardMarkup.de_json(markup, None) if markup else None,
+            created=data.get('created'),
+            key=data.get('key'),
+        )
+
+
+class TelegramOutbox:
+    """Неблокирующая очередь отправки в один чат.
+
+    send() только ставит сообщение в очередь; отправляет фоновая задача,
+    не чаще, чем позволяет ведро токенов (rate 0 - без ограничения).
+    Сначала уходят сообщения высокого приоритета. Если к моменту отправки
+    накопилось несколько сообщений низкого приоритета, они объединяются
+    в одну сводку. На 429 задача ждёт retry_after, но не больше
+    retry_after_limit раз подряд. Если Telegram недоступен, новые
+    сообщения сразу пишутся в spool_path и после восстановления связи
+    отправляются оттуда; on_sent для них хранится в памяти. Правки ждут
+    в памяти. Не отправленное к остановке остаётся в spool и уходит после
+    перезапуска, уже без on_sent.
+    """
+
+    def __init__(self, bot, chat_id, rate: float = 0.0, burst: int = 1,
+                 queue_size: int = 500, spool_path: Optional[str] = None,
+                 retries: int = 3, outage_retry_interval: float = 30.0,
+                 retry_after_limit: int = 5):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.queue_size = queue_size
+        self.spool_path = spool_path
+        self.retries = retries
+        self.retry_after_limit = retry_after_limit
+        self.outage_retry_interval = outage_retry_interval
+        self.queues: Dict[str, Deque[OutboundMessage]] = {priority: deque() for priority in PRIORITIES}
+        # Недоставленные во время сбоя, которые не пишутся в spool (правки)
+        self.held: Deque[OutboundMessage] = deque()
+        # on_sent сообщений, отложенных в spool, по ключу записи
+        self._callbacks: Dict[int, Callable[[Any], None]] = {}
+        self._keys = itertools.count()
+        self.outage = False
+        self.spooled = 0
+        self.sent = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.gauge('telegram_outbox_depth', 'Сообщения в очереди Telegram', getter=self.depth)
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def send(self, text: str, priority: str = PRIORITY_NORMAL,
+             reply_markup: Optional[InlineKeyboardMarkup] = None,
+             on_sent: Optional[Callable[[Any], None]] = None):
+        """Поставить сообщение в очередь; on_sent получит отправленное сообщение"""
+        self._enqueue(OutboundMessage(text, priority, reply_markup, on_sent))
+
+    async def edit_message_text(self, text: str, chat_id=None, message_id: Optional[int] = None,
+                                parse_mode=None, **kwargs):
+        """Правка сообщения через ту же очередь (совместимо с Bot.edit_message_text)"""
+        self._enqueue(OutboundMessage(text, PRIORITY_NORMAL, chat_id=chat_id, message_id=message_id))
+
+    def _enqueue(self, message: OutboundMessage):
+        queue = self.queues[message.priority]
+        if self.depth() >= self.queue_size:
+            # Переполнение: вытесняем самое старое сообщение самого низкого
+            # приоритета, но не важнее нового - иначе отбрасывается новое
+            self.dropped += 1
+            DROPPED.inc()
+            lowest = next((priority for priority in reversed(PRIORITIES) if self.queues[priority]), None)
+            if lowest is None or PRIORITIES.index(lowest) < PRIORITIES.index(message.priority):
+                logger.warning("⚠️ Очередь Telegram переполнена, новое сообщение отброшено")
+                return
+            self.queues[lowest].popleft()
+        queue.append(message)
+        self._idle.clear()
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            # Простой отмечает сама задача после загрузки spool
+            self._idle.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self):
+        """Ожидание завершения задачи отправки (для супервизора)"""
+        await wait_task(self._task)
+
+    async def join(self, timeout: Optional[float] = None):
+        """Дождаться отправки всего, что стоит в очереди"""
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Остановка: недоставленное за drain_timeout уходит в spool"""
+        if self._task is None:
+            return
+        # Упавшая задача очередь уже не разберёт
+        if not self._task.done():
+            try:
+                await self.join(drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._task.cancel()
+        # Ошибку упавшей задачи уже записал супервизор
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+        unsent = list(self.held)
+        self.held.clear()
+        unsent.extend(self._take_queued())
+        await self._spool(unsent)
+        if self._callbacks:
+            logger.warning(f"⚠️ В spool остались сообщения с обработчиком отправки: {len(self._callbacks)}; "
+                           f"после отправки из spool он не вызывается (статус покупки не отслеживается)")
+            self._callbacks.clear()
+
+    def _next(self) -> Optional[OutboundMessage]:
+        for priority in (PRIORITY_HIGH, PRIORITY_NORMAL):
+            if self.queues[priority]:
+                return self.queues[priority].popleft()
+        low = self.queues[PRIORITY_LOW]
+        if not low:
+            return None
+        message = low.popleft()
+        if not low or message.message_id is not None or message.reply_markup is not None:
+            return message
+
+        # Накопилось несколько справочных сообщений - одна сводка
+        texts = [message.text]
+        length = len(message.text)
+        while low and low[0].message_id is None and low[0].reply_markup is None:
+            extra = len(low[0].text) + len(DIGEST_SEPARATOR)
+            if length + extra > MESSAGE_LIMIT - 100:
+                break
+            texts.append(low.popleft().text)
+            length += extra
+        if len(texts) == 1:
+            return message
+        DIGESTED.inc(len(texts))
+        header = f"📰 <b>Сводка: {len(texts)} сообщений</b>\n\n"
+        return OutboundMessage(header + DIGEST_SEPARATOR.join(texts), PRIORITY_LOW, created=message.created)
+
+    async def _run(self):
+        await self._load_spool()
+        while True:
+            if self.outage:
+                await self._retry_outage()
+                continue
+
+            if not self.depth():
+                self._idle.set()
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            if self.bucket:
+                delay = self.bucket.delay()
+                if delay > 0:
+                    # Пока ждём токен, справочные сообщения копятся для сводки
+                    await asyncio.sleep(delay)
+                    continue
+                self.bucket.try_acquire()
+
+            message = self._next()
+            if message is not None and not await self._deliver(message):
+                await self._hold([message])
+
+    async def _call(self, message: OutboundMessage):
+        chat_id = message.chat_id if message.chat_id is not None else self.chat_id
+        if message.message_id is not None:
+            return await self.bot.edit_message_text(
+                message.text, chat_id=chat_id, message_id=message.message_id, parse_mode="HTML"
+            )
+        return await self.bot.send_message(
+            chat_id=chat_id, text=message.text, parse_mode="HTML", reply_markup=message.reply_markup
+        )
+
+    async def _deliver(self, message: OutboundMessage) -> bool:
+        """Отправка с повторами; False - Telegram недоступен, сообщение отложено"""
+        attempt = 0
+        throttled = 0
+        while attempt < self.retries:
+            try:
+                with TELEGRAM_SECONDS.time():
+                    sent = await self._call(message)
+            except RetryAfter as e:
+                RETRY_AFTER.inc()
+                throttled += 1
+                if throttled > self.retry_after_limit:
+                    # Telegram долго не снимает ограничение - как при сбое
+                    logger.warning(f"⏳ Лимит Telegram {throttled} раз подряд, сообщение отложено")
+                    break
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"⏳ Лимит Telegram, ждём {retry_after} сек")
+                await asyncio.sleep(retry_after)
+                continue
+            except (BadRequest, Forbidden) as e:
+                # Повтор не поможет
+                FAILED.inc()
+                logger.error(f"Ошибка отправки в Telegram: {e}")
+                return True
+            except (TelegramError, OSError) as e:
+                attempt += 1
+                logger.warning(f"⚠️ Telegram недоступен (попытка {attempt}): {e}")
+                if attempt < self.retries:
+                    await asyncio.sleep(2 ** attempt)
+                continue
+
+            self.sent += 1
+            SENT.inc()
+            if message.on_sent:
+                try:
+                    message.on_sent(sent)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки отправленного сообщения: {e}")
+            return True
+
+        if not self.outage:
+            logger.error("❌ Telegram недоступен, сообщения ждут восстановления связи")
+        self.outage = True
+        return False
+
+    def _take_queued(self) -> List[OutboundMessage]:
+        taken = []
+        for queue in self.queues.values():
+            taken.extend(queue)
+            queue.clear()
+        return taken
+
+    async def _hold(self, messages: List[OutboundMessage]):
+        """Отложить недоставленное до восстановления связи.
+
+        Новые сообщения сразу уходят в spool, чтобы пережить падение
+        процесса. Правки устаревают при перезапуске и ждут в памяти, как
+        и всё, что не удалось записать; сверх queue_size старые отбрасываются.
+        """
+        durable = [message for message in messages if message.message_id is None and self.spool_path]
+        self.held.extend(message for message in messages if message.message_id is not None or not self.spool_path)
+        if durable:
+            for message in durable:
+                if message.on_sent:
+                    if message.key is None:
+                        message.key = next(self._keys)
+                    self._callbacks[message.key] = message.on_sent
+            try:
+                await self._write_spool(durable)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить сообщения в spool: {e}")
+                for message in durable:
+                    self._callbacks.pop(message.key, None)
+                    message.key = None
+                self.held.extend(durable)
+        overflow = len(self.held) - self.queue_size
+        for _ in range(max(0, overflow)):
+            self.held.popleft()
+            self.dropped += 1
+            DROPPED.inc()
+
+    async def _retry_outage(self):
+        """Во время сбоя новые сообщения сразу откладываются, периодически пробуем отправить"""
+        deadline = time.monotonic() + self.outage_retry_interval
+        while True:
+            self._wakeup.clear()
+            await self._hold(self._take_queued())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            pending = await asyncio.to_thread(self._take_spool)
+        except OSError as e:
+            logger.error(f"Не удалось прочитать spool: {e}")
+            return
+        for message in pending:
+            if message.key is not None:
+                message.on_sent = self._callbacks.pop(message.key, None)
+        pending.extend(self.held)
+        self.held.clear()
+        self.outage = False
+        for index, message in enumerate(pending):
+            if self.bucket:
+                await asyncio.sleep(self.bucket.delay())
+                self.bucket.try_acquire()
+            if not await self._deliver(message):
+                await self._hold(pending[index:])
+                return
+        logger.info(f"✅ Связь с Telegram восстановлена, отправлено отложенных: {len(pending)}")
+
+    async def _spool(self, messages: List[OutboundMessage]):
+        """Сохранение на диск до следующего запуска; on_sent на диск не попадает"""
+        kept = []
+        for message in messages:
+            if message.message_id is not None or not self.spool_path:
+                # Правки устаревают, без пути сохранять некуда
+                self.dropped += 1
+                DROPPED.inc()
+            else:
+                kept.append(message)
+        if not kept:
+            return
+        try:
+            await self._write_spool(kept)
+        except OSError as e:
+            self.dropped += len(kept)
+            DROPPED.inc(len(kept))
+            logger.error(f"Не удалось сохранить сообщения в spool: {e}")
+            return
+        callbacks = sum(1 for message in kept if message.on_sent)
+        if callbacks:
+            logger.warning(f"⚠️ В spool сохранено сообщений с обработчиком отправки: {callbacks}; "
+                           f"после отправки из spool он не вызывается (статус покупки не отслеживается)")
+
+    async def _write_spool(self, messages: List[OutboundMessage]):
+        lines = ''.join(json.dumps(message.to_dict(), ensure_ascii=False) + '\n' for message in messages)
+        await asyncio.to_thread(self._append_spool, lines)
+        self.spooled += len(messages)
+        SPOOLED.inc(len(messages))
+
+    def _append_spool(self, lines: str):
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def _take_spool(self) -> List[OutboundMessage]:
+        """Чтение и удаление spool (в рабочем потоке)"""
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return []
+        messages = []
+        with open(self.spool_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    messages.append(OutboundMessage.from_dict(json.loads(line)))
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Пропущена повреждённая запись spool: {e}")
+        os.remove(self.spool_path)
+        return messages
+
+    async def _load_spool(self):
+        """Сообщения, не отправленные до перезапуска, встают в начало очереди"""
+        try:
+            pending = await asyncio.to_thread(self._take_spool)
+        except OSError as e:
+            logger.error(f"Не удалось прочитать spool: {e}")
+            return
+        for message in reversed(pending):
+            # Ключи прошлого запуска ни с чем в памяти не связаны
+            message.key = None
+            self.queues[message.priority].appendleft(message)
+        if pending:
+            self._idle.clear()
+            logger.info(f"📤 Из spool загружено сообщений: {len(pending)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'depth': {priority: len(queue) for priority, queue in self.queues.items()},
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'held': len(self.held),
+            'spooled': self.spooled,
+            'outage': self.outage,
+        }